@@ -4,6 +4,8 @@ from City.models import City
 class Area(models.Model):
     name = models.CharField(max_length=100)
     city = models.ForeignKey(City, on_delete=models.CASCADE, related_name="areas")
+    # در مهر ETag جزئیات رستوران که نام مناطق را دارد
+    updatedAt = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"{self.name} - {self.city.name}"
@@ -0,0 +1,13 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from services.ResponseCache import bumpAreaList
+from .models import Area
+
+
+@receiver(post_save, sender=Area)
+@receiver(post_delete, sender=Area)
+def invalidateAreaResponses(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    bumpAreaList()
@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F, Min, Sum
+
+from Cart.models import Cart, CartItem
+
+
+def getExpectedCartTotals():
+    """{cartId: (subtotal, tax, itemCount, restaurantId)} محاسبه‌شده از CartItem و قیمت فعلی غذاها"""
+    rows = CartItem.objects.values("cart_id").annotate(
+        subtotal=Sum(F("quantity") * F("food__price")), itemCount=Sum("quantity"), firstItemId=Min("id")
+    )
+    expected, firstItems = {}, {}
+    for row in rows.iterator():
+        expected[row["cart_id"]] = (row["subtotal"], int(row["subtotal"] * 0.10), row["itemCount"])
+        firstItems[row["firstItemId"]] = row["cart_id"]
+    restaurants = dict(
+        CartItem.objects.filter(id__in=firstItems).values_list("cart_id", "food__restaurant_id").iterator()
+    )
+    return {cartId: (*totals, restaurants.get(cartId)) for cartId, totals in expected.items()}
+
+
+class Command(BaseCommand):
+    help = "جبران drift جمع‌های ذخیره‌شده سبدهای خرید (مثلا بعد از تغییر قیمت غذاها) یا فقط بررسی آن با --check"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true', help="فقط اختلاف‌ها را گزارش کن و چیزی ننویس")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        expected = getExpectedCartTotals()
+        stale = []
+        carts = Cart.objects.only('id', 'subtotal', 'tax', 'itemCount', 'restaurant_id')
+        for cart in carts.iterator():
+            totals = expected.get(cart.id, (0, 0, 0, None))
+            if (cart.subtotal, cart.tax, cart.itemCount, cart.restaurant_id) != totals:
+                cart.subtotal, cart.tax, cart.itemCount, cart.restaurant_id = totals
+                stale.append(cart)
+
+        self.stdout.write(f"carts={len(expected)} stale={len(stale)}")
+        if options['check']:
+            if stale:
+                self.stderr.write(self.style.ERROR("جمع‌های سبد خرید با ردیف‌های آن هماهنگ نیست."))
+                raise SystemExit(1)
+            self.stdout.write(self.style.SUCCESS("جمع‌های سبد خرید هماهنگ است."))
+            return
+
+        Cart.objects.bulk_update(
+            stale, ['subtotal', 'tax', 'itemCount', 'restaurant'], batch_size=options['batch_size']
+        )
+        self.stdout.write(self.style.SUCCESS(f"جمع‌های {len(stale)} سبد خرید اصلاح شد."))
@@ -1,12 +1,23 @@
 from django.db import models
 from customer.models import Customer
+from Area.models import Area
 from food.models import Food
+from restaurant.models import Restaurant
 
 class Cart(models.Model):
     customer = models.OneToOneField(
         Customer, on_delete=models.CASCADE, related_name='cart'
     )
     foods = models.ManyToManyField(Food, through='CartItem', related_name='carts', blank=True)
+    # جمع‌های سبد که با هر تغییر ردیف به‌روز می‌شوند (Cart/store.py) و با دستور reconcile_cart_totals بررسی می‌شوند
+    subtotal = models.PositiveIntegerField(default=0)
+    tax = models.PositiveIntegerField(default=0)
+    itemCount = models.PositiveIntegerField(default=0)
+    restaurant = models.ForeignKey(Restaurant, on_delete=models.SET_NULL, related_name='carts', null=True, blank=True)
+    # منطقه ارسال انتخاب‌شده مشتری برای پیش‌فاکتور هزینه ارسال (restaurant/delivery.py)
+    area = models.ForeignKey(Area, on_delete=models.SET_NULL, related_name='carts', null=True, blank=True)
+    # نسخه سبد انبار که آخرین بار نوشته شده است؛ نوشتن نسخه قدیمی‌تر (flush هم‌زمان کندتر) رد می‌شود
+    revision = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
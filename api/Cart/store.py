@@ -0,0 +1,415 @@
+import atexit
+import logging
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import IntegrityError, close_old_connections, transaction
+from django.utils import timezone
+
+from Area.models import Area
+from customer.models import Customer
+from food.models import Food
+from food.serializer import FoodSerializer
+from services.ResponseCache import ALL_AREAS_SCOPE, CATALOG_SCOPE, getVersions
+from .models import Cart, CartItem
+
+# هر تغییر غذا، رستوران یا دسته‌بندی یکی از این scope ها را افزایش می‌دهد (services/ResponseCache.py)
+SNAPSHOT_SCOPES = [CATALOG_SCOPE, ALL_AREAS_SCOPE]
+LOCK_TIMEOUT = 5
+
+logger = logging.getLogger(__name__)
+
+
+class CartBusy(Exception):
+    """قفل سبد در مهلت LOCK_TIMEOUT گرفته نشد (درخواست هم‌زمان دیگری همان سبد را تغییر می‌دهد)"""
+
+
+def _foodData(food):
+    return dict(FoodSerializer(food).data)
+
+
+def _emptyEntry(versions=None, areaId=None):
+    return {
+        "items": {}, "versions": versions, "dirty": False, "revision": 0,
+        "subtotal": 0, "tax": 0, "itemCount": 0, "restaurantId": None, "areaId": areaId,
+    }
+
+
+def _totals(entry):
+    return entry["subtotal"], entry["tax"], entry["itemCount"], entry["restaurantId"]
+
+
+def _recalculate(entry):
+    """محاسبه کامل جمع‌ها از روی ردیف‌ها؛ برای بارگذاری سبد و جبران drift بعد از تغییر قیمت غذاها"""
+    items = entry["items"].values()
+    entry["subtotal"] = sum(item["food"]["price"] * item["quantity"] for item in items)
+    entry["tax"] = int(entry["subtotal"] * 0.10)
+    entry["itemCount"] = sum(item["quantity"] for item in items)
+    entry["restaurantId"] = next((item["restaurantId"] for item in items), None)
+
+
+def setQuantity(entry, foodId, quantity, food=None):
+    """
+    تعداد یک غذا را تنظیم و جمع‌های سبد را با اختلاف همان ردیف به‌روز می‌کند (بدون پیمایش بقیه ردیف‌ها).
+    quantity صفر یعنی حذف؛ برای غذایی که هنوز در سبد نیست نمونه food لازم است.
+    رستوران سبد رستوران اولین ردیف آن است (همان رستورانی که سفارش برایش ثبت می‌شود).
+    """
+    item = entry["items"].get(foodId)
+    if item is None:
+        if quantity <= 0:
+            return
+        item = entry["items"][foodId] = {"quantity": 0, "food": _foodData(food), "restaurantId": food.restaurant_id}
+        if entry["restaurantId"] is None:
+            entry["restaurantId"] = food.restaurant_id
+
+    delta = quantity - item["quantity"]
+    entry["subtotal"] += item["food"]["price"] * delta
+    entry["tax"] = int(entry["subtotal"] * 0.10)
+    entry["itemCount"] += delta
+
+    if quantity > 0:
+        item["quantity"] = quantity
+        return
+    wasFirst = next(iter(entry["items"])) == foodId
+    del entry["items"][foodId]
+    if wasFirst:
+        entry["restaurantId"] = next((other["restaurantId"] for other in entry["items"].values()), None)
+
+
+class CartStore:
+    """
+    سبدهای خرید فعال در یک انبار کلید-مقدار (کش «cart» در تنظیمات؛ locmem یا Redis).
+    هر سبد یک مقدار است: {"items": {foodId: {"quantity", "food", "restaurantId"}}, "versions", "dirty", "revision"}
+    به همراه جمع‌های subtotal، tax، itemCount و restaurantId که با هر تغییر ردیف به اندازه اختلاف همان ردیف
+    به‌روز می‌شوند؛ food اطلاعات سریال‌شده غذا است و خواندن و نوشتن سبد بدون کوئری دیتابیس انجام می‌شود.
+    اطلاعات غذاها وقتی نسخه scope های کاتالوگ عوض شود با یک کوئری تازه می‌شود.
+    تغییرات با تاخیر CART_FLUSH_DELAY ثانیه (یا هنگام ثبت سفارش) در جدول‌های Cart و CartItem نوشته می‌شوند.
+    """
+
+    def __init__(self, alias="cart"):
+        self.alias = alias
+        self.pending = {}  # customerId -> زمان موعد نوشتن در دیتابیس
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.flusher = None
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def _key(self, customerId):
+        return f"cart:{customerId}"
+
+    @contextmanager
+    def _locked(self, customerId):
+        # قفل بین worker ها با add اتمیک انبار؛ دو کلیک هم‌زمان یک مشتری تغییر همدیگر را پاک نمی‌کنند.
+        # مقدار قفل توکن همین دارنده است تا قفلی که بعد از انقضا به دیگری رسیده آزاد نشود.
+        lockKey = f"lock:{customerId}"
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + LOCK_TIMEOUT
+        while not self.cache.add(lockKey, token, timeout=LOCK_TIMEOUT):
+            if time.monotonic() > deadline:
+                raise CartBusy(customerId)
+            time.sleep(0.001)
+        try:
+            yield
+        finally:
+            if self.cache.get(lockKey) == token:
+                self.cache.delete(lockKey)
+
+    def _loadFromDb(self, customerId, versions):
+        entry = _emptyEntry(versions)
+        items = CartItem.objects.select_related("food", "food__category").filter(
+            cart__customer_id=customerId
+        ).order_by("id")
+        for item in items:
+            entry["items"][item.food_id] = {
+                "quantity": item.quantity, "food": _foodData(item.food), "restaurantId": item.food.restaurant_id
+            }
+        _recalculate(entry)
+        # شماره نسخه از همان نسخه نوشته‌شده ادامه پیدا می‌کند تا تغییرات بعدی از نسخه دیتابیس جلوتر باشند
+        entry["areaId"], entry["revision"] = Cart.objects.filter(customer_id=customerId).values_list(
+            "area_id", "revision"
+        ).first() or (None, 0)
+        return entry
+
+    def _refresh(self, entry, versions):
+        """
+        اطلاعات غذاهای سبد را بعد از تغییر کاتالوگ دوباره می‌خواند و جمع‌ها را از نو حساب می‌کند؛
+        غذاهای حذف‌شده از سبد بیرون می‌روند و اگر جمع‌ها عوض شده باشند سبد دوباره در دیتابیس نوشته می‌شود
+        """
+        before = _totals(entry) if "subtotal" in entry else None
+        foods = Food.objects.select_related("category").in_bulk(list(entry["items"]))
+        for foodId in list(entry["items"]):
+            if foodId in foods:
+                entry["items"][foodId]["food"] = _foodData(foods[foodId])
+                entry["items"][foodId]["restaurantId"] = foods[foodId].restaurant_id
+            else:
+                del entry["items"][foodId]
+        _recalculate(entry)
+        if _totals(entry) != before:
+            entry["dirty"] = True
+            entry["revision"] += 1
+        entry["versions"] = versions
+
+    def _get(self, customerId):
+        versions = getVersions(SNAPSHOT_SCOPES)
+        entry = self.cache.get(self._key(customerId))
+        if entry is None:
+            entry = self._loadFromDb(customerId, versions)
+            self.cache.set(self._key(customerId), entry, timeout=settings.CART_STORE_TIMEOUT)
+        elif entry["versions"] != versions or "subtotal" not in entry:
+            self._refresh(entry, versions)
+            self.cache.set(self._key(customerId), entry, timeout=settings.CART_STORE_TIMEOUT)
+        return entry
+
+    def get(self, customerId, areaId=None):
+        """areaId: منطقه ارسال انتخاب‌شده مشتری که برای پیش‌فاکتور ارسال در سبد ذخیره می‌شود"""
+        if areaId is not None:
+            return self.update(customerId, lambda entry: False, areaId)[0]
+        with self._locked(customerId):
+            entry = self._get(customerId)
+        if entry["dirty"]:
+            self._schedule(customerId)
+        return entry
+
+    def update(self, customerId, mutate, areaId=None):
+        """
+        mutate(entry) سبد را در جا تغییر می‌دهد و True برمی‌گرداند اگر چیزی عوض شده باشد.
+        خروجی: (سبد، خروجی mutate)
+        """
+        with self._locked(customerId):
+            entry = self._get(customerId)
+            result = mutate(entry)
+            changed = bool(result)
+            if areaId is not None and entry.get("areaId") != areaId:
+                entry["areaId"] = areaId
+                changed = True
+            if changed:
+                entry["dirty"] = True
+                entry["revision"] += 1
+                self.cache.set(self._key(customerId), entry, timeout=settings.CART_STORE_TIMEOUT)
+        if entry["dirty"]:
+            self._schedule(customerId)
+        return entry, result
+
+    def addFood(self, customerId, foodId, quantity=1, areaId=None):
+        """خروجی: (سبد، False اگر غذا وجود نداشته باشد)؛ فقط غذایی که هنوز در سبد نیست از دیتابیس خوانده می‌شود"""
+        def mutate(entry):
+            item = entry["items"].get(foodId)
+            if item is not None:
+                setQuantity(entry, foodId, item["quantity"] + quantity)
+                return True
+            food = Food.objects.select_related("category").filter(id=foodId).first()
+            if food is None:
+                return False
+            setQuantity(entry, foodId, quantity, food)
+            return True
+
+        return self.update(customerId, mutate, areaId)
+
+    def removeFood(self, customerId, foodId, areaId=None):
+        """یک واحد از غذا کم می‌کند؛ خروجی: (سبد، ردیف سبد آن غذا یا None اگر در سبد نباشد)"""
+        def mutate(entry):
+            item = entry["items"].get(foodId)
+            if item is None:
+                return None
+            setQuantity(entry, foodId, item["quantity"] - 1)
+            return item
+
+        return self.update(customerId, mutate, areaId)
+
+    def setQuantities(self, customerId, quantities, areaId=None):
+        """
+        quantities: {foodId: تعداد}؛ صفر یعنی حذف. همه تغییرات در یک بار قفل سبد اعمال می‌شوند و غذاهای جدید
+        با یک کوئری خوانده می‌شوند. اگر غذایی وجود نداشته باشد یا سبد نهایی غذای بیش از یک رستوران را داشته باشد
+        (سفارش فقط برای رستوران سبد ثبت می‌شود) هیچ تغییری اعمال نمی‌شود.
+        خروجی: (سبد، لیست آیدی غذاهای یافت‌نشده، لیست آیدی غذاهای رستوران دیگر)
+        """
+        missing, otherRestaurant = [], []
+
+        def mutate(entry):
+            newIds = [foodId for foodId, quantity in quantities.items() if quantity and foodId not in entry["items"]]
+            foods = Food.objects.select_related("category").in_bulk(newIds) if newIds else {}
+            missing.extend(foodId for foodId in newIds if foodId not in foods)
+            if missing:
+                return False
+            # رستوران هر ردیفی که بعد از این تغییرات در سبد می‌ماند، به ترتیب ردیف‌های سبد
+            restaurantIds = {
+                foodId: item["restaurantId"] for foodId, item in entry["items"].items()
+                if quantities.get(foodId, item["quantity"])
+            }
+            restaurantIds.update((foodId, foods[foodId].restaurant_id) for foodId in newIds)
+            restaurantId = next(iter(restaurantIds.values()), None)
+            otherRestaurant.extend(
+                foodId for foodId, other in restaurantIds.items() if other != restaurantId and foodId in quantities
+            )
+            if otherRestaurant:
+                return False
+            changed = False
+            for foodId, quantity in quantities.items():
+                item = entry["items"].get(foodId)
+                if (item["quantity"] if item else 0) != quantity:
+                    setQuantity(entry, foodId, quantity, foods.get(foodId))
+                    changed = True
+            return changed
+
+        entry, _ = self.update(customerId, mutate, areaId)
+        return entry, missing, otherRestaurant
+
+    def clear(self, customerId):
+        """بعد از تبدیل سبد به سفارش؛ جدول‌ها جداگانه خالی شده‌اند و منطقه ارسال سبد حفظ می‌شود"""
+        try:
+            with self._locked(customerId):
+                entry = self.cache.get(self._key(customerId))
+                if entry is None:
+                    # دفعه بعد سبد خالی با نسخه دیتابیس خوانده می‌شود
+                    self.cache.delete(self._key(customerId))
+                else:
+                    empty = _emptyEntry(getVersions(SNAPSHOT_SCOPES), entry.get("areaId"))
+                    empty["revision"] = entry["revision"]
+                    self.cache.set(self._key(customerId), empty, timeout=settings.CART_STORE_TIMEOUT)
+        except CartBusy:
+            # سفارش ثبت شده و جدول‌ها خالی‌اند؛ سبد انبار حذف می‌شود تا دفعه بعد از دیتابیس خوانده شود
+            self.cache.delete(self._key(customerId))
+        with self.lock:
+            self.pending.pop(customerId, None)
+
+    # -----------------------------
+    # نوشتن در دیتابیس (write-behind)
+    # -----------------------------
+    def _schedule(self, customerId):
+        if settings.CART_FLUSH_DELAY <= 0:
+            self.flush(customerId)
+            return
+        with self.lock:
+            self.pending.setdefault(customerId, time.monotonic() + settings.CART_FLUSH_DELAY)
+            if self.flusher is None:
+                self.flusher = threading.Thread(target=self._flushLoop, name="cart-flusher", daemon=True)
+                self.flusher.start()
+        self.wakeup.set()
+
+    def _flushLoop(self):
+        while True:
+            with self.lock:
+                due = min(self.pending.values(), default=None)
+            self.wakeup.wait(None if due is None else max(0.0, due - time.monotonic()))
+            self.wakeup.clear()
+            self.flushPending()
+            close_old_connections()
+
+    def flushPending(self, force=False):
+        """سبدهایی که موعد نوشتنشان رسیده (یا با force همه سبدهای نوشته‌نشده) را در دیتابیس می‌نویسد"""
+        now = time.monotonic()
+        with self.lock:
+            customerIds = [customerId for customerId, due in self.pending.items() if force or due <= now]
+            for customerId in customerIds:
+                del self.pending[customerId]
+        for customerId in customerIds:
+            try:
+                self.flush(customerId)
+            except CartBusy:
+                # سبد در حال تغییر است؛ نوشتن آن به دور بعد موکول می‌شود
+                with self.lock:
+                    self.pending.setdefault(customerId, time.monotonic() + max(settings.CART_FLUSH_DELAY, 1))
+        return len(customerIds)
+
+    def flush(self, customerId, retry=True):
+        """
+        سبد انبار را در Cart و CartItem می‌نویسد؛ فقط ردیف‌های تغییرکرده نوشته می‌شوند.
+        نوشتن بیرون از قفل سبد انجام می‌شود، پس دو flush هم‌زمان ممکن است به ترتیب برعکس commit شوند؛ _write با قفل
+        ردیف Cart و مقایسه revision نسخه قدیمی‌تر را نمی‌نویسد.
+        """
+        entry = self.cache.get(self._key(customerId))
+        if entry is None or not entry["dirty"]:
+            return
+        quantities = {foodId: item["quantity"] for foodId, item in entry["items"].items()}
+        try:
+            with transaction.atomic():
+                self._write(customerId, quantities, _totals(entry), entry.get("areaId"), entry["revision"])
+        except IntegrityError:
+            # غذا، منطقه یا خود مشتری بین تغییر سبد و نوشتن آن حذف شده است
+            logger.warning("نوشتن سبد مشتری %s در دیتابیس ناموفق بود", customerId, exc_info=True)
+            if retry and self._dropMissing(customerId):
+                self.flush(customerId, retry=False)
+            return
+
+        try:
+            with self._locked(customerId):
+                current = self.cache.get(self._key(customerId))
+                if current is not None and current["revision"] == entry["revision"]:
+                    current["dirty"] = False
+                    self.cache.set(self._key(customerId), current, timeout=settings.CART_STORE_TIMEOUT)
+        except CartBusy:
+            # سبد کثیف می‌ماند و با نوشتن بعدی (که دارنده قفل زمان‌بندی می‌کند) دوباره نوشته می‌شود
+            pass
+
+    def _dropMissing(self, customerId):
+        """
+        بعد از خطای نوشتن فقط ردیف‌هایی که دیگر وجود ندارند از سبد انبار حذف می‌شوند و بقیه تغییرات نوشته‌نشده
+        می‌مانند؛ اگر خود مشتری حذف شده باشد سبد کنار گذاشته می‌شود. خروجی: آیا دوباره نوشتن سبد معنی دارد
+        """
+        with self._locked(customerId):
+            entry = self.cache.get(self._key(customerId))
+            if entry is None:
+                return False
+            if not Customer.objects.filter(id=customerId).exists():
+                logger.warning("مشتری %s حذف شده است؛ سبد انبار او کنار گذاشته شد", customerId)
+                self.cache.delete(self._key(customerId))
+                return False
+            existing = set(Food.objects.filter(id__in=list(entry["items"])).values_list("id", flat=True))
+            missing = [foodId for foodId in entry["items"] if foodId not in existing]
+            for foodId in missing:
+                setQuantity(entry, foodId, 0)
+            if entry.get("areaId") is not None and not Area.objects.filter(id=entry["areaId"]).exists():
+                entry["areaId"] = None
+            if missing:
+                logger.warning("غذاهای حذف‌شده %s از سبد مشتری %s کنار گذاشته شدند", missing, customerId)
+            entry["dirty"] = True
+            entry["revision"] += 1
+            self.cache.set(self._key(customerId), entry, timeout=settings.CART_STORE_TIMEOUT)
+        return True
+
+    def _write(self, customerId, quantities, totals, areaId, revision):
+        cart, _ = Cart.objects.get_or_create(customer_id=customerId)
+        written = Cart.objects.select_for_update().filter(id=cart.id).values_list("revision", flat=True).get()
+        if written >= revision:
+            # نسخه جدیدتر (یا همین نسخه) قبلا نوشته شده است
+            return
+        existing = {item.food_id: item for item in CartItem.objects.filter(cart=cart)}
+
+        removed = [foodId for foodId in existing if foodId not in quantities]
+        if removed:
+            CartItem.objects.filter(cart=cart, food_id__in=removed).delete()
+
+        changed = []
+        for foodId, quantity in quantities.items():
+            item = existing.get(foodId)
+            if item is not None and item.quantity != quantity:
+                item.quantity = quantity
+                changed.append(item)
+        if changed:
+            CartItem.objects.bulk_update(changed, ["quantity"])
+
+        added = [foodId for foodId in quantities if foodId not in existing]
+        if added:
+            # غذایی که در این فاصله حذف شده نوشته نمی‌شود؛ ترتیب ردیف‌ها همان ترتیب سبد می‌ماند
+            foodIds = set(Food.objects.filter(id__in=added).values_list("id", flat=True))
+            CartItem.objects.bulk_create(
+                [CartItem(cart=cart, food_id=foodId, quantity=quantities[foodId]) for foodId in added if foodId in foodIds]
+            )
+
+        subtotal, tax, itemCount, restaurantId = totals
+        Cart.objects.filter(id=cart.id).update(
+            subtotal=subtotal, tax=tax, itemCount=itemCount, restaurant_id=restaurantId, area_id=areaId,
+            revision=revision, updated_at=timezone.now()
+        )
+
+
+cartStore = CartStore()
+# سبدهای نوشته‌نشده این worker هنگام خروج عادی فرایند در دیتابیس نوشته می‌شوند
+atexit.register(cartStore.flushPending, force=True)
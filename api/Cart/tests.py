@@ -1,3 +1,215 @@
+import copy
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import IntegrityError
 from django.test import TestCase
+from rest_framework.test import APIClient
+
+from City.models import City
+from customer.models import Customer
+from food.models import Food
+from FoodCategory.models import FoodCategory
+from restaurant.models import Restaurant
+from restaurantManager.models import RestaurantManager
+from . import store
+from .models import Cart, CartItem
+from .store import CartBusy, cartStore
+from .views import CART_SET_MAX_ITEMS
+
+
+class CartLockTests(TestCase):
+    def setUp(self):
+        cartStore.cache.clear()
+
+    def test_busy_lock_raises_and_keeps_other_holder_lock(self):
+        cartStore.cache.add("lock:1", "other", timeout=60)
+        with mock.patch.object(store, "LOCK_TIMEOUT", 0.01):
+            with self.assertRaises(CartBusy):
+                with cartStore._locked(1):
+                    self.fail("بدنه نباید بدون قفل اجرا شود")
+        self.assertEqual(cartStore.cache.get("lock:1"), "other")
+
+    def test_expired_lock_taken_by_another_holder_is_not_released(self):
+        with cartStore._locked(2):
+            # قفل این دارنده منقضی شده و به دارنده دیگری رسیده است
+            cartStore.cache.set("lock:2", "other", timeout=60)
+        self.assertEqual(cartStore.cache.get("lock:2"), "other")
+
+    def test_lock_is_released_by_its_holder(self):
+        with cartStore._locked(3):
+            pass
+        self.assertIsNone(cartStore.cache.get("lock:3"))
+
+
+class CartFlushTests(TestCase):
+    def setUp(self):
+        cartStore.cache.clear()
+        city = City.objects.create(name="Tehran")
+        manager = RestaurantManager.objects.create(email="m@x.com", firstName="a", lastName="b", isVerified=True)
+        restaurant = Restaurant.objects.create(
+            owner=manager, name="rest", address="addr addr addr", city=city, phoneNumber="09120000000",
+            startWorkHour=8, endWorkHour=22, isVerified=True
+        )
+        category = FoodCategory.objects.create(name="c")
+        self.foods = [
+            Food.objects.create(name=f"food{i}", price=1000, category=category, restaurant=restaurant)
+            for i in range(2)
+        ]
+        self.customer = Customer.objects.create(email="c@x.com", firstName="c", lastName="d", isVerified=True)
+
+    def tearDown(self):
+        cartStore.pending.clear()
+
+    def test_integrity_error_drops_only_missing_foods(self):
+        with self.settings(CART_FLUSH_DELAY=60):
+            cartStore.setQuantities(self.customer.id, {self.foods[0].id: 2, self.foods[1].id: 3})
+        self.foods[1].delete()
+
+        realWrite = cartStore._write
+        calls = []
+
+        def failOnce(*args):
+            calls.append(args)
+            if len(calls) == 1:
+                raise IntegrityError()
+            return realWrite(*args)
+
+        with mock.patch.object(cartStore, "_write", side_effect=failOnce):
+            cartStore.flush(self.customer.id)
+
+        entry = cartStore.cache.get(cartStore._key(self.customer.id))
+        self.assertEqual(list(entry["items"]), [self.foods[0].id])
+        self.assertEqual(entry["subtotal"], 2000)
+        self.assertFalse(entry["dirty"])
+        self.assertEqual(
+            list(CartItem.objects.filter(cart__customer=self.customer).values_list("food_id", "quantity")),
+            [(self.foods[0].id, 2)]
+        )
+
+    def test_older_snapshot_does_not_overwrite_newer_write(self):
+        cartStore.setQuantities(self.customer.id, {self.foods[0].id: 1})
+        key = cartStore._key(self.customer.id)
+        older = copy.deepcopy(cartStore.cache.get(key))
+        cartStore.setQuantities(self.customer.id, {self.foods[0].id: 2})
+
+        # flush کندتری که نسخه قبلی را خوانده بود، بعد از نوشتن نسخه جدید commit می‌شود
+        older["dirty"] = True
+        with mock.patch.object(cartStore.cache, "get", return_value=older):
+            cartStore.flush(self.customer.id)
+
+        self.assertEqual(CartItem.objects.get(cart__customer=self.customer).quantity, 2)
+        cart = Cart.objects.get(customer=self.customer)
+        self.assertEqual((cart.subtotal, cart.revision), (2000, older["revision"] + 1))
+
+    def test_revision_continues_after_reload_from_database(self):
+        cartStore.setQuantities(self.customer.id, {self.foods[0].id: 1})
+        cartStore.cache.clear()
+        cartStore.setQuantities(self.customer.id, {self.foods[0].id: 3})
+        self.assertEqual(CartItem.objects.get(cart__customer=self.customer).quantity, 3)
+        self.assertEqual(Cart.objects.get(customer=self.customer).revision, 2)
+
+
+class CartViewTestCase(TestCase):
+    def setUp(self):
+        cartStore.cache.clear()
+        city = City.objects.create(name="Tehran")
+        category = FoodCategory.objects.create(name="c")
+        self.foods = [
+            Food.objects.create(name=f"food{i}", price=1000 * (i + 1), category=category, restaurant=restaurant)
+            for i, restaurant in enumerate([self.createRestaurant("m1@x.com", city)] * 3)
+        ]
+        self.otherFood = Food.objects.create(
+            name="other", price=500, category=category, restaurant=self.createRestaurant("m2@x.com", city)
+        )
+        self.customer = Customer.objects.create(email="c@x.com", firstName="c", lastName="d", isVerified=True)
+        self.client = APIClient()
+        session = self.client.session
+        session["customer_login"] = {"id": self.customer.id, "email": self.customer.email}
+        session.save()
+
+    def tearDown(self):
+        cartStore.pending.clear()
+
+    def createRestaurant(self, email, city):
+        manager = RestaurantManager.objects.create(email=email, firstName="a", lastName="b", isVerified=True)
+        return Restaurant.objects.create(
+            owner=manager, name="rest", address="addr addr addr", city=city, phoneNumber="09120000000",
+            startWorkHour=8, endWorkHour=22, isVerified=True
+        )
+
+
+class CartSetFoodsTests(CartViewTestCase):
+    def post(self, items, expectedStatus=200):
+        response = self.client.post(
+            "/api/cart/set", {"items": [{"foodId": foodId, "quantity": quantity} for foodId, quantity in items]},
+            format="json"
+        )
+        self.assertEqual(response.status_code, expectedStatus)
+        return response.data
+
+    def storedItems(self):
+        cartStore.flush(self.customer.id)
+        return dict(CartItem.objects.filter(cart__customer=self.customer).values_list("food_id", "quantity"))
+
+    def test_sets_quantities_instead_of_adding(self):
+        first, second, third = (food.id for food in self.foods)
+        self.post([(first, 2), (second, 3)])
+        self.post([(first, 5), (second, 0)])
+        # غذاهایی که در درخواست نیستند تغییری نمی‌کنند
+        data = self.post([(third, 1)])["data"]
+        self.assertEqual({food["id"]: food["quantity"] for food in data["foods"]}, {first: 5, third: 1})
+        self.assertEqual((data["price"], data["itemCount"]), (5 * 1000 + 3000, 6))
+        self.assertEqual(self.storedItems(), {first: 5, third: 1})
+        cart = Cart.objects.get(customer=self.customer)
+        self.assertEqual((cart.subtotal, cart.itemCount), (8000, 6))
+
+    def test_item_limit(self):
+        foodId = self.foods[0].id
+        self.assertEqual(self.post([(foodId, 1)] * CART_SET_MAX_ITEMS)["data"]["itemCount"], 1)
+        data = self.post([(foodId, 2)] * (CART_SET_MAX_ITEMS + 1), 400)
+        self.assertEqual(data["message"], f"حداکثر {CART_SET_MAX_ITEMS} غذا در هر درخواست پذیرفته می‌شود.")
+        self.assertEqual(self.storedItems(), {foodId: 1})
+
+    def test_rejects_foods_of_another_restaurant(self):
+        first = self.foods[0].id
+        data = self.post([(first, 1), (self.otherFood.id, 1)], 400)
+        self.assertEqual(data["data"], {"otherRestaurant": [self.otherFood.id]})
+
+        self.post([(first, 1)])
+        data = self.post([(self.foods[1].id, 2), (self.otherFood.id, 1)], 400)
+        self.assertEqual(data["message"], "همه غذاهای سبد خرید باید از یک رستوران باشند.")
+        self.assertEqual(self.storedItems(), {first: 1})
+
+        # با حذف غذاهای قبلی در همان درخواست، رستوران سبد عوض می‌شود
+        data = self.post([(first, 0), (self.otherFood.id, 1)])["data"]
+        self.assertEqual(data["restaurant"], self.otherFood.restaurant_id)
+        self.assertEqual(self.storedItems(), {self.otherFood.id: 1})
+
+
+class ReconcileCartTotalsTests(CartViewTestCase):
+    def setUp(self):
+        super().setUp()
+        cartStore.setQuantities(self.customer.id, {self.foods[0].id: 2, self.foods[1].id: 1})
+        cartStore.flush(self.customer.id)
+
+    def test_fixes_totals_after_price_change(self):
+        # تغییر قیمت بدون سیگنال؛ جمع‌های ذخیره‌شده سبد کهنه می‌شوند
+        Food.objects.filter(id=self.foods[0].id).update(price=1500)
+        with self.assertRaises(SystemExit):
+            call_command("reconcile_cart_totals", "--check", stdout=StringIO(), stderr=StringIO())
+
+        call_command("reconcile_cart_totals", stdout=StringIO())
+        cart = Cart.objects.get(customer=self.customer)
+        self.assertEqual(
+            (cart.subtotal, cart.tax, cart.itemCount, cart.restaurant_id),
+            (2 * 1500 + 2000, 500, 3, self.foods[0].restaurant_id)
+        )
+        call_command("reconcile_cart_totals", "--check", stdout=StringIO())
 
-# Create your tests here.
+    def test_resets_totals_of_emptied_cart(self):
+        CartItem.objects.filter(cart__customer=self.customer).delete()
+        call_command("reconcile_cart_totals", stdout=StringIO())
+        cart = Cart.objects.get(customer=self.customer)
+        self.assertEqual((cart.subtotal, cart.tax, cart.itemCount, cart.restaurant_id), (0, 0, 0, None))
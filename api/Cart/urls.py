@@ -1,8 +1,9 @@
 from django.urls import path
-from .views import CartAddFoodView, CartRemoveFoodView, CartListView
+from .views import CartAddFoodView, CartRemoveFoodView, CartListView, CartSetFoodsView
 
 urlpatterns = [
     path('add', CartAddFoodView.as_view(), name='cart-add'),
     path('remove', CartRemoveFoodView.as_view(), name='cart-remove'),
+    path('set', CartSetFoodsView.as_view(), name='cart-set'),
     path('get', CartListView.as_view(), name='cart-list'),
 ]
\ No newline at end of file
@@ -1,68 +1,125 @@
+from functools import wraps
+
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from django.db import transaction
-from .models import Cart, CartItem
 from food.models import Food
-from customer.services import getCustomer
-from food.serializer import FoodSerializer
+from customer.services import getCustomerId
+from restaurant.delivery import deliveryFees
+from services.ResponseCache import getKnownAreaIds
+from .store import CartBusy, cartStore
 
 
 def get_cart_data(cart):
-    """برگرداندن اطلاعات کامل سبد خرید"""
-    items = CartItem.objects.select_related('food', 'food__category').filter(cart=cart)
-    total_price = 0
+    """
+    برگرداندن اطلاعات کامل سبد خرید از روی سبد انبار (Cart/store.py)؛ جمع‌ها از قبل محاسبه شده‌اند و
+    پیش‌فاکتور نمایشی ارسال از ماتریس هزینه ارسال (restaurant/delivery.py) بدون کوئری ساخته می‌شود
+    """
     foods_data = []
-
-    for item in items:
-        food_data = FoodSerializer(item.food).data
-        food_data['quantity'] = item.quantity
+    for item in cart["items"].values():
+        food_data = dict(item["food"])
+        food_data['quantity'] = item["quantity"]
         foods_data.append(food_data)
-        total_price += item.food.price * item.quantity
+
+    delivery = None
+    if cart["restaurantId"] is not None:
+        delivery = deliveryFees.quote(cart["restaurantId"], cart.get("areaId"), cart["subtotal"])
 
     return {
         "foods": foods_data,
-        "tax": int(total_price * 0.10),
-        "price": total_price,
-        "totalPrice": int(total_price * 1.10)
+        "tax": cart["tax"],
+        "price": cart["subtotal"],
+        "totalPrice": int(cart["subtotal"] * 1.10) + ((delivery or {}).get("deliveryFee") or 0),
+        "itemCount": cart["itemCount"],
+        "restaurant": cart["restaurantId"],
+        "delivery": delivery
     }
 
 
+def _getAreaId(request):
+    """منطقه ارسال اختیاری درخواست: (آیدی منطقه یا None، پاسخ خطا یا None)"""
+    area_id = request.data.get('areaId') or request.query_params.get('areaId')
+    if area_id in (None, ''):
+        return None, None
+    if not str(area_id).isdigit() or int(area_id) not in getKnownAreaIds():
+        return None, Response(
+            {"status": "error", "message": "منطقه ارسال یافت نشد."},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    return int(area_id), None
+
+
+def handleCartBusy(view_func):
+    """قفل سبد در مهلت گرفته نشد: به جای تغییر بدون قفل، 409 برمی‌گردد تا کلاینت دوباره تلاش کند"""
+    @wraps(view_func)
+    def wrapper(self, request, *args, **kwargs):
+        try:
+            return view_func(self, request, *args, **kwargs)
+        except CartBusy:
+            return Response(
+                {"status": "error", "message": "سبد خرید در حال به‌روزرسانی است؛ دوباره تلاش کنید."},
+                status=status.HTTP_409_CONFLICT
+            )
+    return wrapper
+
+
+# حداکثر ردیف‌های یک درخواست /cart/set
+CART_SET_MAX_ITEMS = 100
+
+
+def _parseQuantities(items):
+    """لیست [{foodId, quantity}] ← ({foodId: quantity}, None) یا (None, پیام خطا)"""
+    if not isinstance(items, list) or not items:
+        return None, "لیست items الزامی است."
+    if len(items) > CART_SET_MAX_ITEMS:
+        return None, f"حداکثر {CART_SET_MAX_ITEMS} غذا در هر درخواست پذیرفته می‌شود."
+    quantities = {}
+    for item in items:
+        if not isinstance(item, dict) or not str(item.get("foodId", "")).isdigit():
+            return None, "آیدی غذا معتبر نیست."
+        if not str(item.get("quantity", "")).isdigit():
+            return None, "تعداد غذا باید عدد صحیح نامنفی باشد."
+        quantities[int(item["foodId"])] = int(item["quantity"])
+    return quantities, None
+
+
+def _getFoodId(request):
+    food_id = str(request.data.get('foodId') or '')
+    return int(food_id) if food_id.isdigit() else None
+
+
 class CartAddFoodView(APIView):
+    @handleCartBusy
     def post(self, request):
-        customer = getCustomer(request)
-        if not customer:
+        customer_id = getCustomerId(request)
+        if not customer_id:
             return Response(
                 {"status": "error", "message": "مشتری وارد نشده است."},
                 status=status.HTTP_401_UNAUTHORIZED
             )
 
-        food_id = request.data.get('foodId')
-        if not food_id:
+        if not request.data.get('foodId'):
             return Response(
                 {"status": "error", "message": "پارامتر foodId الزامی است."},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        try:
-            food = Food.objects.get(id=food_id)
-        except Food.DoesNotExist:
+        area_id, area_error = _getAreaId(request)
+        if area_error:
+            return area_error
+
+        food_id = _getFoodId(request)
+        cart, added = cartStore.addFood(customer_id, food_id, areaId=area_id) if food_id else (None, False)
+        if not added:
             return Response(
                 {"status": "not_found", "message": "غذا یافت نشد."},
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        with transaction.atomic():
-            cart, _ = Cart.objects.get_or_create(customer=customer)
-            cart_item, created = CartItem.objects.get_or_create(cart=cart, food=food)
-            if not created:
-                cart_item.quantity += 1
-                cart_item.save()
-
         return Response(
             {
                 "status": "success",
-                "message": f"{food.name} به سبد خرید اضافه شد.",
+                "message": f"{cart['items'][food_id]['food']['name']} به سبد خرید اضافه شد.",
                 "data": get_cart_data(cart)
             },
             status=status.HTTP_200_OK
@@ -70,49 +127,90 @@ class CartAddFoodView(APIView):
 
 
 class CartRemoveFoodView(APIView):
+    @handleCartBusy
     def post(self, request):
-        customer = getCustomer(request)
-        if not customer:
+        customer_id = getCustomerId(request)
+        if not customer_id:
             return Response(
                 {"status": "error", "message": "مشتری وارد نشده است."},
                 status=status.HTTP_401_UNAUTHORIZED
             )
 
-        food_id = request.data.get('foodId')
-        if not food_id:
+        if not request.data.get('foodId'):
             return Response(
                 {"status": "error", "message": "پارامتر foodId الزامی است."},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        try:
-            food = Food.objects.get(id=food_id)
-        except Food.DoesNotExist:
+        area_id, area_error = _getAreaId(request)
+        if area_error:
+            return area_error
+
+        food_id = _getFoodId(request)
+        cart, item = cartStore.removeFood(customer_id, food_id, areaId=area_id)
+        if item is None:
+            # فقط در مسیر خطا سراغ دیتابیس می‌رویم تا غذای ناموجود از غذای خارج از سبد جدا شود
+            if not food_id or not Food.objects.filter(id=food_id).exists():
+                return Response(
+                    {"status": "not_found", "message": "غذا یافت نشد."},
+                    status=status.HTTP_404_NOT_FOUND
+                )
             return Response(
-                {"status": "not_found", "message": "غذا یافت نشد."},
-                status=status.HTTP_404_NOT_FOUND
+                {"status": "error", "message": "این غذا در سبد خرید وجود ندارد."},
+                status=status.HTTP_400_BAD_REQUEST
             )
 
-        try:
-            cart = Cart.objects.get(customer=customer)
-            cart_item = CartItem.objects.get(cart=cart, food=food)
-        except (Cart.DoesNotExist, CartItem.DoesNotExist):
+        return Response(
+            {
+                "status": "success",
+                "message": f"{item['food']['name']} از سبد خرید حذف شد.",
+                "data": get_cart_data(cart)
+            },
+            status=status.HTTP_200_OK
+        )
+
+
+class CartSetFoodsView(APIView):
+    @handleCartBusy
+    def post(self, request):
+        customer_id = getCustomerId(request)
+        if not customer_id:
             return Response(
-                {"status": "error", "message": "این غذا در سبد خرید وجود ندارد."},
+                {"status": "error", "message": "مشتری وارد نشده است."},
+                status=status.HTTP_401_UNAUTHORIZED
+            )
+
+        quantities, error = _parseQuantities(request.data.get('items'))
+        if error:
+            return Response(
+                {"status": "error", "message": error},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        with transaction.atomic():
-            if cart_item.quantity > 1:
-                cart_item.quantity -= 1
-                cart_item.save()
-            else:
-                cart_item.delete()
+        area_id, area_error = _getAreaId(request)
+        if area_error:
+            return area_error
+
+        cart, missing, other_restaurant = cartStore.setQuantities(customer_id, quantities, areaId=area_id)
+        if missing:
+            return Response(
+                {"status": "not_found", "message": "غذا یافت نشد.", "data": {"notFound": missing}},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        if other_restaurant:
+            return Response(
+                {
+                    "status": "error",
+                    "message": "همه غذاهای سبد خرید باید از یک رستوران باشند.",
+                    "data": {"otherRestaurant": other_restaurant}
+                },
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
         return Response(
             {
                 "status": "success",
-                "message": f"{food.name} از سبد خرید حذف شد.",
+                "message": "سبد خرید به‌روز شد.",
                 "data": get_cart_data(cart)
             },
             status=status.HTTP_200_OK
@@ -120,21 +218,24 @@ class CartRemoveFoodView(APIView):
 
 
 class CartListView(APIView):
+    @handleCartBusy
     def get(self, request):
-        customer = getCustomer(request)
-        if not customer:
+        customer_id = getCustomerId(request)
+        if not customer_id:
             return Response(
                 {"status": "error", "message": "مشتری وارد نشده است."},
                 status=status.HTTP_401_UNAUTHORIZED
             )
 
-        cart, _ = Cart.objects.get_or_create(customer=customer)
+        area_id, area_error = _getAreaId(request)
+        if area_error:
+            return area_error
 
         return Response(
             {
                 "status": "success",
                 "message": "لیست سبد خرید دریافت شد.",
-                "data": get_cart_data(cart)
+                "data": get_cart_data(cartStore.get(customer_id, area_id))
             },
             status=status.HTTP_200_OK
         )
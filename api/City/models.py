@@ -2,5 +2,7 @@ from django.db import models
 
 class City(models.Model):
     name = models.CharField(max_length=100, unique=True)
+    # در مهر ETag پاسخ‌هایی که نام شهر را دارند
+    updatedAt = models.DateTimeField(auto_now=True)
     def __str__(self):
         return self.name
@@ -0,0 +1,13 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from services.ResponseCache import CATALOG_SCOPE, CITIES_SCOPE, bumpScopes
+from .models import City
+
+
+@receiver(post_save, sender=City)
+@receiver(post_delete, sender=City)
+def invalidateCityResponses(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    bumpScopes([CITIES_SCOPE, CATALOG_SCOPE])
@@ -1,9 +1,11 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
+from services.ResponseCache import CITIES_SCOPE, cacheResponse
 from .models import City
 
 class GetAllCitiesView(APIView):
+    @cacheResponse('cities', scopes=lambda request: [CITIES_SCOPE])
     def get(self, request):
         cities = City.objects.all().values("id", "name")
         return Response({
@@ -4,6 +4,8 @@ from django.db import models
 class FoodCategory(models.Model):
     name = models.CharField(max_length=100, unique=True)
     description = models.TextField(blank=True, null=True)
+    # در مهر ETag پاسخ‌هایی که نام دسته‌بندی را دارند
+    updatedAt = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.name
\ No newline at end of file
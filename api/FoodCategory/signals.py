@@ -0,0 +1,13 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from services.ResponseCache import CATALOG_SCOPE, CATEGORIES_SCOPE, bumpScopes
+from .models import FoodCategory
+
+
+@receiver(post_save, sender=FoodCategory)
+@receiver(post_delete, sender=FoodCategory)
+def invalidateFoodCategoryResponses(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    bumpScopes([CATEGORIES_SCOPE, CATALOG_SCOPE])
@@ -1,9 +1,11 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
+from services.ResponseCache import CATEGORIES_SCOPE, cacheResponse
 from .models import FoodCategory
 
 class GetAllFoodCategoriesView(APIView):
+    @cacheResponse('foodCategories', scopes=lambda request: [CATEGORIES_SCOPE])
     def get(self, request):
         categories = FoodCategory.objects.all().values("id", "name", "description")
         return Response({
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Order, OrderItem
+from .models import Order, OrderItem, OrderStatusHistory
 
 
 class OrderItemInline(admin.TabularInline):
@@ -10,6 +10,14 @@ class OrderItemInline(admin.TabularInline):
     can_delete = False
 
 
+class OrderStatusHistoryInline(admin.TabularInline):
+    model = OrderStatusHistory
+    extra = 0
+    fields = ("fromStatus", "toStatus", "changedBy", "createdAt")
+    readonly_fields = ("fromStatus", "toStatus", "changedBy", "createdAt")
+    can_delete = False
+
+
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
     list_display = ("id", "customer", "restaurant", "status", "totalPrice", "createdAt", "updatedAt")
@@ -17,7 +25,7 @@ class OrderAdmin(admin.ModelAdmin):
     search_fields = ("customer__email", "restaurant__name")
     readonly_fields = ("createdAt", "updatedAt", "paymentCode")
     ordering = ("-createdAt",)
-    inlines = [OrderItemInline]
+    inlines = [OrderItemInline, OrderStatusHistoryInline]
 
     fieldsets = (
         ("اطلاعات سفارش", {
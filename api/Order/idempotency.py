@@ -0,0 +1,109 @@
+import hashlib
+import logging
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from customer.services import getCustomerId
+from .models import IdempotencyKey
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+logger = logging.getLogger(__name__)
+
+
+def _replay(record, endpoint, requestHash):
+    if record.endpoint != endpoint or record.requestHash != requestHash:
+        return Response(
+            {"status": "error", "message": "این Idempotency-Key برای درخواست دیگری استفاده شده است."},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY
+        )
+    if record.response is None:
+        return Response(
+            {"status": "error", "message": "درخواست قبلی با این Idempotency-Key هنوز در حال انجام است."},
+            status=status.HTTP_409_CONFLICT
+        )
+    return Response(record.response, status=record.statusCode, headers={REPLAYED_HEADER: "true"})
+
+
+def _release(record):
+    # اگر حذف هم ممکن نباشد، کلید بعد از IDEMPOTENCY_CLAIM_TIMEOUT منقضی و آزاد می‌شود
+    try:
+        record.delete()
+    except DatabaseError:
+        logger.exception("آزاد کردن Idempotency-Key %s ممکن نشد", record.key)
+
+
+def idempotent(endpoint):
+    """
+    تکرار امن درخواست مشتری با هدر اختیاری Idempotency-Key: کلید قبل از اجرای view برای (مشتری، کلید) ثبت و
+    پاسخ آن بعد از اجرا ذخیره می‌شود، پس درخواست تکراری با یک کوئری همان پاسخ را می‌گیرد و view دو بار اجرا
+    نمی‌شود. پاسخ‌های 5xx ذخیره نمی‌شوند تا درخواست با همان کلید دوباره قابل اجرا باشد؛ کلیدی که پاسخش ذخیره
+    نشود (مثلا خطای دیتابیس بعد از اجرای view) آزاد می‌شود و در بدترین حالت بعد از IDEMPOTENCY_CLAIM_TIMEOUT
+    منقضی می‌شود.
+    بعد از require_authorization_customer استفاده شود.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(self, request, *args, **kwargs):
+            key = request.headers.get(IDEMPOTENCY_HEADER)
+            if not key:
+                return view_func(self, request, *args, **kwargs)
+            if len(key) > 255:
+                return Response(
+                    {"status": "error", "message": "Idempotency-Key حداکثر ۲۵۵ کاراکتر است."},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            customerId = getCustomerId(request)
+            requestHash = hashlib.sha256(request.body).hexdigest()
+            now = timezone.now()
+            record = IdempotencyKey.objects.filter(customer_id=customerId, key=key).first()
+            if record is not None and record.expiresAt > now:
+                return _replay(record, endpoint, requestHash)
+            if record is not None:
+                record.delete()
+
+            try:
+                with transaction.atomic():
+                    record = IdempotencyKey.objects.create(
+                        customer_id=customerId,
+                        key=key,
+                        endpoint=endpoint,
+                        requestHash=requestHash,
+                        expiresAt=now + timedelta(seconds=settings.IDEMPOTENCY_CLAIM_TIMEOUT)
+                    )
+            except IntegrityError:
+                # درخواست هم‌زمان دیگری همین کلید را ثبت کرده است
+                record = IdempotencyKey.objects.filter(customer_id=customerId, key=key).first()
+                if record is None:
+                    raise
+                return _replay(record, endpoint, requestHash)
+
+            try:
+                response = view_func(self, request, *args, **kwargs)
+            except Exception:
+                _release(record)
+                raise
+            if response.status_code >= 500 or not isinstance(response, Response):
+                _release(record)
+                return response
+            try:
+                IdempotencyKey.objects.filter(id=record.id).update(
+                    statusCode=response.status_code,
+                    response=response.data,
+                    expiresAt=timezone.now() + timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL)
+                )
+            except DatabaseError:
+                # کار view انجام شده است؛ پاسخ به مشتری برمی‌گردد و فقط امکان تکرار امن از دست می‌رود
+                logger.exception("ذخیره پاسخ Idempotency-Key %s ممکن نشد", key)
+                _release(record)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from Order.models import IdempotencyKey
+
+
+class Command(BaseCommand):
+    help = "حذف پاسخ‌های ذخیره‌شده Idempotency-Key که مدت نگهداری آن‌ها تمام شده است"
+
+    def handle(self, *args, **options):
+        deleted, _ = IdempotencyKey.objects.filter(expiresAt__lte=timezone.now()).delete()
+        self.stdout.write(self.style.SUCCESS(f"{deleted} کلید منقضی حذف شد."))
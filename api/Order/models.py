@@ -20,6 +20,8 @@ class Order(models.Model):
     paymentCode = models.IntegerField(unique=True)
     totalPrice = models.PositiveIntegerField(default=0)
     tax = models.PositiveIntegerField(default=0)
+    # هزینه ارسال به منطقه سبد هنگام ثبت سفارش (در totalPrice هم حساب شده است)
+    deliveryFee = models.PositiveIntegerField(default=0)
     createdAt = models.DateTimeField(auto_now_add=True)
     updatedAt = models.DateTimeField(auto_now=True)
 
@@ -45,3 +47,54 @@ class OrderItem(models.Model):
         }
     def __str__(self):
         return f"{self.foodName} x {self.quantity}"
+
+
+class OrderStatusHistory(models.Model):
+    """
+    هر تغییر وضعیت سفارش (Order/transitions.py) یک ردیف؛ در همان تراکنش UPDATE وضعیت نوشته می‌شود. ردیف اول
+    (fromStatus و toStatus برابر) در تراکنش ثبت سفارش نوشته می‌شود.
+    """
+    CHANGED_BY_CHOICES = [
+        ('customer', 'مشتری'),
+        ('restaurantManager', 'مدیر رستوران'),
+    ]
+
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='statusHistory')
+    fromStatus = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    toStatus = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    changedBy = models.CharField(max_length=20, choices=CHANGED_BY_CHOICES)
+    createdAt = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Order {self.order_id}: {self.fromStatus} → {self.toStatus}"
+
+
+class IdempotencyKey(models.Model):
+    """
+    پاسخ ذخیره‌شده درخواست‌های دارای هدر Idempotency-Key (Order/idempotency.py)؛ تکرار درخواست با همان کلید
+    تا expiresAt همین پاسخ را می‌گیرد. response خالی یعنی درخواست اول هنوز در حال انجام است و expiresAt
+    تا ذخیره پاسخ فقط IDEMPOTENCY_CLAIM_TIMEOUT جلوتر است.
+    """
+    customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name='idempotencyKeys')
+    key = models.CharField(max_length=255)
+    endpoint = models.CharField(max_length=100)
+    # هش بدنه درخواست اول تا استفاده از یک کلید برای درخواست دیگر رد شود
+    requestHash = models.CharField(max_length=64)
+    statusCode = models.PositiveSmallIntegerField(null=True, blank=True)
+    response = models.JSONField(null=True, blank=True)
+    createdAt = models.DateTimeField(auto_now_add=True)
+    expiresAt = models.DateTimeField(db_index=True)
+
+    class Meta:
+        unique_together = ('customer', 'key')
+
+    def __str__(self):
+        return f"{self.endpoint} {self.key} ({self.customer_id})"
+
+
+class PaymentCodeSequence(models.Model):
+    """
+    شمارنده تک‌ردیفی کدهای پرداخت (Order/paymentCodes.py)؛ هر فرایند یک بلوک از شماره‌ها را با یک UPDATE
+    رزرو می‌کند و کد هر شماره با جایگشت کلیددار ساخته می‌شود
+    """
+    next = models.PositiveBigIntegerField(default=0)
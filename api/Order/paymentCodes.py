@@ -0,0 +1,92 @@
+import hashlib
+import hmac
+import threading
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+from .models import Order, PaymentCodeSequence
+
+# کدهای 5 رقمی (10000 تا 99999) اول مصرف می‌شوند، بعد 6 رقمی و ...؛ بیشترین طول با IntegerField نه رقم است
+FIRST_CODE_DIGITS = 5
+MAX_CODE_DIGITS = 9
+FEISTEL_ROUNDS = 4
+
+
+def _codeRange(sequence):
+    """شماره ترتیبی ← (تعداد رقم، شماره داخل بازه کدهای همان تعداد رقم، اندازه بازه)"""
+    digits = FIRST_CODE_DIGITS
+    capacity = 9 * 10 ** (digits - 1)
+    while sequence >= capacity:
+        sequence -= capacity
+        digits += 1
+        capacity = 9 * 10 ** (digits - 1)
+    if digits > MAX_CODE_DIGITS:
+        raise OverflowError("کدهای پرداخت تمام شده است.")
+    return digits, sequence, capacity
+
+
+def _feistel(value, halfBits, digits):
+    mask = (1 << halfBits) - 1
+    left, right = value >> halfBits, value & mask
+    key = settings.PAYMENT_CODE_KEY.encode()
+    for roundIndex in range(FEISTEL_ROUNDS):
+        digest = hmac.new(key, f"{digits}:{roundIndex}:{right}".encode(), hashlib.sha256).digest()
+        left, right = right, left ^ (int.from_bytes(digest[:8], "big") & mask)
+    return (left << halfBits) | right
+
+
+def permute(value, capacity, digits):
+    """
+    جایگشت کلیددار [0, capacity): شبکه Feistel روی کوچک‌ترین دامنه 4^k بزرگ‌تر یا مساوی capacity و
+    تکرار آن تا خروجی داخل بازه بیفتد (cycle walking)؛ چون دامنه کمتر از 4 برابر بازه است تکرار کم است
+    """
+    halfBits = max(1, ((capacity - 1).bit_length() + 1) // 2)
+    value = _feistel(value, halfBits, digits)
+    while value >= capacity:
+        value = _feistel(value, halfBits, digits)
+    return value
+
+
+def paymentCodeFor(sequence):
+    """کد پرداخت شماره ترتیبی sequence؛ شماره‌های متفاوت همیشه کدهای متفاوت دارند"""
+    digits, index, capacity = _codeRange(sequence)
+    return 10 ** (digits - 1) + permute(index, capacity, digits)
+
+
+class PaymentCodeAllocator:
+    """
+    تخصیص کد پرداخت بدون برخورد و بدون تلاش دوباره: هر فرایند با یک UPDATE روی PaymentCodeSequence بلوکی از
+    PAYMENT_CODE_BLOCK_SIZE شماره رزرو می‌کند و کد هر شماره جایگشت کلیددار آن است، پس کدها قابل حدس نیستند.
+    رزرو باید بیرون از تراکنش سفارش انجام شود تا rollback سفارش شمارنده را برنگرداند و قفل ردیف آن تا پایان
+    ثبت سفارش نگه داشته نشود؛ شماره‌های رزروشده‌ای که با خاموش شدن فرایند استفاده نمی‌شوند فقط هدر می‌روند.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.next = 0
+        self.end = 0
+
+    def _reserve(self, size):
+        if transaction.get_connection().in_atomic_block:
+            raise RuntimeError("کد پرداخت باید بیرون از تراکنش رزرو شود.")
+        with transaction.atomic():
+            if not PaymentCodeSequence.objects.filter(id=1).update(next=F("next") + size):
+                # اولین رزرو: اگر سفارش‌هایی با کدهای تصادفی قبلی وجود دارند از کدهای 6 رقمی شروع می‌کنیم
+                start = 9 * 10 ** (FIRST_CODE_DIGITS - 1) if Order.objects.exists() else 0
+                PaymentCodeSequence.objects.get_or_create(id=1, defaults={"next": start})
+                PaymentCodeSequence.objects.filter(id=1).update(next=F("next") + size)
+            end = PaymentCodeSequence.objects.values_list("next", flat=True).get(id=1)
+        return end - size, end
+
+    def allocate(self):
+        with self.lock:
+            if self.next >= self.end:
+                self.next, self.end = self._reserve(settings.PAYMENT_CODE_BLOCK_SIZE)
+            sequence = self.next
+            self.next += 1
+        return paymentCodeFor(sequence)
+
+
+paymentCodes = PaymentCodeAllocator()
@@ -1,3 +1,227 @@
-from django.test import TestCase
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.sessions.backends.signed_cookies import SessionStore
+from django.db import DatabaseError, connection, reset_queries, transaction
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.response import Response
+from rest_framework.test import APIClient
+
+from Area.models import Area
+from City.models import City
+from customer.models import Customer
+from food.models import Food
+from FoodCategory.models import FoodCategory
+from restaurant.delivery import setAreaDeliveryFees
+from restaurant.models import Restaurant, RestaurantAreaDeliveryFee
+from restaurantManager.models import RestaurantManager
+from .idempotency import IDEMPOTENCY_HEADER, REPLAYED_HEADER, idempotent
+from .models import IdempotencyKey, Order, OrderStatusHistory, PaymentCodeSequence
+from .paymentCodes import FIRST_CODE_DIGITS, MAX_CODE_DIGITS, PaymentCodeAllocator, paymentCodeFor
+from .transitions import CUSTOMER
+
+
+class _View:
+    def __init__(self):
+        self.calls = 0
+
+    @idempotent("order/add")
+    def post(self, request):
+        self.calls += 1
+        return Response({"status": "success", "data": {"call": self.calls}}, status=201)
+
+
+class IdempotencyTests(TestCase):
+    def setUp(self):
+        self.customer = Customer.objects.create(email="c@x.com", firstName="a", lastName="b", isVerified=True)
+        self.view = _View()
+
+    def post(self, key="key-1"):
+        request = RequestFactory().post(
+            "/api/order/add", {"cartId": 1}, content_type="application/json", headers={IDEMPOTENCY_HEADER: key}
+        )
+        request.session = SessionStore()
+        request.session["customer_login"] = {"id": self.customer.id}
+        return self.view.post(request)
+
+    def test_repeated_request_replays_stored_response(self):
+        first = self.post()
+        second = self.post()
+        self.assertEqual(self.view.calls, 1)
+        self.assertEqual(second.status_code, 201)
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(second[REPLAYED_HEADER], "true")
+
+    def test_claim_is_released_when_storing_response_fails(self):
+        with mock.patch("Order.idempotency.IdempotencyKey.objects.filter") as filter, \
+                self.assertLogs("Order.idempotency", "ERROR"):
+            filter.return_value.first.return_value = None
+            filter.return_value.update.side_effect = DatabaseError("connection lost")
+            self.assertEqual(self.post().status_code, 201)
+        self.assertFalse(IdempotencyKey.objects.exists())
+        # کلید آزاد است و تکرار درخواست به جای 409 دوباره اجرا می‌شود
+        self.assertEqual(self.post().data["data"], {"call": 2})
+
+    def test_abandoned_claim_expires(self):
+        IdempotencyKey.objects.create(
+            customer=self.customer, key="key-1", endpoint="order/add",
+            requestHash="x", expiresAt=timezone.now() - timedelta(seconds=1)
+        )
+        response = self.post()
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.view.calls, 1)
+
+
+class PaymentCodeTests(SimpleTestCase):
+    FIRST_RANGE = 9 * 10 ** (FIRST_CODE_DIGITS - 1)
+
+    def test_permutation_is_bijection_over_five_digit_codes(self):
+        codes = {paymentCodeFor(sequence) for sequence in range(self.FIRST_RANGE)}
+        self.assertEqual(codes, set(range(10 ** (FIRST_CODE_DIGITS - 1), 10 ** FIRST_CODE_DIGITS)))
+
+    def test_moves_to_six_digits_after_five_digit_codes_are_used(self):
+        self.assertEqual(len(str(paymentCodeFor(self.FIRST_RANGE - 1))), FIRST_CODE_DIGITS)
+        codes = [paymentCodeFor(self.FIRST_RANGE + sequence) for sequence in range(1000)]
+        self.assertEqual({len(str(code)) for code in codes}, {FIRST_CODE_DIGITS + 1})
+        self.assertEqual(len(set(codes)), len(codes))
+
+    def test_raises_when_all_codes_are_used(self):
+        total = sum(9 * 10 ** (digits - 1) for digits in range(FIRST_CODE_DIGITS, MAX_CODE_DIGITS + 1))
+        self.assertEqual(len(str(paymentCodeFor(total - 1))), MAX_CODE_DIGITS)
+        with self.assertRaises(OverflowError):
+            paymentCodeFor(total)
+
+
+@override_settings(PAYMENT_CODE_BLOCK_SIZE=3)
+class PaymentCodeAllocatorTests(TransactionTestCase):
+    FIRST_RANGE = PaymentCodeTests.FIRST_RANGE
+
+    def test_blocks_of_different_processes_do_not_overlap(self):
+        # هر allocator نقش یک فرایند جدا را دارد و بلوک‌ها یکی در میان رزرو می‌شوند
+        allocators = [PaymentCodeAllocator() for _ in range(3)]
+        codes = [allocator.allocate() for _ in range(7) for allocator in allocators]
+        self.assertEqual(len(set(codes)), len(codes))
+        # هر allocator سه بلوک سه‌تایی رزرو کرده است و شماره‌های استفاده‌نشده آخرین بلوک هدر می‌روند
+        self.assertEqual(PaymentCodeSequence.objects.get(id=1).next, 3 * 3 * 3)
+        self.assertLessEqual(set(codes), {paymentCodeFor(sequence) for sequence in range(3 * 3 * 3)})
+
+    def test_starts_after_five_digit_codes_when_legacy_orders_exist(self):
+        customer = Customer.objects.create(email="c@x.com", firstName="a", lastName="b", isVerified=True)
+        # کد تصادفی قبلی که ممکن است با کدهای 5 رقمی جدید برخورد کند
+        Order.objects.create(customer=customer, paymentCode=paymentCodeFor(0))
+        code = PaymentCodeAllocator().allocate()
+        self.assertEqual(code, paymentCodeFor(self.FIRST_RANGE))
+        self.assertEqual(len(str(code)), FIRST_CODE_DIGITS + 1)
+
+    def test_refuses_to_reserve_inside_transaction(self):
+        with transaction.atomic(), self.assertRaises(RuntimeError):
+            PaymentCodeAllocator().allocate()
+        self.assertFalse(PaymentCodeSequence.objects.exists())
+
+
+# کد پرداخت بیرون از تراکنش رزرو می‌شود، پس ثبت سفارش داخل تراکنش TestCase ممکن نیست؛ worker های صف ایمیل
+# بعد از commit روشن نمی‌شوند تا هم‌زمان با پاک شدن دیتابیس تست به آن دسترسی نداشته باشند
+@override_settings(EMAIL_OUTBOX_WORKERS=0)
+class OrderTestCase(TransactionTestCase):
+    def setUp(self):
+        city = City.objects.create(name="Tehran")
+        manager = RestaurantManager.objects.create(email="m@x.com", firstName="a", lastName="b", isVerified=True)
+        self.restaurant = Restaurant.objects.create(
+            owner=manager, name="rest", address="addr addr addr", city=city, phoneNumber="09120000000",
+            startWorkHour=8, endWorkHour=22, isVerified=True
+        )
+        self.category = FoodCategory.objects.create(name="c")
+        self.foods = []
+        self.addFoods(1)
+        customer = Customer.objects.create(email="c@x.com", firstName="a", lastName="b", isVerified=True)
+        self.client = APIClient()
+        session = self.client.session
+        session["customer_login"] = {"id": customer.id, "email": customer.email}
+        session.save()
+
+    def addFoods(self, count):
+        for _ in range(count):
+            self.foods.append(Food.objects.create(
+                name=f"food{len(self.foods)}", price=1000, category=self.category, isAvailable=True,
+                restaurant=self.restaurant
+            ))
+
+    def fillCart(self, lines, **data):
+        response = self.client.post(
+            "/api/cart/set", {"items": [{"foodId": food.id, "quantity": 1} for food in self.foods[:lines]], **data},
+            format="json"
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def createOrder(self, expectedStatus=201):
+        response = self.client.get("/api/order/add")
+        self.assertEqual(response.status_code, expectedStatus)
+        return response
+
+
+class OrderStatusHistoryTests(OrderTestCase):
+    def test_created_order_starts_with_history_row(self):
+        self.fillCart(1)
+        orderId = self.createOrder().data["data"]["orderId"]
+        self.assertEqual(
+            list(OrderStatusHistory.objects.filter(order_id=orderId).values_list("fromStatus", "toStatus", "changedBy")),
+            [("waitingForPayment", "waitingForPayment", CUSTOMER)]
+        )
+
+
+class OrderDeliveryFeeTests(OrderTestCase):
+    def setUp(self):
+        super().setUp()
+        self.area = Area.objects.create(name="A1", city=self.restaurant.city)
+        self.unservedArea = Area.objects.create(name="A2", city=self.restaurant.city)
+        Restaurant.objects.filter(id=self.restaurant.id).update(deliveryFeeBase=500, freeDeliveryThreshold=3000)
+        self.restaurant.areas.add(self.area)
+        setAreaDeliveryFees(self.restaurant, {self.area.id: 200})
+        self.addFoods(2)
+
+    def test_charges_fee_read_from_database(self):
+        self.fillCart(1, areaId=self.area.id)
+        # ماتریس هزینه ارسال این worker هنوز هزینه قبلی را دارد
+        RestaurantAreaDeliveryFee.objects.filter(restaurant=self.restaurant).update(fee=300)
+        data = self.createOrder().data["data"]
+        self.assertEqual(data["deliveryFee"], 300)
+        self.assertEqual(data["totalPrice"], int(1000 * 1.1) + 300)
+
+    def test_uses_base_fee_without_area_and_free_delivery_above_threshold(self):
+        self.fillCart(1)
+        self.assertEqual(self.createOrder().data["data"]["deliveryFee"], 500)
+        self.fillCart(3, areaId=self.area.id)
+        data = self.createOrder().data["data"]
+        self.assertEqual(data["deliveryFee"], 0)
+        self.assertEqual(data["totalPrice"], int(3000 * 1.1))
+
+    def test_rejects_unserved_area(self):
+        self.fillCart(1, areaId=self.unservedArea.id)
+        response = self.createOrder(400)
+        self.assertEqual(response.data["message"], "این رستوران به منطقه انتخاب‌شده ارسال ندارد.")
+        self.assertFalse(Order.objects.exists())
+
+
+class CreateOrderQueryCountTests(OrderTestCase):
+    """تعداد کوئری‌های ثبت سفارش به تعداد ردیف‌های سبد بستگی ندارد"""
+
+    def test_query_count_does_not_depend_on_cart_size(self):
+        self.addFoods(39)
+        # سفارش اول بلوک کدهای پرداخت را رزرو می‌کند
+        self.fillCart(1)
+        self.createOrder()
+
+        # شروع هر درخواست لاگ کوئری‌ها را خالی می‌کند، پس شمارش از لاگ خالی شروع می‌شود
+        self.fillCart(1)
+        reset_queries()
+        with CaptureQueriesContext(connection) as context:
+            self.createOrder()
+        expected = len(context)
+        for lines in (5, 20, 40):
+            self.fillCart(lines)
+            reset_queries()
+            with self.subTest(lines=lines), self.assertNumQueries(expected):
+                response = self.createOrder()
+            self.assertEqual(len(response.data["data"]["items"]), lines)
@@ -0,0 +1,57 @@
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Order, OrderStatusHistory
+
+CUSTOMER = "customer"
+RESTAURANT_MANAGER = "restaurantManager"
+
+# جدول تغییر وضعیت‌ها: (تغییردهنده، وضعیت جدید) ← وضعیت‌هایی که سفارش می‌تواند از آن‌ها به وضعیت جدید برود
+TRANSITIONS = {
+    (CUSTOMER, "processing"): ("waitingForPayment",),
+    (CUSTOMER, "canceled"): ("waitingForPayment", "processing"),
+    (RESTAURANT_MANAGER, "preparing"): ("processing",),
+    (RESTAURANT_MANAGER, "delivering"): ("processing", "preparing"),
+    (RESTAURANT_MANAGER, "completed"): ("preparing", "delivering"),
+    (RESTAURANT_MANAGER, "canceled"): ("waitingForPayment", "processing", "preparing"),
+}
+
+# مهلت لغو سفارش توسط مشتری از زمان ثبت
+CUSTOMER_CANCEL_WINDOW = timedelta(minutes=15)
+
+
+def allowedStatuses(changedBy):
+    """وضعیت‌هایی که changedBy می‌تواند سفارش را به آن‌ها ببرد"""
+    return [toStatus for actor, toStatus in TRANSITIONS if actor == changedBy]
+
+
+def canTransition(order, toStatus, changedBy):
+    return order.status in TRANSITIONS.get((changedBy, toStatus), ())
+
+
+def transitionOrder(order, toStatus, changedBy, conditions=None, onTransition=None):
+    """
+    تغییر وضعیت با یک UPDATE شرطی (WHERE status IN وضعیت‌های مجاز جدول) به جای خواندن، بررسی و save کل ردیف؛
+    اگر درخواست هم‌زمان دیگری وضعیت را عوض کرده باشد هیچ ردیفی تغییر نمی‌کند و False برمی‌گردد.
+    conditions شرط‌های اضافه UPDATE است. onTransition (مثلا ثبت ایمیل در صف) در همان تراکنش صدا زده می‌شود؛
+    ارسال واقعی ایمیل بیرون از تراکنش است، پس قفل ردیف سفارش فقط تا پایان همین چند دستور نگه داشته می‌شود.
+    """
+    fromStatuses = TRANSITIONS[(changedBy, toStatus)]
+    with transaction.atomic():
+        updated = Order.objects.filter(id=order.id, status__in=fromStatuses, **(conditions or {})).update(
+            status=toStatus, updatedAt=timezone.now()
+        )
+        if not updated:
+            return False
+        # ردیف سفارش تا پایان تراکنش قفل است، پس آخرین ردیف تاریخچه همان وضعیت قبل از این UPDATE است
+        # (سفارش‌های قدیمی بدون تاریخچه: وضعیتی که درخواست خوانده است)
+        fromStatus = OrderStatusHistory.objects.filter(order_id=order.id).order_by('-id').values_list(
+            'toStatus', flat=True
+        ).first() or order.status
+        OrderStatusHistory.objects.create(order_id=order.id, fromStatus=fromStatus, toStatus=toStatus, changedBy=changedBy)
+        order.status = toStatus
+        if onTransition:
+            onTransition()
+    return True
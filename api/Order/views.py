@@ -1,5 +1,3 @@
-import random
-from datetime import timedelta
 from django.utils import timezone
 from rest_framework.views import APIView
 from rest_framework.response import Response
@@ -10,63 +8,85 @@ import restaurant
 from utilities.sendEmailFunctions.utilities import SendPaymentCode, SendPaymentSuccess, SendStatusOrder
 from restaurantManager.services import getRestaurantManager
 from services.Authorization import require_authorization_manager, require_authorization_customer
-from .models import Order, OrderItem
+from .models import Order, OrderItem, OrderStatusHistory
+from .paymentCodes import paymentCodes
+from .idempotency import idempotent
+from .transitions import (
+    CUSTOMER, CUSTOMER_CANCEL_WINDOW, RESTAURANT_MANAGER, allowedStatuses, canTransition, transitionOrder
+)
 from Cart.models import Cart, CartItem
-from food.serializer import FoodSerializer
+from Cart.store import cartStore
 from customer.services import getCustomer
+from restaurant.delivery import quoteFromDb
+
+
+def _conflict():
+    # UPDATE شرطی هیچ ردیفی را تغییر نداد: درخواست هم‌زمان دیگری وضعیت سفارش را عوض کرده است
+    return Response({"status": "error", "message": "وضعیت سفارش هم‌زمان تغییر کرده است؛ دوباره تلاش کنید."},
+                    status=status.HTTP_409_CONFLICT)
 
-def getCartData(cart):
-    items = CartItem.objects.select_related('food').filter(cart=cart)
-    total_price = 0
-    foods_data = []
-    for item in items:
-        food_data = FoodSerializer(item.food).data
-        food_data['quantity'] = item.quantity
-        foods_data.append(food_data)
-        total_price += item.food.price * item.quantity
-    return foods_data, total_price, int(total_price*0.10), int(total_price*1.10)
 
 # -----------------------------
 # 1️⃣ ایجاد سفارش و خالی کردن سبد خرید
 # -----------------------------
 class CreateOrderView(APIView):
     @require_authorization_customer
+    @idempotent("order/add")
     def get(self, request):
-        try:
-            customer = getCustomer(request)
-            cart = Cart.objects.get(customer=customer)
-        except Cart.DoesNotExist:
+        customer = getCustomer(request)
+        # تغییرات سبد که هنوز از انبار سبدها در دیتابیس نوشته نشده‌اند
+        cartStore.flush(customer.id)
+
+        # ردیف‌های سبد همراه با غذا و خود سبد در یک کوئری؛ تعداد کوئری‌های ثبت سفارش به تعداد ردیف‌ها بستگی ندارد
+        cart_items = list(
+            CartItem.objects.filter(cart__customer=customer).select_related('food', 'cart').order_by('id')
+        )
+        if not cart_items:
             return Response({"status": "error", "message": "سبد خرید شما خالی است."}, status=status.HTTP_400_BAD_REQUEST)
 
-        cart_items = CartItem.objects.filter(cart=cart)
-        if not cart_items.exists():
-            return Response({"status": "error", "message": "سبد خرید شما خالی است."}, status=status.HTTP_400_BAD_REQUEST)
+        cart = cart_items[0].cart
+        restaurantId = cart_items[0].food.restaurant_id
+        totalPrice = sum(item.food.price * item.quantity for item in cart_items)
 
+        # کد پرداخت یکتا بیرون از تراکنش رزرو می‌شود (Order/paymentCodes.py)
+        paymentCode = paymentCodes.allocate()
+
+        # تراکنش تعداد دستور ثابتی دارد: خواندن هزینه ارسال، ثبت سفارش و ردیف اول تاریخچه وضعیت، ثبت گروهی اقلام،
+        # خالی کردن سبد و ثبت ایمیل کد پرداخت در صف
         with transaction.atomic():
+            # هزینه ارسال به منطقه انتخاب‌شده سبد از دیتابیس (بدون منطقه هزینه پایه رستوران حساب می‌شود)
+            delivery = quoteFromDb(restaurantId, cart.area_id, totalPrice)
+            if not delivery["isDeliverable"]:
+                return Response({"status": "error", "message": "این رستوران به منطقه انتخاب‌شده ارسال ندارد."},
+                                status=status.HTTP_400_BAD_REQUEST)
             order = Order.objects.create(
-                restaurant=cart.foods.all()[0].restaurant,
+                restaurant_id=restaurantId,
                 customer=customer,
                 status="waitingForPayment",
-                paymentCode=random.randint(10000, 99999)
+                paymentCode=paymentCode,
+                totalPrice=int(totalPrice * 1.1) + delivery["deliveryFee"],
+                tax=int(totalPrice * 0.10),
+                deliveryFee=delivery["deliveryFee"]
             )
-
-            totalPrice = 0
-            for item in cart_items:
-                OrderItem.objects.create(
+            # ردیف اول تاریخچه: ثبت سفارش توسط مشتری با وضعیت اولیه
+            OrderStatusHistory.objects.create(
+                order=order, fromStatus=order.status, toStatus=order.status, changedBy=CUSTOMER
+            )
+            order_items = OrderItem.objects.bulk_create([
+                OrderItem(
                     order=order,
                     foodName=item.food.name,
                     foodPrice=item.food.price,
                     foodDescription=item.food.description,
-                    foodCategory=item.food.category.id,
+                    foodCategory=item.food.category_id,
                     quantity=item.quantity
                 )
-                totalPrice += item.food.price * item.quantity
-            cart_items.delete()  # خالی کردن سبد خرید
-            order.totalPrice = int(totalPrice * 1.1)
-            order.tax = int(totalPrice * 0.10)
-            order.save()
-
-        SendPaymentCode(customer.email, str(order.paymentCode))
+                for item in cart_items
+            ])
+            CartItem.objects.filter(cart=cart).delete()  # خالی کردن سبد خرید
+            Cart.objects.filter(id=cart.id).update(subtotal=0, tax=0, itemCount=0, restaurant=None)
+            transaction.on_commit(lambda: cartStore.clear(customer.id))
+            SendPaymentCode(customer.email, str(order.paymentCode))
 
         return Response({
             "status": "success",
@@ -76,9 +96,11 @@ class CreateOrderView(APIView):
                 "paymentCode": order.paymentCode,
                 "status": order.status,
                 "price": int(totalPrice),
-                "totalPrice": int(totalPrice * 1.1),
-                "tax": int(totalPrice * 0.10),
-                "items": [item.to_dict() for item in order.items.all()]
+                "totalPrice": order.totalPrice,
+                "tax": order.tax,
+                "deliveryFee": order.deliveryFee,
+                "delivery": delivery,
+                "items": [item.to_dict() for item in order_items]
             }
         }, status=status.HTTP_201_CREATED)
 
@@ -87,6 +109,7 @@ class CreateOrderView(APIView):
 # -----------------------------
 class ConfirmPaymentView(APIView):
     @require_authorization_customer
+    @idempotent("order/payment")
     def post(self, request):
         code = request.data.get("paymentCode")
         if not code:
@@ -98,9 +121,9 @@ class ConfirmPaymentView(APIView):
         except Order.DoesNotExist:
             return Response({"status": "error", "message": "کد پرداخت نامعتبر است."}, status=status.HTTP_400_BAD_REQUEST)
 
-        order.status = "processing"
-        order.save()
-        SendPaymentSuccess(getCustomer(request).email, str(order.id))
+        if not transitionOrder(order, "processing", CUSTOMER,
+                               onTransition=lambda: SendPaymentSuccess(customer.email, str(order.id))):
+            return _conflict()
         return Response({"status": "success", "message": "پرداخت تأیید شد و سفارش در حال پردازش است.", "data": {"orderId": order.id, "status": order.status}})
 
 # -----------------------------
@@ -115,20 +138,11 @@ class UpdateOrderStatusView(APIView):
         if not order_id or not new_status:
             return Response({"status": "error", "message": "orderId و status الزامی هستند."}, status=status.HTTP_400_BAD_REQUEST)
 
-        status_list = [
-            "waitingForPayment",
-            "processing",
-            "preparing",
-            "delivering",
-            "completed",
-            "canceled"
-        ]
-
-        if new_status not in status_list or new_status == "waitingForPayment":
+        if new_status not in allowedStatuses(RESTAURANT_MANAGER):
             return Response({"status": "error", "message": "وضعیت جدید نامعتبر است."}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            order = Order.objects.get(id=order_id)
+            order = Order.objects.select_related('customer').get(id=order_id)
         except Order.DoesNotExist:
             return Response({"status": "error", "message": "سفارش یافت نشد."}, status=status.HTTP_404_NOT_FOUND)
 
@@ -137,9 +151,13 @@ class UpdateOrderStatusView(APIView):
         if order.restaurant != manager.restaurant:
             return Response({"status": "error", "message": "این سفارش مربوط به رستوران شما نیست."}, status=status.HTTP_403_FORBIDDEN)
 
-        order.status = new_status
-        order.save()
-        SendStatusOrder(order.customer.email, str(order.id) ,new_status, waitMinutes)
+        if not canTransition(order, new_status, RESTAURANT_MANAGER):
+            return Response({"status": "error", "message": f"تغییر وضعیت سفارش از {order.status} به {new_status} مجاز نیست."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        if not transitionOrder(order, new_status, RESTAURANT_MANAGER,
+                               onTransition=lambda: SendStatusOrder(order.customer.email, str(order.id), new_status, waitMinutes)):
+            return _conflict()
         return Response({"status": "success", "message": f"وضعیت سفارش به {new_status} تغییر کرد.", "data": {"orderId": order.id, "status": order.status}})
 
 # -----------------------------
@@ -162,6 +180,7 @@ class GetLastOrderView(APIView):
                 "status": order.status,
                 "totalPrice": order.totalPrice,
                 "tax": order.tax,
+                "deliveryFee": order.deliveryFee,
                 "items": [item.to_dict() for item in order.items.all()]
             }
         })
@@ -185,6 +204,7 @@ class GetOrderByIdView(APIView):
                 "status": order[0].status,
                 "totalPrice": order[0].totalPrice,
                 "tax": order[0].tax,
+                "deliveryFee": order[0].deliveryFee,
                 "items": [item.to_dict() for item in order[0].items.all()]
             }
         })
@@ -207,6 +227,7 @@ class GetOrderByCustomer(APIView):
                 "status": o.status,
                 "totalPrice": o.totalPrice,
                 "tax": o.tax,
+                "deliveryFee": o.deliveryFee,
                 "items": [item.to_dict() for item in o.items.all()]
             } for o in orders]
         })
@@ -229,19 +250,19 @@ class CancelOrderView(APIView):
                             status=status.HTTP_404_NOT_FOUND)
 
         # بررسی وضعیت سفارش
-        if order.status not in ["waitingForPayment", "processing"]:
+        if not canTransition(order, "canceled", CUSTOMER):
             return Response({"status": "error", "message": "سفارش قابل لغو نیست."},
                             status=status.HTTP_400_BAD_REQUEST)
 
         # بررسی زمان ثبت سفارش
-        time_diff = timezone.now() - order.createdAt
-        if time_diff > timedelta(minutes=15):
+        cancelDeadline = timezone.now() - CUSTOMER_CANCEL_WINDOW
+        if order.createdAt < cancelDeadline:
             return Response({"status": "error", "message": "زمان لغو سفارش به پایان رسیده است."},
                             status=status.HTTP_400_BAD_REQUEST)
 
-        # لغو سفارش
-        order.status = "canceled"
-        order.save()
+        # لغو سفارش؛ مهلت لغو هم شرط همان UPDATE است
+        if not transitionOrder(order, "canceled", CUSTOMER, conditions={"createdAt__gte": cancelDeadline}):
+            return _conflict()
 
         return Response({
             "status": "success",
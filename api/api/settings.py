@@ -10,8 +10,16 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
+import tempfile
 from pathlib import Path
 
+from corsheaders.defaults import default_headers
+from django.core.exceptions import ImproperlyConfigured
+from dotenv import load_dotenv
+
+load_dotenv()
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -30,6 +38,11 @@ CORS_ALLOWED_ORIGINS = [
 
 CORS_ALLOW_CREDENTIALS = True
 
+# کلاینت برای درخواست‌های شرطی باید ETag را بخواند و If-None-Match بفرستد؛
+# Idempotency-Key برای تکرار امن ثبت و پرداخت سفارش است (Order/idempotency.py)
+CORS_ALLOW_HEADERS = (*default_headers, "if-none-match", "idempotency-key")
+CORS_EXPOSE_HEADERS = ["ETag", "Idempotent-Replayed"]
+
 
 
 # Application definition
@@ -46,6 +59,8 @@ INSTALLED_APPS = [
     'rest_framework',
     'customer',
     'restaurantManager',
+    # قبل از restaurant و food: سیگنال‌های جدول‌های امتیاز باید قبل از سیگنال‌های کش کاتالوگ اجرا شوند
+    'leaderboard',
     'restaurant',
     'notifications',
     'userVerification',
@@ -57,7 +72,8 @@ INSTALLED_APPS = [
     'Order',
     'review',
     'suggestion',
-    'chat'
+    'chat',
+    'search',
 ]
 
 MIDDLEWARE = [
@@ -116,6 +132,91 @@ DATABASES = {
 }
 
 
+# Cache
+# کش پاسخ endpoint های کاتالوگ (services/ResponseCache.py)؛ بک‌اند با متغیر محیطی CatalogCacheBackend انتخاب می‌شود:
+# locmem (پیش‌فرض، مخصوص هر worker)، file (مشترک بین worker های یک سرور) یا redis (هر سرور سازگار با Redis)
+# کلیدهای نسخه scope ها منقضی نمی‌شوند و فقط با تغییر داده عوض می‌شوند؛ ساختارهای درون‌فرایندی (ایندکس جستجو،
+# ایندکس مکانی، ماتریس هزینه ارسال، جدول‌های برترین‌ها) تا تغییر بعدی دوباره ساخته نمی‌شوند.
+# با locmem افزایش نسخه در worker های دیگر دیده نمی‌شود: پاسخ‌های کش‌شده بعد از CATALOG_LOCAL_TIMEOUT ثانیه
+# منقضی می‌شوند، ولی ساختارهای درون‌فرایندی فقط تغییرات همان worker را می‌بینند؛ پس در production با چند worker
+# باید redis انتخاب شود.
+
+CATALOG_CACHE_BACKENDS = {
+    'locmem': ('django.core.cache.backends.locmem.LocMemCache', 'catalog'),
+    'file': ('django.core.cache.backends.filebased.FileBasedCache',
+             os.path.join(tempfile.gettempdir(), 'elite-bite-catalog-cache')),
+    'redis': ('django.core.cache.backends.redis.RedisCache', 'redis://127.0.0.1:6379/1'),
+}
+
+_catalogBackend, _catalogLocation = CATALOG_CACHE_BACKENDS[os.getenv('CatalogCacheBackend', 'locmem')]
+_catalogShared = not _catalogBackend.endswith('LocMemCache')
+
+CATALOG_LOCAL_TIMEOUT = 30
+
+# انبار سبدهای خرید فعال (Cart/store.py)؛ بک‌اند با متغیر محیطی CartStoreBackend انتخاب می‌شود.
+# locmem فقط برای یک worker مناسب است؛ با چند worker باید redis انتخاب شود تا همه یک سبد را ببینند.
+# بک‌اند file مناسب نیست چون با پر شدن، کلیدها را بدون توجه به نوشته‌نشدن سبد حذف می‌کند.
+# نوشتن با تاخیر (write-behind) فقط با انبار مشترک مجاز است؛ با locmem تغییرات در همان درخواست نوشته می‌شوند
+# تا با خاموش شدن فرایند سبدی از دست نرود.
+CART_STORE_BACKENDS = {
+    'locmem': ('django.core.cache.backends.locmem.LocMemCache', 'cart'),
+    'redis': ('django.core.cache.backends.redis.RedisCache', 'redis://127.0.0.1:6379/2'),
+}
+
+_cartBackend, _cartLocation = CART_STORE_BACKENDS[os.getenv('CartStoreBackend', 'locmem')]
+
+# سبدهای بدون تغییر بعد از این مدت از انبار حذف و در صورت نیاز دوباره از دیتابیس خوانده می‌شوند
+CART_STORE_TIMEOUT = 60 * 60 * 24 * 7
+# تاخیر نوشتن تغییرات سبد در دیتابیس (ثانیه)؛ صفر یعنی نوشتن هم‌زمان در همان درخواست
+CART_FLUSH_DELAY = int(os.getenv('CartFlushDelay', 0 if _cartBackend.endswith('LocMemCache') else 5))
+if CART_FLUSH_DELAY > 0 and _cartBackend.endswith('LocMemCache'):
+    raise ImproperlyConfigured("CartFlushDelay بزرگ‌تر از صفر به انبار مشترک سبدها (CartStoreBackend=redis) نیاز دارد.")
+
+# کدهای پرداخت سفارش (Order/paymentCodes.py): تعداد شماره‌هایی که هر فرایند یک‌جا رزرو می‌کند و کلید جایگشت کدها.
+# کلید نباید بعد از صدور کد عوض شود چون کدهای جدید ممکن است با کدهای قبلی تکراری شوند.
+PAYMENT_CODE_BLOCK_SIZE = 20
+PAYMENT_CODE_KEY = os.getenv('PaymentCodeKey', SECRET_KEY)
+
+# مدت نگهداری پاسخ درخواست‌های دارای Idempotency-Key (ثانیه)
+IDEMPOTENCY_KEY_TTL = 60 * 60 * 24
+# مهلت کلیدی که پاسخش هنوز ذخیره نشده (درخواست در حال اجرا)؛ بعد از آن کلید آزاد است و درخواست دوباره اجرا می‌شود
+IDEMPOTENCY_CLAIM_TIMEOUT = 60
+
+# صف ایمیل‌های خروجی (notifications/outbox.py)؛ تعداد worker های درون همین فرایند که با اولین ایمیل راه می‌افتند.
+# صفر یعنی ارسال فقط با دستور جداگانه send_outbox_emails انجام شود.
+EMAIL_OUTBOX_WORKERS = int(os.getenv('EmailOutboxWorkers', 2))
+EMAIL_OUTBOX_BATCH_SIZE = 20
+# حداکثر انتظار worker بیکار (ثانیه) برای دیدن تلاش‌های مجدد و ایمیل‌های فرایندهای دیگر
+EMAIL_OUTBOX_POLL_INTERVAL = 5
+# مهلت ارسال یک ایمیل برداشته‌شده؛ بعد از آن ایمیل worker ازکارافتاده دوباره برداشته می‌شود
+EMAIL_OUTBOX_LEASE = 5 * 60
+EMAIL_OUTBOX_MAX_ATTEMPTS = 8
+# تاخیر تلاش مجدد (ثانیه): 30، 60، 120، ... تا حداکثر یک ساعت
+EMAIL_OUTBOX_RETRY_BASE = 30
+EMAIL_OUTBOX_RETRY_MAX = 60 * 60
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'catalog': {
+        'BACKEND': _catalogBackend,
+        'LOCATION': os.getenv('CatalogCacheLocation', _catalogLocation),
+        'KEY_PREFIX': 'catalog',
+        # با بک‌اند مشترک باطل‌سازی با نسخه انجام می‌شود و timeout فقط کلیدهای قدیمی را از حافظه پاک می‌کند
+        'TIMEOUT': 60 * 60 * 24 if _catalogShared else CATALOG_LOCAL_TIMEOUT,
+        'OPTIONS': {} if _catalogShared else {'MAX_ENTRIES': 10000},
+    },
+    'cart': {
+        'BACKEND': _cartBackend,
+        'LOCATION': os.getenv('CartStoreLocation', _cartLocation),
+        'KEY_PREFIX': 'cart',
+        'TIMEOUT': CART_STORE_TIMEOUT,
+        'OPTIONS': {'MAX_ENTRIES': 1000000} if _cartBackend.endswith('LocMemCache') else {},
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -141,6 +242,9 @@ LANGUAGE_CODE = 'fa'
 
 TIME_ZONE = 'UTC'
 
+# منطقه زمانی ساعات کاری رستوران‌ها (فیلتر openNow)
+RESTAURANT_TIME_ZONE = 'Asia/Tehran'
+
 USE_I18N = True
 
 USE_TZ = True
@@ -13,5 +13,6 @@ urlpatterns=[
     path('review/', include('review.urls')),
     path('suggestion/', include('suggestion.urls')),
     path('chat/', include('chat.urls')),
+    path('search/', include('search.urls')),
 
 ]
\ No newline at end of file
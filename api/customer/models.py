@@ -9,4 +9,6 @@ class Customer(models.Model):
     firstName = models.CharField(max_length=20, default=None)
     lastName = models.CharField(max_length=25, default=None)
     isVerified = models.BooleanField(default=False)
-    address = models.TextField()
\ No newline at end of file
+    address = models.TextField()
+    latitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
+    longitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
\ No newline at end of file
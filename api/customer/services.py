@@ -5,3 +5,9 @@ def getCustomer(request):
     if customer:
         return Customer.objects.get(id=customer['id'], email=customer['email'])
     return None
+
+
+def getCustomerId(request):
+    """آیدی مشتری واردشده از روی نشست، بدون کوئری دیتابیس"""
+    customer = request.session.get('customer_login')
+    return customer['id'] if customer else None
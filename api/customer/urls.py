@@ -1,5 +1,5 @@
 from django.urls import path
-from .views import SignupVerifyView, SignupCodeView, LoginCodeView, LoginVerifyView, CheckLoginView, GetInformation
+from .views import SignupVerifyView, SignupCodeView, LoginCodeView, LoginVerifyView, CheckLoginView, GetInformation, UpdateAddressView
 
 urlpatterns = [
     path('signup/code', SignupCodeView.as_view(), name='customer-signup-code'),
@@ -8,4 +8,5 @@ urlpatterns = [
     path('login/verify', LoginVerifyView.as_view(), name='customer-login-verify'),
     path('check/login', CheckLoginView.as_view(), name='customer-check-login'),
     path('info', GetInformation.as_view(), name='customer-info'),
+    path('address', UpdateAddressView.as_view(), name='customer-address'),
 ]
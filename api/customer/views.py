@@ -6,6 +6,8 @@ from rest_framework import status
 from .models import Customer
 from userVerification.models import VerificationCode
 from .services import getCustomer
+from services.Authorization import require_authorization_customer
+from services.GeoIndex import InvalidCoordinates, parseCoordinates
 from utilities.sendEmailFunctions.utilities import SendSignupCode, SendLoginCode
 
 
@@ -185,7 +187,39 @@ class GetInformation(APIView):
                                  'firstName': customer.firstName,
                                  'lastName': customer.lastName,
                                  'email': customer.email,
+                                 'address': customer.address,
+                                 'latitude': customer.latitude,
+                                 'longitude': customer.longitude,
                              }}, status=status.HTTP_200_OK)
         else:
             return Response({'message': 'لاگین نیست.', 'status': 'unauthorized'},
-                            status=status.HTTP_401_UNAUTHORIZED)
\ No newline at end of file
+                            status=status.HTTP_401_UNAUTHORIZED)
+
+
+class UpdateAddressView(APIView):
+    @require_authorization_customer
+    def post(self, request):
+        customer = getCustomer(request)
+        address = str(request.data.get('address', '')).strip()
+        if len(address) < 10:
+            return Response({'message': 'آدرس باید حداقل ۱۰ کاراکتر باشد.', 'status': 'error'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        # مختصات آدرس برای جستجوی نزدیک‌ترین رستوران‌ها استفاده می‌شود
+        try:
+            point = parseCoordinates(request.data.get('latitude'), request.data.get('longitude'))
+        except InvalidCoordinates:
+            point = None
+        if point is None:
+            return Response({'message': 'مختصات جغرافیایی آدرس نامعتبر است.', 'status': 'error'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        customer.address = address
+        customer.latitude, customer.longitude = point
+        customer.save(update_fields=['address', 'latitude', 'longitude'])
+        return Response({'message': 'آدرس با موفقیت ثبت شد.', 'status': 'success',
+                         'data': {
+                             'address': customer.address,
+                             'latitude': customer.latitude,
+                             'longitude': customer.longitude,
+                         }}, status=status.HTTP_200_OK)
@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from food.models import AreaFood
+from food.services import getExpectedAreaFoodRows
+
+
+class Command(BaseCommand):
+    help = "بازسازی کامل ایندکس منطقه ← غذا (AreaFood) یا بررسی drift آن با --check"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true', help="فقط اختلاف‌ها را گزارش کن و چیزی ننویس")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        expected = getExpectedAreaFoodRows()
+
+        if options['check']:
+            actual = {
+                (areaId, foodId): (categoryId, price, ratingScore, isAvailable)
+                for areaId, foodId, categoryId, price, ratingScore, isAvailable in AreaFood.objects.values_list(
+                    'area_id', 'food_id', 'category_id', 'price', 'ratingScore', 'isAvailable'
+                ).iterator()
+            }
+            missing = expected.keys() - actual.keys()
+            extra = actual.keys() - expected.keys()
+            stale = [key for key in expected.keys() & actual.keys() if expected[key] != actual[key]]
+            self.stdout.write(
+                f"expected={len(expected)} actual={len(actual)} "
+                f"missing={len(missing)} extra={len(extra)} stale={len(stale)}"
+            )
+            if missing or extra or stale:
+                self.stderr.write(self.style.ERROR("ایندکس AreaFood با داده‌های اصلی هماهنگ نیست."))
+                raise SystemExit(1)
+            self.stdout.write(self.style.SUCCESS("ایندکس AreaFood هماهنگ است."))
+            return
+
+        with transaction.atomic():
+            AreaFood.objects.all().delete()
+            AreaFood.objects.bulk_create(
+                [
+                    AreaFood(
+                        area_id=areaId, food_id=foodId, category_id=categoryId,
+                        price=price, ratingScore=ratingScore, isAvailable=isAvailable,
+                    )
+                    for (areaId, foodId), (categoryId, price, ratingScore, isAvailable) in expected.items()
+                ],
+                batch_size=options['batch_size'],
+            )
+        self.stdout.write(self.style.SUCCESS(f"ایندکس AreaFood با {len(expected)} ردیف بازسازی شد."))
@@ -0,0 +1,69 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from food.models import RestaurantPriceSummary
+from food.services import getExpectedPriceSummaries
+from services.ResponseCache import ALL_AREAS_SCOPE, bumpScopes
+
+
+class Command(BaseCommand):
+    help = "بازسازی کامل خلاصه قیمت منوی رستوران‌ها (RestaurantPriceSummary) یا بررسی drift آن با --check"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true', help="فقط اختلاف‌ها را گزارش کن و چیزی ننویس")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        expected = getExpectedPriceSummaries()
+
+        if options['check']:
+            categories = {}
+            for restaurantId, categoryId in RestaurantPriceSummary.categories.through.objects.values_list(
+                'restaurantpricesummary_id', 'foodcategory_id'
+            ).iterator():
+                categories.setdefault(restaurantId, set()).add(categoryId)
+            actual = {
+                restaurantId: (minPrice, maxPrice, medianPrice, count, frozenset(categories.get(restaurantId, ())))
+                for restaurantId, minPrice, maxPrice, medianPrice, count in RestaurantPriceSummary.objects.values_list(
+                    'restaurant_id', 'minPrice', 'maxPrice', 'medianPrice', 'availableFoodCount'
+                ).iterator()
+            }
+            missing = expected.keys() - actual.keys()
+            extra = actual.keys() - expected.keys()
+            stale = [key for key in expected.keys() & actual.keys() if expected[key] != actual[key]]
+            # رستورانی که هیچ‌وقت غذا نداشته ردیف خلاصه ندارد و با خلاصه خالی معادل است
+            missing = [key for key in missing if expected[key][3]]
+            self.stdout.write(
+                f"expected={len(expected)} actual={len(actual)} "
+                f"missing={len(missing)} extra={len(extra)} stale={len(stale)}"
+            )
+            if missing or extra or stale:
+                self.stderr.write(self.style.ERROR("خلاصه قیمت رستوران‌ها با جدول غذا هماهنگ نیست."))
+                raise SystemExit(1)
+            self.stdout.write(self.style.SUCCESS("خلاصه قیمت رستوران‌ها هماهنگ است."))
+            return
+
+        Through = RestaurantPriceSummary.categories.through
+        with transaction.atomic():
+            RestaurantPriceSummary.objects.all().delete()
+            RestaurantPriceSummary.objects.bulk_create(
+                [
+                    RestaurantPriceSummary(
+                        restaurant_id=restaurantId, minPrice=minPrice, maxPrice=maxPrice,
+                        medianPrice=medianPrice, availableFoodCount=count,
+                    )
+                    for restaurantId, (minPrice, maxPrice, medianPrice, count, _) in expected.items()
+                ],
+                batch_size=options['batch_size'],
+            )
+            Through.objects.bulk_create(
+                [
+                    Through(restaurantpricesummary_id=restaurantId, foodcategory_id=categoryId)
+                    for restaurantId, (*_, categoryIds) in expected.items()
+                    for categoryId in categoryIds
+                ],
+                batch_size=options['batch_size'],
+            )
+            # بدون سیگنال مدل نوشته شده است؛ پاسخ‌های کش‌شده فهرست رستوران‌ها باطل می‌شوند
+            bumpScopes([ALL_AREAS_SCOPE], bulk=True)
+        self.stdout.write(self.style.SUCCESS(f"خلاصه قیمت {len(expected)} رستوران بازسازی شد."))
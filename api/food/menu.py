@@ -0,0 +1,338 @@
+import codecs
+import csv
+import io
+import json
+
+from django.db import transaction
+from django.utils import timezone
+
+from FoodCategory.models import FoodCategory
+from review.services import FOOD_TARGET, priorRankingScore
+from .models import Food
+from .signals import foodsBulkChanged
+
+MENU_FIELDS = ("id", "name", "price", "category", "categoryName", "description", "isAvailable")
+MENU_FORMATS = ("csv", "jsonl")
+MENU_IMPORT_BATCH_SIZE = 500
+MENU_IMPORT_MAX_ROWS = 20000
+# حداکثر خطاهایی که در گزارش برگردانده می‌شوند؛ شمارش failed همه خطاها را دارد
+MENU_IMPORT_MAX_ERRORS = 1000
+
+UPDATE_FIELDS = ("name", "price", "description", "category_id", "isAvailable")
+# حداکثر تغییرات یک درخواست ویرایش گروهی قیمت و موجودی
+FOOD_CHANGES_MAX = 500
+
+TRUE_VALUES = ("1", "true", "yes", "بله")
+FALSE_VALUES = ("", "0", "false", "no", "خیر")
+
+
+class InvalidMenuRow(ValueError):
+    pass
+
+
+class InvalidMenuFile(ValueError):
+    pass
+
+
+def getMenuFormat(fileName, requestedFormat=None):
+    menuFormat = (requestedFormat or fileName.rsplit(".", 1)[-1]).lower()
+    if menuFormat == "json":
+        menuFormat = "jsonl"
+    return menuFormat if menuFormat in MENU_FORMATS else None
+
+
+# -----------------------------
+# خواندن فایل به صورت جریانی
+# -----------------------------
+def iterMenuRows(uploadedFile, menuFormat):
+    """
+    ردیف‌های فایل را تکه به تکه می‌خواند: (شماره خط، دیکشنری ردیف یا InvalidMenuRow).
+    فایلی که اصلاً قابل خواندن نیست (کدگذاری یا ساختار CSV خراب) InvalidMenuFile می‌دهد.
+    """
+    try:
+        yield from _iterMenuRows(uploadedFile, menuFormat)
+    except (UnicodeDecodeError, csv.Error) as error:
+        raise InvalidMenuFile(str(error))
+
+
+def _iterMenuRows(uploadedFile, menuFormat):
+    text = io.TextIOWrapper(uploadedFile, encoding="utf-8-sig", newline="")
+    if menuFormat == "csv":
+        reader = csv.DictReader(text)
+        for row in reader:
+            yield reader.line_num, row
+        return
+
+    for lineNumber, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield lineNumber, InvalidMenuRow("سطر JSON معتبر نیست.")
+            continue
+        if not isinstance(row, dict):
+            row = InvalidMenuRow("هر سطر باید یک شیء JSON باشد.")
+        yield lineNumber, row
+
+
+def _text(row, field):
+    value = row.get(field)
+    return "" if value is None else str(value).strip()
+
+
+def _parseAvailability(value):
+    value = _text({"value": value}, "value").lower()
+    if value in TRUE_VALUES:
+        return True
+    if value in FALSE_VALUES:
+        return False
+    raise InvalidMenuRow("مقدار isAvailable معتبر نیست.")
+
+
+def getCategoryLookup():
+    """آیدی و نام دسته‌بندی‌ها ← آیدی؛ یک بار برای کل فایل خوانده می‌شود"""
+    lookup = {}
+    for categoryId, name in FoodCategory.objects.values_list("id", "name"):
+        lookup[str(categoryId)] = categoryId
+        lookup[name.strip().lower()] = categoryId
+    return lookup
+
+
+def parseMenuRow(row, categories):
+    """ردیف خام ← (آیدی غذا یا None، مقادیر فیلدها)؛ در صورت خطا InvalidMenuRow"""
+    foodId = _text(row, "id")
+    if foodId and not foodId.isdigit():
+        raise InvalidMenuRow("آیدی غذا معتبر نیست.")
+
+    name = _text(row, "name")
+    if not name:
+        raise InvalidMenuRow("فیلد name الزامی است.")
+    if len(name) > Food._meta.get_field("name").max_length:
+        raise InvalidMenuRow("نام غذا طولانی‌تر از حد مجاز است.")
+
+    try:
+        price = int(_text(row, "price"))
+    except ValueError:
+        raise InvalidMenuRow("مقدار قیمت معتبر نیست.")
+    if price < 0:
+        raise InvalidMenuRow("قیمت نباید منفی باشد.")
+
+    category = _text(row, "category") or _text(row, "categoryName")
+    categoryId = categories.get(category.lower())
+    if categoryId is None:
+        raise InvalidMenuRow("دسته‌بندی مورد نظر یافت نشد.")
+
+    return int(foodId) if foodId else None, {
+        "name": name,
+        "price": price,
+        "description": _text(row, "description"),
+        "category_id": categoryId,
+        "isAvailable": _parseAvailability(row.get("isAvailable")),
+    }
+
+
+# -----------------------------
+# ورود گروهی منو
+# -----------------------------
+def _applyBatch(batch, restaurant, report):
+    """ردیف‌های سالم یک دسته: ردیف‌های بدون آیدی ساخته و ردیف‌های دارای آیدی (فقط فیلدهای تغییرکرده) به‌روز می‌شوند"""
+    updates = {foodId: (lineNumber, values) for lineNumber, foodId, values in batch if foodId is not None}
+    existing = Food.objects.filter(restaurant=restaurant, id__in=updates.keys()).only("id", *UPDATE_FIELDS).in_bulk()
+
+    changed = []
+    now = timezone.now()
+    for foodId, (lineNumber, values) in updates.items():
+        food = existing.get(foodId)
+        if food is None:
+            report.addError(lineNumber, "غذا یافت نشد یا متعلق به رستوران شما نیست.")
+            continue
+        # توضیحات خالی در دیتابیس ممکن است NULL باشد و در فایل رشته خالی
+        if all((getattr(food, field) or "" if field == "description" else getattr(food, field)) == value
+               for field, value in values.items()):
+            report.unchanged += 1
+            continue
+        for field, value in values.items():
+            setattr(food, field, value)
+        food.updatedAt = now
+        changed.append(food)
+    Food.objects.bulk_update(changed, [*UPDATE_FIELDS, "updatedAt"], batch_size=MENU_IMPORT_BATCH_SIZE)
+    report.updated += len(changed)
+
+    # bulk_create سیگنال pre_save ندارد؛ امتیاز prior غذاهای جدید همین‌جا گذاشته می‌شود (review/signals.py)
+    created = [
+        Food(restaurant=restaurant, image=None, **values)
+        for lineNumber, foodId, values in batch if foodId is None
+    ]
+    if created:
+        rankingScore = priorRankingScore(FOOD_TARGET)
+        for food in created:
+            food.rankingScore = rankingScore
+    Food.objects.bulk_create(created, batch_size=MENU_IMPORT_BATCH_SIZE)
+    report.created += len(created)
+
+
+class MenuImportReport:
+    def __init__(self):
+        self.created = self.updated = self.unchanged = self.failed = 0
+        self.errors = []
+
+    def addError(self, lineNumber, message):
+        self.failed += 1
+        if len(self.errors) < MENU_IMPORT_MAX_ERRORS:
+            self.errors.append({"line": lineNumber, "message": message})
+
+    def asDict(self):
+        return {
+            "created": self.created,
+            "updated": self.updated,
+            "unchanged": self.unchanged,
+            "failed": self.failed,
+            "errors": sorted(self.errors, key=lambda error: error["line"]),
+        }
+
+
+def importMenu(restaurant, uploadedFile, menuFormat):
+    """
+    ورود گروهی منوی رستوران از فایل CSV یا JSON Lines.
+    فایل به صورت جریانی خوانده و ردیف‌ها در دسته‌های MENU_IMPORT_BATCH_SIZE تایی اعتبارسنجی و با
+    bulk_create / bulk_update در یک تراکنش نوشته می‌شوند؛ ردیف‌های نامعتبر رد و در گزارش برگردانده می‌شوند.
+    """
+    report = MenuImportReport()
+    categories = getCategoryLookup()
+    rowCount = 0
+
+    with transaction.atomic():
+        batch = []
+        for lineNumber, row in iterMenuRows(uploadedFile, menuFormat):
+            rowCount += 1
+            if rowCount > MENU_IMPORT_MAX_ROWS:
+                report.addError(lineNumber, f"حداکثر {MENU_IMPORT_MAX_ROWS} ردیف در هر فایل پذیرفته می‌شود.")
+                break
+            try:
+                if isinstance(row, InvalidMenuRow):
+                    raise row
+                foodId, values = parseMenuRow(row, categories)
+            except InvalidMenuRow as error:
+                report.addError(lineNumber, str(error))
+                continue
+            batch.append((lineNumber, foodId, values))
+            if len(batch) >= MENU_IMPORT_BATCH_SIZE:
+                _applyBatch(batch, restaurant, report)
+                batch = []
+        if batch:
+            _applyBatch(batch, restaurant, report)
+
+        if report.created or report.updated:
+            # bulk_create / bulk_update سیگنال مدل ندارند؛ ایندکس‌ها و کش‌ها برای کل منوی رستوران به‌روز می‌شوند
+            foodsBulkChanged.send(sender=Food, restaurantIds=[restaurant.id])
+    return report
+
+
+# -----------------------------
+# ویرایش گروهی قیمت و موجودی
+# -----------------------------
+def parseFoodChanges(changes):
+    """لیست [{foodId, isAvailable?, price?}] ← {foodId: {فیلد: مقدار}}؛ در صورت خطا InvalidMenuRow"""
+    if not isinstance(changes, list) or not changes:
+        raise InvalidMenuRow("لیست changes الزامی است.")
+    if len(changes) > FOOD_CHANGES_MAX:
+        raise InvalidMenuRow(f"حداکثر {FOOD_CHANGES_MAX} تغییر در هر درخواست پذیرفته می‌شود.")
+
+    parsed = {}
+    for index, change in enumerate(changes):
+        if not isinstance(change, dict) or not str(change.get("foodId", "")).isdigit():
+            raise InvalidMenuRow(f"آیدی غذا در تغییر {index + 1} معتبر نیست.")
+        values = {}
+        if "isAvailable" in change:
+            try:
+                if change["isAvailable"] in (None, ""):
+                    raise InvalidMenuRow(change["isAvailable"])
+                values["isAvailable"] = _parseAvailability(change["isAvailable"])
+            except InvalidMenuRow:
+                raise InvalidMenuRow(f"مقدار isAvailable در تغییر {index + 1} معتبر نیست.")
+        if "price" in change:
+            try:
+                values["price"] = int(change["price"])
+            except (TypeError, ValueError):
+                values["price"] = -1
+            if values["price"] < 0:
+                raise InvalidMenuRow(f"مقدار قیمت در تغییر {index + 1} معتبر نیست.")
+        if not values:
+            raise InvalidMenuRow(f"تغییر {index + 1} باید isAvailable یا price داشته باشد.")
+        parsed.setdefault(int(change["foodId"]), {}).update(values)
+    return parsed
+
+
+def applyFoodChanges(managerId, managerEmail, changes):
+    """
+    تغییرات قیمت و موجودی غذاهای مدیر را اعمال می‌کند.
+    مالکیت همه غذاها با یک کوئری (join غذا ← رستوران ← مدیر) بررسی می‌شود و فقط ستون‌هایی که واقعاً
+    تغییر کرده‌اند با یک bulk_update نوشته می‌شوند. خروجی: (آیدی‌های ویرایش‌شده، بدون تغییر، یافت‌نشده)
+    """
+    with transaction.atomic():
+        foods = Food.objects.filter(
+            id__in=changes.keys(), restaurant__owner_id=managerId, restaurant__owner__email=managerEmail
+        ).only("id", "restaurant_id", "price", "isAvailable").in_bulk()
+
+        changed, fields = [], set()
+        now = timezone.now()
+        for foodId, values in changes.items():
+            food = foods.get(foodId)
+            if food is None:
+                continue
+            changedFields = [field for field, value in values.items() if getattr(food, field) != value]
+            if changedFields:
+                for field in changedFields:
+                    setattr(food, field, values[field])
+                food.updatedAt = now
+                fields.update(changedFields)
+                changed.append(food)
+
+        if changed:
+            Food.objects.bulk_update(changed, [*sorted(fields), "updatedAt"])
+            foodsBulkChanged.send(
+                sender=Food,
+                restaurantIds=sorted({food.restaurant_id for food in changed}),
+                foodIds=[food.id for food in changed],
+            )
+
+    changedIds = {food.id for food in changed}
+    return (
+        sorted(changedIds),
+        sorted(foodId for foodId in foods if foodId not in changedIds),
+        sorted(foodId for foodId in changes if foodId not in foods),
+    )
+
+
+# -----------------------------
+# خروجی جریانی منو
+# -----------------------------
+class _Echo:
+    def write(self, value):
+        return value
+
+
+def _exportRows(restaurant):
+    foods = Food.objects.filter(restaurant=restaurant).order_by("id").values_list(
+        "id", "name", "price", "category_id", "category__name", "description", "isAvailable"
+    )
+    for row in foods.iterator(chunk_size=1000):
+        yield dict(zip(MENU_FIELDS, row))
+
+
+def exportMenu(restaurant, menuFormat):
+    """منوی رستوران سطر به سطر تولید می‌شود (قالب آن با ورود گروهی سازگار است)"""
+    if menuFormat == "csv":
+        writer = csv.DictWriter(_Echo(), fieldnames=MENU_FIELDS)
+        # BOM برای نمایش درست حروف فارسی در Excel
+        yield codecs.BOM_UTF8.decode() + writer.writerow(dict(zip(MENU_FIELDS, MENU_FIELDS)))
+        for row in _exportRows(restaurant):
+            row["description"] = row["description"] or ""
+            row["isAvailable"] = int(row["isAvailable"])
+            yield writer.writerow(row)
+        return
+
+    for row in _exportRows(restaurant):
+        row["description"] = row["description"] or ""
+        yield json.dumps(row, ensure_ascii=False) + "\n"
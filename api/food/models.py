@@ -1,5 +1,6 @@
 from django.db import models
 
+from Area.models import Area
 from FoodCategory.models import FoodCategory
 from restaurant.models import Restaurant
 
@@ -13,9 +14,55 @@ class Food(models.Model):
     isAvailable = models.BooleanField(default=False)
     ratingScore = models.DecimalField(max_digits=4, decimal_places=2, default=0.0)
     ratingTotalVoters = models.PositiveIntegerField(default=0)
+    ratingSum = models.PositiveIntegerField(default=0)
+    # میانگین بیزی امتیاز با prior سراسری (review.RatingPrior)؛ مرتب‌سازی‌های امتیاز روی این ستون انجام می‌شوند
+    rankingScore = models.DecimalField(max_digits=6, decimal_places=4, default=0.0, db_index=True)
     restaurant = models.ForeignKey(Restaurant, on_delete=models.CASCADE, null=True, blank=True)
     createdAt = models.DateTimeField(auto_now_add=True)
     updatedAt = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.name
+
+
+class AreaFood(models.Model):
+    """
+    ایندکس دنرمال‌شده «منطقه ← غذا».
+    برای هر منطقه‌ای که رستورانِ غذا در آن سرویس می‌دهد یک ردیف نگه داشته می‌شود
+    تا فیلترهای منطقه‌ای فقط یک range scan روی این جدول باشند.
+    با سیگنال‌های food/signals.py به‌روز می‌ماند و با دستور rebuild_area_food_index بازسازی می‌شود.
+    """
+    area = models.ForeignKey(Area, on_delete=models.CASCADE, related_name='foodIndex')
+    food = models.ForeignKey(Food, on_delete=models.CASCADE, related_name='areaIndex')
+    category = models.ForeignKey(FoodCategory, on_delete=models.CASCADE, related_name='+')
+    price = models.IntegerField()
+    ratingScore = models.DecimalField(max_digits=4, decimal_places=2, default=0.0)
+    isAvailable = models.BooleanField(default=False)
+
+    class Meta:
+        unique_together = ('area', 'food')
+        indexes = [
+            models.Index(fields=['area', 'isAvailable', 'ratingScore', 'food']),
+            models.Index(fields=['area', 'isAvailable', 'price', 'food']),
+            models.Index(fields=['area', 'isAvailable', 'category', 'food']),
+        ]
+
+    def __str__(self):
+        return f"{self.food_id} @ area {self.area_id}"
+
+
+class RestaurantPriceSummary(models.Model):
+    """
+    خلاصه دنرمال‌شده قیمت منوی قابل سفارش هر رستوران (کمینه، بیشینه و میانه قیمت، تعداد غذا و دسته‌بندی‌ها).
+    مرتب‌سازی و فیلتر قیمت رستوران‌ها به جای GROUP BY روی کل جدول غذا از ستون‌های ایندکس‌دار این جدول خوانده می‌شود.
+    با سیگنال‌های food/signals.py به‌روز می‌ماند و با دستور rebuild_restaurant_price_summary بازسازی می‌شود.
+    """
+    restaurant = models.OneToOneField(Restaurant, on_delete=models.CASCADE, primary_key=True, related_name='priceSummary')
+    minPrice = models.IntegerField(null=True, blank=True, db_index=True)
+    maxPrice = models.IntegerField(null=True, blank=True, db_index=True)
+    medianPrice = models.IntegerField(null=True, blank=True)
+    availableFoodCount = models.PositiveIntegerField(default=0)
+    categories = models.ManyToManyField(FoodCategory, blank=True, related_name='+')
+
+    def __str__(self):
+        return f"price summary of restaurant {self.restaurant_id}"
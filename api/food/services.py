@@ -0,0 +1,309 @@
+from django.db.models import Case, Count, F, IntegerField, Max, OuterRef, Subquery, When
+
+from services.Pagination import paginateByKeyset
+from Area.models import Area
+from restaurant.models import Restaurant
+from .models import AreaFood, Food, RestaurantPriceSummary
+
+# ستون‌هایی از خود غذا که در کارت غذا نمایش داده می‌شوند
+FOOD_CARD_FIELDS = (
+    "id", "name", "price", "description", "image", "isAvailable", "ratingScore", "ratingTotalVoters", "rankingScore",
+)
+
+# ستون‌هایی که از دسته‌بندی و رستوران (با join) خوانده می‌شوند
+FOOD_CARD_RELATED_FIELDS = {
+    "categoryId": F("category_id"),
+    "categoryName": F("category__name"),
+    "restaurantId": F("restaurant_id"),
+    "restaurantName": F("restaurant__name"),
+}
+
+
+def getFoodCardQuerySet(foods=None):
+    """کوئری کارت غذا: دسته‌بندی و رستوران در همان کوئری join می‌شوند و فقط ستون‌های کارت خوانده می‌شوند."""
+    if foods is None:
+        foods = Food.objects.all()
+    return foods.values(*FOOD_CARD_FIELDS, **FOOD_CARD_RELATED_FIELDS)
+
+
+def serializeFoodCard(row):
+    row["ratingScore"] = float(row["ratingScore"])
+    row["rankingScore"] = float(row["rankingScore"])
+    return row
+
+
+def getFoodCards(foods=None):
+    return [serializeFoodCard(row) for row in getFoodCardQuerySet(foods)]
+
+
+def getFoodCardsByIds(foodIds):
+    """کارت غذاها به همان ترتیب آیدی‌های داده‌شده (برای صفحه‌هایی که ترتیبشان بیرون از دیتابیس مشخص شده)"""
+    cards = {row["id"]: row for row in getFoodCards(Food.objects.filter(id__in=foodIds))}
+    return [cards[foodId] for foodId in foodIds if foodId in cards]
+
+
+def getFoodCardPage(foods, sortField=None, descending=False, cursor=None, limit=None):
+    """یک صفحه از کارت غذاها با صفحه‌بندی keyset؛ خروجی (کارت‌ها، cursor صفحه بعد)"""
+    rows, nextCursor = paginateByKeyset(getFoodCardQuerySet(foods), sortField, descending, cursor, limit)
+    return [serializeFoodCard(row) for row in rows], nextCursor
+
+
+# -----------------------------
+# مهر نسخه برای ETag
+# -----------------------------
+def getFoodListStamp(foods):
+    """مهر نسخه لیست غذا: تعداد و آخرین زمان تغییر غذاها، رستوران‌ها و دسته‌بندی‌هایشان"""
+    stamp = foods.aggregate(
+        count=Count("id"),
+        updatedAt=Max("updatedAt"),
+        restaurantUpdatedAt=Max("restaurant__updatedAt"),
+        categoryUpdatedAt=Max("category__updatedAt"),
+    )
+    return list(stamp.values())
+
+
+def getAreaFoodListStamp(areaId):
+    """مهر نسخه لیست غذاهای یک منطقه (یا همه غذاها اگر منطقه داده نشده باشد)"""
+    foods = Food.objects.all()
+    if areaId:
+        try:
+            foods = filterFoodsByArea(foods, int(areaId))
+        except (TypeError, ValueError):
+            return None
+    return getFoodListStamp(foods)
+
+
+def getFoodDetailsStamp(foodId):
+    """مهر نسخه جزئیات غذا (غذا، رستوران، دسته‌بندی و نظرات)؛ اگر غذا وجود نداشته باشد None"""
+    try:
+        foodId = int(foodId)
+    except (TypeError, ValueError):
+        return None
+    stamp = Food.objects.filter(id=foodId).aggregate(
+        updatedAt=Max("updatedAt"),
+        restaurantUpdatedAt=Max("restaurant__updatedAt"),
+        categoryUpdatedAt=Max("category__updatedAt"),
+        reviewCount=Count("reviews"),
+        lastReviewAt=Max("reviews__createdAt"),
+    )
+    if stamp["updatedAt"] is None:
+        return None
+    return list(stamp.values())
+
+
+# -----------------------------
+# ایندکس منطقه ← غذا (AreaFood)
+# -----------------------------
+def filterFoodsByArea(foods, areaId, onlyAvailable=True):
+    """غذاهای یک منطقه (به طور پیش‌فرض فقط قابل سفارش‌ها) را از روی ایندکس AreaFood فیلتر می‌کند"""
+    if onlyAvailable:
+        return foods.filter(areaIndex__area_id=areaId, areaIndex__isAvailable=True)
+    return foods.filter(areaIndex__area_id=areaId)
+
+
+def getFoodCardPageInArea(foods, areaId, **pageOptions):
+    """
+    صفحه کارت غذاهای یک منطقه از روی ایندکس AreaFood.
+    وجود منطقه فقط زمانی بررسی می‌شود که نتیجه خالی باشد؛ اگر منطقه وجود نداشته باشد (None, None) برمی‌گردد.
+    """
+    cards, nextCursor = getFoodCardPage(filterFoodsByArea(foods, areaId), **pageOptions)
+    if not cards and not Area.objects.filter(id=areaId).exists():
+        return None, None
+    return cards, nextCursor
+
+
+def _areaFoodRow(areaId, food):
+    return AreaFood(
+        area_id=areaId,
+        food_id=food.id,
+        category_id=food.category_id,
+        price=food.price,
+        ratingScore=food.ratingScore,
+        isAvailable=food.isAvailable,
+    )
+
+
+def syncFoodAreaIndex(food):
+    """ردیف‌های ایندکس یک غذا را با مناطق فعلی رستورانش هماهنگ می‌کند"""
+    areaIds = set()
+    if food.restaurant_id:
+        areaIds = set(Restaurant.areas.through.objects.filter(
+            restaurant_id=food.restaurant_id
+        ).values_list('area_id', flat=True))
+
+    rows = AreaFood.objects.filter(food_id=food.id)
+    rows.exclude(area_id__in=areaIds).delete()
+    rows.update(
+        category_id=food.category_id,
+        price=food.price,
+        ratingScore=food.ratingScore,
+        isAvailable=food.isAvailable,
+    )
+    missing = areaIds - set(rows.values_list('area_id', flat=True))
+    AreaFood.objects.bulk_create([_areaFoodRow(areaId, food) for areaId in missing], ignore_conflicts=True)
+
+
+def addAreasToIndex(restaurantIds, areaIds):
+    foods = Food.objects.filter(restaurant_id__in=restaurantIds).only(
+        'id', 'category_id', 'price', 'ratingScore', 'isAvailable'
+    )
+    AreaFood.objects.bulk_create(
+        [_areaFoodRow(areaId, food) for food in foods for areaId in areaIds],
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+
+
+def removeAreasFromIndex(restaurantIds=None, areaIds=None):
+    rows = AreaFood.objects.all()
+    if restaurantIds is not None:
+        rows = rows.filter(food__restaurant_id__in=restaurantIds)
+    if areaIds is not None:
+        rows = rows.filter(area_id__in=areaIds)
+    rows.delete()
+
+
+def rebuildFoodAreaIndex(restaurantIds, foodIds=None):
+    """ردیف‌های ایندکس غذاهای چند رستوران (یا فقط foodIds) را بعد از تغییر گروهی بدون سیگنال دوباره می‌سازد"""
+    foods = Food.objects.filter(restaurant_id__in=restaurantIds)
+    if foodIds is not None:
+        foods = foods.filter(id__in=foodIds)
+    AreaFood.objects.filter(food__in=foods).delete()
+    rows = foods.filter(restaurant__areas__isnull=False).values_list(
+        'restaurant__areas', 'id', 'category_id', 'price', 'ratingScore', 'isAvailable'
+    )
+    AreaFood.objects.bulk_create(
+        [
+            AreaFood(
+                area_id=areaId, food_id=foodId, category_id=categoryId,
+                price=price, ratingScore=ratingScore, isAvailable=isAvailable,
+            )
+            for areaId, foodId, categoryId, price, ratingScore, isAvailable in rows.iterator()
+        ],
+        batch_size=1000,
+    )
+
+
+def refreshAreaFoodRatings(foodIds):
+    """امتیاز ردیف‌های ایندکس را بعد از تغییر گروهی امتیاز غذاها (بدون سیگنال) با یک کوئری به‌روز می‌کند"""
+    AreaFood.objects.filter(food_id__in=foodIds).update(
+        ratingScore=Subquery(Food.objects.filter(id=OuterRef("food_id")).values("ratingScore")[:1])
+    )
+
+
+def getExpectedAreaFoodRows():
+    """ردیف‌های صحیح ایندکس را مستقیماً از جداول اصلی می‌سازد (برای بازسازی و بررسی drift)"""
+    rows = Food.objects.filter(restaurant__areas__isnull=False).values_list(
+        'restaurant__areas', 'id', 'category_id', 'price', 'ratingScore', 'isAvailable'
+    )
+    return {
+        (areaId, foodId): (categoryId, price, ratingScore, isAvailable)
+        for areaId, foodId, categoryId, price, ratingScore, isAvailable in rows.iterator()
+    }
+
+
+# -----------------------------
+# خلاصه قیمت منوی رستوران‌ها
+# -----------------------------
+def _summarizePrices(rows):
+    """rows: [(price, categoryId)] غذاهای قابل سفارش ← (کمینه، بیشینه، میانه، تعداد، مجموعه دسته‌بندی‌ها)"""
+    prices = sorted(price for price, _ in rows)
+    if not prices:
+        return None, None, None, 0, frozenset()
+    middle = len(prices) // 2
+    median = prices[middle] if len(prices) % 2 else (prices[middle - 1] + prices[middle]) // 2
+    return prices[0], prices[-1], median, len(prices), frozenset(categoryId for _, categoryId in rows)
+
+
+def syncRestaurantPriceSummary(restaurantId):
+    """خلاصه قیمت یک رستوران را از روی غذاهای قابل سفارش فعلی‌اش دوباره حساب می‌کند"""
+    if not restaurantId or not Restaurant.objects.filter(id=restaurantId).exists():
+        return
+    rows = list(Food.objects.filter(restaurant_id=restaurantId, isAvailable=True).values_list('price', 'category_id'))
+    minPrice, maxPrice, medianPrice, count, categoryIds = _summarizePrices(rows)
+    summary, _ = RestaurantPriceSummary.objects.update_or_create(
+        restaurant_id=restaurantId,
+        defaults={
+            'minPrice': minPrice, 'maxPrice': maxPrice, 'medianPrice': medianPrice, 'availableFoodCount': count,
+        },
+    )
+    summary.categories.set(categoryIds)
+
+
+def backfillMissingPriceSummaries():
+    """
+    خلاصه قیمت رستوران‌هایی که غذای قابل سفارش دارند ولی ردیف خلاصه ندارند (ردیف‌های قبل از اضافه شدن جدول)؛
+    بعد از هر migrate اجرا می‌شود تا فهرست قیمت رستوران‌ها بدون اجرای دستی rebuild_restaurant_price_summary
+    کامل باشد. تعداد رستوران‌های تکمیل‌شده را برمی‌گرداند.
+    """
+    restaurants = Restaurant.objects.filter(priceSummary__isnull=True, food__isAvailable=True)
+    restaurantIds = list(restaurants.values_list('id', flat=True).distinct())
+    for restaurantId in restaurantIds:
+        syncRestaurantPriceSummary(restaurantId)
+    return len(restaurantIds)
+
+
+def getExpectedPriceSummaries():
+    """خلاصه صحیح همه رستوران‌ها مستقیماً از جدول غذا (برای بازسازی و بررسی drift)"""
+    rowsByRestaurant = {restaurantId: [] for restaurantId in Restaurant.objects.values_list('id', flat=True)}
+    rows = Food.objects.filter(isAvailable=True, restaurant__isnull=False).values_list(
+        'restaurant_id', 'price', 'category_id'
+    )
+    for restaurantId, price, categoryId in rows.iterator():
+        rowsByRestaurant[restaurantId].append((price, categoryId))
+    return {restaurantId: _summarizePrices(rows) for restaurantId, rows in rowsByRestaurant.items()}
+
+
+# -----------------------------
+# فَست‌های جستجوی غذا
+# -----------------------------
+# مرز بازه‌های قیمت؛ آخرین بازه بی‌انتها است
+FOOD_PRICE_BUCKETS = (0, 100000, 200000, 300000, 500000)
+# بازه‌های امتیاز: [0,1) [1,2) [2,3) [3,4) [4,5]
+FOOD_RATING_BUCKETS = (0, 1, 2, 3, 4)
+
+
+def _bucketCase(field, bounds):
+    return Case(
+        *[When(**{f"{field}__gte": bound}, then=index) for index, bound in reversed(list(enumerate(bounds)))],
+        default=0,
+        output_field=IntegerField(),
+    )
+
+
+def getFoodFacets(foods):
+    """
+    شمارش فَست‌های دسته‌بندی، بازه قیمت و بازه امتیاز با یک GROUP BY.
+    هر گروه (دسته‌بندی، بازه قیمت، بازه امتیاز) یک بار شمرده می‌شود و سه فَست در پایتون از همین گروه‌ها جمع زده می‌شوند.
+    """
+    groups = foods.order_by().values(
+        "category_id",
+        "category__name",
+        priceBucket=_bucketCase("price", FOOD_PRICE_BUCKETS),
+        ratingBucket=_bucketCase("ratingScore", FOOD_RATING_BUCKETS),
+    ).annotate(count=Count("id"))
+
+    categories = {}
+    prices = [0] * len(FOOD_PRICE_BUCKETS)
+    ratings = [0] * len(FOOD_RATING_BUCKETS)
+    for group in groups:
+        category = categories.setdefault(group["category_id"], {
+            "id": group["category_id"], "name": group["category__name"], "count": 0
+        })
+        category["count"] += group["count"]
+        prices[group["priceBucket"]] += group["count"]
+        ratings[group["ratingBucket"]] += group["count"]
+
+    priceBounds = FOOD_PRICE_BUCKETS + (None,)
+    ratingBounds = FOOD_RATING_BUCKETS + (5,)
+    return {
+        "categories": sorted(categories.values(), key=lambda category: -category["count"]),
+        "prices": [
+            {"min": priceBounds[index], "max": priceBounds[index + 1], "count": count}
+            for index, count in enumerate(prices)
+        ],
+        "ratings": [
+            {"min": ratingBounds[index], "max": ratingBounds[index + 1], "count": count}
+            for index, count in enumerate(ratings)
+        ],
+    }
@@ -0,0 +1,98 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_migrate, post_save
+from django.dispatch import Signal, receiver
+
+from restaurant.models import Restaurant
+from services.ResponseCache import ALL_AREAS_SCOPE, bumpRestaurantAreas, bumpScopes
+from .models import Food
+from .services import (
+    addAreasToIndex,
+    backfillMissingPriceSummaries,
+    rebuildFoodAreaIndex,
+    refreshAreaFoodRatings,
+    removeAreasFromIndex,
+    syncFoodAreaIndex,
+    syncRestaurantPriceSummary,
+)
+
+# بعد از تغییر گروهی غذاها بدون سیگنال مدل (bulk_create / bulk_update / update) ارسال می‌شود:
+# restaurantIds: رستوران‌های تغییرکرده، foodIds: غذاهای تغییرکرده یا None یعنی همه غذاهای همان رستوران‌ها
+foodsBulkChanged = Signal()
+
+# ستون‌هایی که ایندکس AreaFood و خلاصه قیمت رستوران به آن‌ها وابسته‌اند؛ save با update_fields بدون این ستون‌ها
+# (مثل ثبت رأی در review/services.py) آن‌ها را دوباره نمی‌سازد
+INDEXED_FIELDS = {"price", "isAvailable", "category", "category_id", "restaurant", "restaurant_id"}
+# ستون‌های امتیاز که فقط addFoodRating می‌نویسد؛ پاسخ‌های کش‌شده را سیگنال خود FoodReview باطل می‌کند
+RATING_FIELDS = {"ratingSum", "ratingTotalVoters", "ratingScore", "rankingScore", "updatedAt"}
+
+
+def touchesFields(update_fields, fields):
+    return update_fields is None or bool(fields & set(update_fields))
+
+
+@receiver(post_save, sender=Food)
+def updateFoodAreaIndex(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    if touchesFields(update_fields, INDEXED_FIELDS):
+        syncFoodAreaIndex(instance)
+    elif "ratingScore" in update_fields:
+        refreshAreaFoodRatings([instance.id])
+
+
+@receiver(post_save, sender=Food)
+def updateRestaurantPriceSummary(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or not touchesFields(update_fields, INDEXED_FIELDS):
+        return
+    syncRestaurantPriceSummary(instance.restaurant_id)
+
+
+@receiver(post_delete, sender=Food)
+def updateRestaurantPriceSummaryOnDelete(sender, instance, **kwargs):
+    # بعد از commit اجرا می‌شود تا اگر حذف غذا بخشی از حذف خود رستوران است، ردیف خلاصه دوباره ساخته نشود
+    restaurantId = instance.restaurant_id
+    transaction.on_commit(lambda: syncRestaurantPriceSummary(restaurantId))
+
+
+@receiver(post_migrate)
+def backfillPriceSummaries(sender, app_config=None, **kwargs):
+    # اپ غذا migration ندارد؛ پر کردن ردیف‌های خلاصه رستوران‌های قدیمی نقش data migration را دارد
+    if app_config is None or app_config.label != "food":
+        return
+    if backfillMissingPriceSummaries():
+        bumpScopes([ALL_AREAS_SCOPE], bulk=True)
+
+
+@receiver(post_save, sender=Food)
+@receiver(post_delete, sender=Food)
+def invalidateFoodResponses(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields is not None and set(update_fields) <= RATING_FIELDS):
+        return
+    bumpRestaurantAreas(instance.restaurant_id)
+
+
+@receiver(m2m_changed, sender=Restaurant.areas.through)
+def updateRestaurantAreasIndex(sender, instance, action, reverse, pk_set, **kwargs):
+    # در حالت reverse تغییر از سمت Area انجام شده و pk_set شامل آیدی رستوران‌هاست
+    if reverse:
+        restaurantIds, areaIds = pk_set, [instance.pk]
+    else:
+        restaurantIds, areaIds = [instance.pk], pk_set
+
+    if action == "post_add":
+        addAreasToIndex(restaurantIds, areaIds)
+    elif action == "post_remove":
+        removeAreasFromIndex(restaurantIds, areaIds)
+    elif action == "post_clear":
+        if reverse:
+            removeAreasFromIndex(areaIds=[instance.pk])
+        else:
+            removeAreasFromIndex([instance.pk])
+
+
+@receiver(foodsBulkChanged)
+def refreshBulkChangedFoods(sender, restaurantIds, foodIds=None, **kwargs):
+    rebuildFoodAreaIndex(restaurantIds, foodIds)
+    for restaurantId in restaurantIds:
+        syncRestaurantPriceSummary(restaurantId)
+    bumpRestaurantAreas(list(restaurantIds), bulk=True)
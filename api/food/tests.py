@@ -0,0 +1,429 @@
+from decimal import Decimal
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from Area.models import Area
+from City.models import City
+from FoodCategory.models import FoodCategory
+from restaurant.models import Restaurant
+from restaurantManager.models import RestaurantManager
+from services.Pagination import encodeCursor
+from services.ResponseCache import getCatalogCache
+from . import menu
+from .models import AreaFood, Food, RestaurantPriceSummary
+
+
+def createRestaurant(email, city):
+    manager = RestaurantManager.objects.create(email=email, firstName="a", lastName="b", isVerified=True)
+    return Restaurant.objects.create(
+        owner=manager, name="rest", address="addr addr addr", city=city, phoneNumber="09120000000",
+        startWorkHour=8, endWorkHour=22, isVerified=True
+    )
+
+
+class FoodCursorTests(TestCase):
+    def setUp(self):
+        getCatalogCache().clear()
+        self.client = APIClient()
+        city = City.objects.create(name="Tehran")
+        manager = RestaurantManager.objects.create(email="m@x.com", firstName="a", lastName="b", isVerified=True)
+        restaurant = Restaurant.objects.create(
+            owner=manager, name="rest", address="addr addr addr", city=city, phoneNumber="09120000000",
+            startWorkHour=8, endWorkHour=22, isVerified=True
+        )
+        category = FoodCategory.objects.create(name="c")
+        for i in range(3):
+            Food.objects.create(
+                name=f"food{i}", price=1000 * (i + 1), category=category, restaurant=restaurant, isAvailable=True
+            )
+
+    def test_tampered_cursor_is_bad_request(self):
+        cursor = encodeCursor(["x", "y"])
+        for url, data in (
+            ("/api/food/nearest", {}),
+            ("/api/food/filter/price", {}),
+            ("/api/food/search", {"sort": "price"}),
+            ("/api/food/search", {"sort": "newest"}),
+        ):
+            response = self.client.post(url, {**data, "cursor": cursor}, format="json")
+            self.assertEqual(response.status_code, 400, url)
+
+    def test_cursor_from_previous_page_continues(self):
+        response = self.client.post("/api/food/filter/price", {"limit": 2}, format="json")
+        self.assertEqual([row["price"] for row in response.data["data"]], [1000, 2000])
+        response = self.client.post(
+            "/api/food/filter/price", {"limit": 2, "cursor": response.data["nextCursor"]}, format="json"
+        )
+        self.assertEqual([row["price"] for row in response.data["data"]], [3000])
+
+
+class FoodAreaParamTests(TestCase):
+    def setUp(self):
+        getCatalogCache().clear()
+        self.client = APIClient()
+        restaurant = createRestaurant("m@x.com", City.objects.create(name="Tehran"))
+        self.category = FoodCategory.objects.create(name="c")
+        Food.objects.create(name="food", price=1000, category=self.category, restaurant=restaurant, isAvailable=True)
+
+    def test_non_numeric_area_is_bad_request(self):
+        # منطقه ناموجود مثل قبل رفتار می‌کند: nearest پوشش نداشتن منطقه را 404 می‌دهد و بقیه روی همه غذاها fallback می‌کنند
+        for url, data, unknownAreaStatus in (
+            ("/api/food/nearest", {}, 404),
+            ("/api/food/filter/category", {"categoryId": self.category.id}, 200),
+            ("/api/food/filter/price", {}, 200),
+        ):
+            with self.subTest(url=url):
+                response = self.client.post(url, {**data, "areaId": "abc"}, format="json")
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.data["message"], "پارامتر areaId نامعتبر است.")
+                response = self.client.post(url, {**data, "areaId": 999999}, format="json")
+                self.assertEqual(response.status_code, unknownAreaStatus)
+
+
+class FoodListQueryCountTests(TestCase):
+    """تعداد کوئری‌های فهرست‌های کارت غذا به تعداد ردیف‌های صفحه بستگی ندارد"""
+
+    def setUp(self):
+        self.client = APIClient()
+        city = City.objects.create(name="Tehran")
+        self.area = Area.objects.create(name="A1", city=city)
+        self.category = FoodCategory.objects.create(name="c")
+        self.restaurants = []
+        for i in range(3):
+            manager = RestaurantManager.objects.create(
+                email=f"m{i}@x.com", firstName="a", lastName="b", isVerified=True
+            )
+            restaurant = Restaurant.objects.create(
+                owner=manager, name=f"rest{i}", address="addr addr addr", city=city, phoneNumber="09120000000",
+                startWorkHour=8, endWorkHour=22, isVerified=True
+            )
+            restaurant.areas.add(self.area)
+            self.restaurants.append(restaurant)
+        self.addFoods(1)
+
+    def addFoods(self, count):
+        for i in range(count):
+            Food.objects.create(
+                name=f"food{i}", price=1000 + i, category=self.category, isAvailable=True,
+                restaurant=self.restaurants[i % len(self.restaurants)]
+            )
+
+    def post(self, url, data, rows):
+        # نسخه‌های کش کاتالوگ در TestCase بعد از commit بالا نمی‌روند؛ هر درخواست از کش خالی شروع می‌شود
+        getCatalogCache().clear()
+        response = self.client.post(url, data, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["data"]), rows)
+
+    def test_query_count_does_not_depend_on_row_count(self):
+        requests = (
+            ("/api/food/nearest", {}),
+            ("/api/food/nearest", {"areaId": self.area.id}),
+            ("/api/food/filter/rating", {}),
+            ("/api/food/filter/rating", {"openAt": 12}),
+            ("/api/food/filter/category", {"categoryId": self.category.id}),
+            ("/api/food/filter/category", {"categoryId": self.category.id, "areaId": self.area.id}),
+            ("/api/food/filter/price", {}),
+            ("/api/food/filter/price", {"areaId": self.area.id}),
+            ("/api/food/search", {"sort": "price", "areaId": self.area.id}),
+        )
+        counts = []
+        for url, data in requests:
+            with CaptureQueriesContext(connection) as context:
+                self.post(url, data, 1)
+            counts.append(len(context))
+
+        self.addFoods(20)
+        for (url, data), count in zip(requests, counts):
+            with self.subTest(url=url, data=data), self.assertNumQueries(count):
+                self.post(url, data, 21)
+
+
+class FoodSignalTests(TestCase):
+    def setUp(self):
+        city = City.objects.create(name="Tehran")
+        area = Area.objects.create(name="A1", city=city)
+        manager = RestaurantManager.objects.create(email="m@x.com", firstName="a", lastName="b", isVerified=True)
+        restaurant = Restaurant.objects.create(
+            owner=manager, name="rest", address="addr addr addr", city=city, phoneNumber="09120000000",
+            startWorkHour=8, endWorkHour=22, isVerified=True
+        )
+        restaurant.areas.add(area)
+        self.food = Food.objects.create(
+            name="food", price=1000, category=FoodCategory.objects.create(name="c"), restaurant=restaurant,
+            isAvailable=True
+        )
+
+    def test_rating_only_save_updates_only_index_rating(self):
+        self.food.ratingScore = Decimal("4.50")
+        with mock.patch("food.signals.syncFoodAreaIndex") as syncIndex, \
+                mock.patch("food.signals.syncRestaurantPriceSummary") as syncSummary, \
+                mock.patch("food.signals.bumpRestaurantAreas") as bump, \
+                mock.patch("search.signals._applyOnCommit") as reindex:
+            self.food.save(update_fields=["ratingScore", "updatedAt"])
+        syncIndex.assert_not_called()
+        syncSummary.assert_not_called()
+        bump.assert_not_called()
+        reindex.assert_not_called()
+        self.assertEqual(AreaFood.objects.get(food=self.food).ratingScore, Decimal("4.50"))
+
+    def test_price_save_updates_index_and_summary(self):
+        self.food.price = 2500
+        self.food.save(update_fields=["price", "updatedAt"])
+        self.assertEqual(AreaFood.objects.get(food=self.food).price, 2500)
+        self.assertEqual(RestaurantPriceSummary.objects.get(restaurant=self.food.restaurant).minPrice, 2500)
+
+
+class MenuImportExportTests(TestCase):
+    def setUp(self):
+        getCatalogCache().clear()
+        city = City.objects.create(name="Tehran")
+        self.restaurant = createRestaurant("m1@x.com", city)
+        otherRestaurant = createRestaurant("m2@x.com", city)
+        self.pizza = FoodCategory.objects.create(name="Pizza")
+        self.kebab = FoodCategory.objects.create(name="Kebab")
+        self.food = Food.objects.create(
+            name="پیتزا قارچ", price=2000, category=self.pizza, restaurant=self.restaurant, isAvailable=True
+        )
+        Food.objects.create(name="کباب", price=3000, category=self.kebab, restaurant=self.restaurant, description="تند")
+        self.otherFood = Food.objects.create(name="x", price=1000, category=self.pizza, restaurant=otherRestaurant)
+        self.client = APIClient()
+        session = self.client.session
+        session["restaurantManager_login"] = {"id": self.restaurant.owner_id, "email": "m1@x.com"}
+        session.save()
+
+    def menu(self):
+        return list(
+            Food.objects.filter(restaurant=self.restaurant).order_by("id").values_list(
+                "name", "price", "category_id", "description", "isAvailable"
+            )
+        )
+
+    def export(self, fileType):
+        response = self.client.get("/api/food/export", {"fileType": fileType})
+        self.assertEqual(response.status_code, 200)
+        return b"".join(response.streaming_content)
+
+    def importFile(self, content, fileName, expectedStatus=200):
+        response = self.client.post(
+            "/api/food/import", {"file": SimpleUploadedFile(fileName, content)}, format="multipart"
+        )
+        self.assertEqual(response.status_code, expectedStatus)
+        return response.data["data"] if expectedStatus == 200 else response.data
+
+    def test_round_trip(self):
+        for fileType in ("csv", "jsonl"):
+            with self.subTest(fileType=fileType):
+                before = self.menu()
+                report = self.importFile(self.export(fileType), f"menu.{fileType}")
+                self.assertEqual(
+                    report, {"created": 0, "updated": 0, "unchanged": 2, "failed": 0, "errors": []}
+                )
+                self.assertEqual(self.menu(), before)
+
+    def test_edited_export_updates_and_creates_rows(self):
+        content = self.export("csv").decode("utf-8-sig")
+        content = content.replace(f"{self.food.id},پیتزا قارچ,2000,", f"{self.food.id},پیتزا قارچ,2500,")
+        content += ",سالاد,900,Kebab,,,1\r\n"
+        report = self.importFile(content.encode(), "menu.csv")
+        self.assertEqual((report["created"], report["updated"], report["unchanged"]), (1, 1, 1))
+        self.assertEqual(Food.objects.get(id=self.food.id).price, 2500)
+        self.assertEqual(
+            Food.objects.filter(restaurant=self.restaurant, name="سالاد").values_list("price", "category_id").get(),
+            (900, self.kebab.id)
+        )
+
+    def test_reports_invalid_rows_with_line_numbers(self):
+        content = "\n".join([
+            "id,name,price,category,description,isAvailable",
+            ",سالاد,900,Pizza,,1",
+            ",سوپ,abc,Pizza,,1",
+            ",دوغ,500,نوشیدنی,,1",
+            f"{self.otherFood.id},x,1000,Pizza,,1",
+            ",ماست,300,Pizza,,شاید",
+        ]).encode()
+        report = self.importFile(content, "menu.csv")
+        self.assertEqual((report["created"], report["failed"]), (1, 4))
+        self.assertEqual(
+            report["errors"],
+            [
+                {"line": 3, "message": "مقدار قیمت معتبر نیست."},
+                {"line": 4, "message": "دسته‌بندی مورد نظر یافت نشد."},
+                {"line": 5, "message": "غذا یافت نشد یا متعلق به رستوران شما نیست."},
+                {"line": 6, "message": "مقدار isAvailable معتبر نیست."},
+            ]
+        )
+        self.assertEqual(Food.objects.get(id=self.otherFood.id).price, 1000)
+
+        content = '{"name": "سالاد", "price": 900, "category": "Pizza"}\n\nnot json\n[1]\n'.encode()
+        report = self.importFile(content, "menu.jsonl")
+        self.assertEqual(
+            report["errors"],
+            [{"line": 3, "message": "سطر JSON معتبر نیست."}, {"line": 4, "message": "هر سطر باید یک شیء JSON باشد."}]
+        )
+
+    def test_rejects_file_with_invalid_encoding(self):
+        before = self.menu()
+        content = "name,price,category\nسالاد,900,Pizza\n".encode("cp1256")
+        response = self.importFile(content, "menu.csv", expectedStatus=400)
+        self.assertEqual(response["message"], "فایل منو قابل خواندن نیست (کدگذاری باید UTF-8 باشد).")
+        self.assertEqual(self.menu(), before)
+
+    def test_applies_rows_in_batches(self):
+        rows = [f",food{i},{1000 + i},Pizza,,1" for i in range(4)] + [f"{self.food.id},پیتزا,2100,Pizza,,1"]
+        content = "\n".join(["id,name,price,category,description,isAvailable", *rows]).encode()
+        with mock.patch.object(menu, "MENU_IMPORT_BATCH_SIZE", 2), \
+                mock.patch.object(menu, "_applyBatch", wraps=menu._applyBatch) as applyBatch:
+            report = self.importFile(content, "menu.csv")
+        self.assertEqual([len(call.args[0]) for call in applyBatch.call_args_list], [2, 2, 1])
+        self.assertEqual((report["created"], report["updated"]), (4, 1))
+        self.assertEqual(Food.objects.filter(restaurant=self.restaurant, name__startswith="food").count(), 4)
+
+
+class BulkUpdateFoodsTests(TestCase):
+    def setUp(self):
+        getCatalogCache().clear()
+        city = City.objects.create(name="Tehran")
+        category = FoodCategory.objects.create(name="c")
+        restaurant = createRestaurant("m1@x.com", city)
+        otherRestaurant = createRestaurant("m2@x.com", city)
+        self.food = Food.objects.create(
+            name="a", price=1000, category=category, restaurant=restaurant, isAvailable=True
+        )
+        self.sameFood = Food.objects.create(
+            name="b", price=2000, category=category, restaurant=restaurant, isAvailable=True
+        )
+        self.otherFood = Food.objects.create(
+            name="c", price=3000, category=category, restaurant=otherRestaurant, isAvailable=True
+        )
+        self.client = APIClient()
+        session = self.client.session
+        session["restaurantManager_login"] = {"id": restaurant.owner_id, "email": "m1@x.com"}
+        session.save()
+
+    def post(self, changes, expectedStatus=200):
+        response = self.client.post("/api/food/bulk-update", {"changes": changes}, format="json")
+        self.assertEqual(response.status_code, expectedStatus)
+        return response.data
+
+    def test_applies_only_own_foods(self):
+        data = self.post([
+            {"foodId": self.food.id, "price": 1500, "isAvailable": "false"},
+            {"foodId": self.sameFood.id, "price": 2000},
+            {"foodId": self.otherFood.id, "price": 1},
+            {"foodId": 999999, "isAvailable": True},
+        ])["data"]
+        self.assertEqual(
+            data, {"updated": [self.food.id], "unchanged": [self.sameFood.id], "notFound": [self.otherFood.id, 999999]}
+        )
+        self.food.refresh_from_db()
+        self.assertEqual((self.food.price, self.food.isAvailable), (1500, False))
+        # غذای مدیر دیگر مثل غذای ناموجود رد می‌شود و تغییر نمی‌کند
+        self.assertEqual(Food.objects.get(id=self.otherFood.id).price, 3000)
+
+    def test_rejects_more_than_max_changes(self):
+        self.post([{"foodId": self.food.id, "price": 1000}] * menu.FOOD_CHANGES_MAX)
+        data = self.post([{"foodId": self.food.id, "price": 1500}] * (menu.FOOD_CHANGES_MAX + 1), 400)
+        self.assertEqual(data["message"], f"حداکثر {menu.FOOD_CHANGES_MAX} تغییر در هر درخواست پذیرفته می‌شود.")
+        self.assertEqual(Food.objects.get(id=self.food.id).price, 1000)
+
+    def test_rejects_invalid_values(self):
+        for change, message in (
+            ({"foodId": self.food.id, "price": "abc"}, "مقدار قیمت در تغییر 2 معتبر نیست."),
+            ({"foodId": self.food.id, "price": -5}, "مقدار قیمت در تغییر 2 معتبر نیست."),
+            ({"foodId": self.food.id, "isAvailable": "maybe"}, "مقدار isAvailable در تغییر 2 معتبر نیست."),
+            ({"foodId": self.food.id, "isAvailable": None}, "مقدار isAvailable در تغییر 2 معتبر نیست."),
+            ({"foodId": "x", "price": 10}, "آیدی غذا در تغییر 2 معتبر نیست."),
+            ({"foodId": self.food.id}, "تغییر 2 باید isAvailable یا price داشته باشد."),
+        ):
+            with self.subTest(change=change):
+                # کل درخواست رد می‌شود، حتی تغییر سالم قبل از ردیف نامعتبر
+                data = self.post([{"foodId": self.sameFood.id, "price": 2500}, change], 400)
+                self.assertEqual(data["message"], message)
+                self.assertEqual(Food.objects.get(id=self.sameFood.id).price, 2000)
+        self.assertEqual(self.post([], 400)["message"], "لیست changes الزامی است.")
+
+
+class SearchFoodsTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        restaurant = createRestaurant("m@x.com", City.objects.create(name="Tehran"))
+        self.first = FoodCategory.objects.create(name="c1")
+        self.second = FoodCategory.objects.create(name="c2")
+        # (دسته‌بندی، قیمت، امتیاز، امتیاز رتبه‌بندی، قابل سفارش)
+        self.foods = [
+            self.createFood(restaurant, self.first, 50000, "4.50", "4.2", True),
+            self.createFood(restaurant, self.first, 150000, "2.00", "2.5", True),
+            self.createFood(restaurant, self.second, 250000, "3.50", "3.9", True),
+            self.createFood(restaurant, self.second, 600000, "0.50", "1.0", False),
+            self.createFood(restaurant, self.second, 150000, "4.00", "4.0", True),
+        ]
+
+    def createFood(self, restaurant, category, price, ratingScore, rankingScore, isAvailable):
+        food = Food.objects.create(
+            name="food", price=price, category=category, restaurant=restaurant, isAvailable=isAvailable
+        )
+        Food.objects.filter(id=food.id).update(ratingScore=Decimal(ratingScore), rankingScore=Decimal(rankingScore))
+        return food.id
+
+    def post(self, **data):
+        getCatalogCache().clear()
+        response = self.client.post("/api/food/search", data, format="json")
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def ids(self, *indexes):
+        return [self.foods[index] for index in indexes]
+
+    def test_facet_counts(self):
+        facets = self.post()["facets"]
+        self.assertEqual(
+            facets["categories"],
+            [{"id": self.second.id, "name": "c2", "count": 3}, {"id": self.first.id, "name": "c1", "count": 2}]
+        )
+        self.assertEqual([bucket["count"] for bucket in facets["prices"]], [1, 2, 1, 0, 1])
+        self.assertEqual(facets["prices"][-1], {"min": 500000, "max": None, "count": 1})
+        self.assertEqual([bucket["count"] for bucket in facets["ratings"]], [1, 0, 1, 1, 2])
+        self.assertEqual(facets["ratings"][-1], {"min": 4, "max": 5, "count": 2})
+
+    def test_facets_follow_filters(self):
+        facets = self.post(isAvailable="true", maxPrice=200000)["facets"]
+        self.assertEqual(
+            [(category["id"], category["count"]) for category in facets["categories"]],
+            [(self.first.id, 2), (self.second.id, 1)]
+        )
+        self.assertEqual([bucket["count"] for bucket in facets["prices"]], [1, 2, 0, 0, 0])
+        self.assertEqual([bucket["count"] for bucket in facets["ratings"]], [0, 0, 1, 0, 2])
+
+    def test_sorts_across_pages(self):
+        for sort, expected in (
+            ("rating", self.ids(0, 4, 2, 1, 3)),
+            # قیمت‌های برابر با آیدی در همان جهت مرتب می‌شوند
+            ("price", self.ids(0, 1, 4, 2, 3)),
+            ("priceDesc", self.ids(3, 2, 4, 1, 0)),
+            ("newest", self.ids(4, 3, 2, 1, 0)),
+        ):
+            with self.subTest(sort=sort):
+                foodIds, cursor = [], None
+                while True:
+                    data = self.post(sort=sort, limit=2, **({"cursor": cursor} if cursor else {}))
+                    foodIds += [row["id"] for row in data["data"]]
+                    cursor = data["nextCursor"]
+                    if not cursor:
+                        break
+                self.assertEqual(foodIds, expected)
+
+    def test_rating_sort_of_category_matches_leaderboard(self):
+        data = self.post(sort="rating", categoryId=self.second.id, isAvailable="true")
+        self.assertEqual([row["id"] for row in data["data"]], self.ids(4, 2))
+        self.assertEqual(self.post(sort="rating", categoryId=self.second.id)["data"][-1]["id"], self.foods[3])
+
+    def test_rejects_unknown_sort(self):
+        getCatalogCache().clear()
+        response = self.client.post("/api/food/search", {"sort": "name"}, format="json")
+        self.assertEqual(response.status_code, 400)
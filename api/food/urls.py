@@ -1,14 +1,19 @@
 from django.urls import path
 from .views import AddFoodView, GetFoodsByAreaView, FilterFoodsByPrice, FilterFoodsByRating, FilterFoodsByCategory, \
-    GetFoodDetails, DeleteFood, EditFoodView
+    GetFoodDetails, DeleteFood, EditFoodView, SearchFoodsView, ImportMenuView, ExportMenuView, \
+    BulkUpdateFoodsView
 
 urlpatterns = [
     path('add', AddFoodView.as_view(), name='food-add'),
     path('edit', EditFoodView.as_view(), name='food-edit'),
+    path('bulk-update', BulkUpdateFoodsView.as_view(), name='food-bulk-update'),
     path('delete', DeleteFood.as_view(), name='food-delete'),
+    path('import', ImportMenuView.as_view(), name='food-import'),
+    path('export', ExportMenuView.as_view(), name='food-export'),
     path('nearest', GetFoodsByAreaView.as_view(), name='food-add'),
     path('filter/rating', FilterFoodsByRating.as_view(), name='food-filter-by-rating'),
     path('filter/price', FilterFoodsByPrice.as_view(), name='food-filter-by-price'),
     path('filter/category', FilterFoodsByCategory.as_view(), name='food-filter-by-category'),
     path('details', GetFoodDetails.as_view(), name='food-details'),
+    path('search', SearchFoodsView.as_view(), name='food-search'),
 ]
\ No newline at end of file
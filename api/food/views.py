@@ -1,17 +1,31 @@
+from django.http import StreamingHttpResponse
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 
-from Area.models import Area
-from restaurant.models import Restaurant
 from restaurant.services import getRestaurantByRestaurantManagerId
 from review.models import FoodReview
 from services.Authorization import require_authorization_manager
 from services.ImageValidation import ImageValidation
+from services.Pagination import InvalidCursor
+from services.ResponseCache import cacheResponse, conditionalResponse, getKnownAreaIds
 from services.UploadImages import uploadImage
+from services.WorkingHours import InvalidHour, filterOpenAt, getRequestedHour
 from restaurantManager.services import getRestaurantManager
 from FoodCategory.models import FoodCategory
+from leaderboard.boards import ALL_KEY, areaKey, categoryKey, foodLeaderboards
+from .menu import InvalidMenuFile, InvalidMenuRow, applyFoodChanges, exportMenu, getMenuFormat, importMenu, \
+    parseFoodChanges
 from .models import Food
+from .services import (
+    filterFoodsByArea,
+    getAreaFoodListStamp,
+    getFoodCardPage,
+    getFoodCardPageInArea,
+    getFoodCardsByIds,
+    getFoodDetailsStamp,
+    getFoodFacets,
+)
 
 
 class AddFoodView(APIView):
@@ -185,88 +199,206 @@ class DeleteFood(APIView):
         )
 
 
+class BulkUpdateFoodsView(APIView):
+    @require_authorization_manager
+    def post(self, request):
+        try:
+            changes = parseFoodChanges(request.data.get("changes"))
+        except InvalidMenuRow as error:
+            return Response({
+                "status": "error",
+                "message": str(error)
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        # مالکیت از روی نشست مدیر و در همان کوئری خواندن غذاها بررسی می‌شود
+        managerData = request.session.get('restaurantManager_login')
+        updated, unchanged, notFound = applyFoodChanges(managerData['id'], managerData['email'], changes)
+
+        return Response({
+            "status": "success",
+            "message": "تغییرات غذاها اعمال شد.",
+            "data": {
+                "updated": updated,
+                "unchanged": unchanged,
+                "notFound": notFound
+            }
+        }, status=status.HTTP_200_OK)
+
+
+def _getManagerRestaurant(request):
+    """رستوران تاییدشده مدیر فعلی یا پاسخ خطا"""
+    restaurant = getRestaurantByRestaurantManagerId(restaurantManagerId=getRestaurantManager(request).id).first()
+    if not restaurant:
+        return None, Response({
+            "status": "error",
+            "message": "شما هنوز رستوران ثبت نکرده‌اید."
+        }, status=status.HTTP_400_BAD_REQUEST)
+    if not restaurant.isVerified:
+        return None, Response({
+            "status": "error",
+            "message": "رستوران شما به تایید ادمین نرسیده است. بنابراین نمیتوانید غذا ثبت کنید."
+        }, status=status.HTTP_400_BAD_REQUEST)
+    return restaurant, None
+
+
+class ImportMenuView(APIView):
+    @require_authorization_manager
+    def post(self, request):
+        menuFile = request.FILES.get("file")
+        if not menuFile:
+            return Response({
+                "status": "error",
+                "message": "فایل منو ارسال نشده است."
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        menuFormat = getMenuFormat(menuFile.name, request.data.get("fileType"))
+        if menuFormat is None:
+            return Response({
+                "status": "error",
+                "message": "قالب فایل باید csv یا jsonl باشد."
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        restaurant, error = _getManagerRestaurant(request)
+        if error:
+            return error
+
+        try:
+            report = importMenu(restaurant, menuFile, menuFormat)
+        except InvalidMenuFile:
+            return Response({
+                "status": "error",
+                "message": "فایل منو قابل خواندن نیست (کدگذاری باید UTF-8 باشد)."
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            "status": "success",
+            "message": "منو وارد شد.",
+            "data": report.asDict()
+        }, status=status.HTTP_200_OK)
+
+
+class ExportMenuView(APIView):
+    @require_authorization_manager
+    def get(self, request):
+        menuFormat = getMenuFormat("", request.query_params.get("fileType", "csv"))
+        if menuFormat is None:
+            return Response({
+                "status": "error",
+                "message": "قالب فایل باید csv یا jsonl باشد."
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        restaurant = getRestaurantByRestaurantManagerId(restaurantManagerId=getRestaurantManager(request).id).first()
+        if not restaurant:
+            return Response({
+                "status": "error",
+                "message": "شما هنوز رستوران ثبت نکرده‌اید."
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        contentType = "text/csv" if menuFormat == "csv" else "application/x-ndjson"
+        response = StreamingHttpResponse(exportMenu(restaurant, menuFormat), content_type=f"{contentType}; charset=utf-8")
+        response["Content-Disposition"] = f'attachment; filename="menu-{restaurant.id}.{menuFormat}"'
+        return response
+
+
 class GetFoodsByAreaView(APIView):
+    @conditionalResponse('foodsByArea', lambda request: getAreaFoodListStamp(request.data.get('areaId')))
+    @cacheResponse('foodsByArea')
     def post(self, request):
         areaId = request.data.get('areaId')
+        pageOptions = {'cursor': request.data.get('cursor'), 'limit': request.data.get('limit')}
+
+        try:
+            openHour = getRequestedHour(request.data)
+        except InvalidHour:
+            return Response({
+                "status": "error",
+                "message": "پارامتر openAt نامعتبر است."
+            }, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            areaId = int(areaId) if areaId else None
+        except (TypeError, ValueError):
+            return Response({
+                "status": "error",
+                "message": "پارامتر areaId نامعتبر است."
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        foods = filterOpenAt(Food.objects.all(), openHour, 'restaurant__openHoursMask')
 
         try:
             if not areaId:
-                foods = Food.objects.all()
+                foodList, nextCursor = getFoodCardPage(foods, **pageOptions)
             else:
-                area = Area.objects.get(id=int(areaId))
-                restaurants = Restaurant.objects.filter(areas=area)
-                foods = Food.objects.filter(restaurant__in=restaurants, isAvailable=True)
-        except Area.DoesNotExist:
+                foodList, nextCursor = getFoodCardPageInArea(foods, areaId, **pageOptions)
+        except InvalidCursor:
+            return Response({
+                "status": "error",
+                "message": "پارامتر cursor نامعتبر است."
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        if foodList is None:
             return Response({
                 "status": "error",
                 "message": "منطقه انتخابی توسط سامانه پوشش داده نمیشود."
             }, status=status.HTTP_404_NOT_FOUND)
 
-        foodList = []
-        for food in foods:
-            foodList.append({
-                "id": food.id,
-                "name": food.name,
-                "price": food.price,
-                "description": food.description,
-                "image": food.image,
-                "categoryId": food.category.id,
-                "categoryName": food.category.name,
-                "restaurantId": food.restaurant.id,
-                "restaurantName": food.restaurant.name,
-                "isAvailable": food.isAvailable,
-                "ratingScore": float(food.ratingScore),
-                "ratingTotalVoters": food.ratingTotalVoters,
-            })
-
         return Response({
             "status": "success",
             "message": "غذاهای رستوران های نزدیک جستجو شد.",
-            "data": foodList
+            "data": foodList,
+            "nextCursor": nextCursor
         }, status=status.HTTP_200_OK)
 
 
 class FilterFoodsByRating(APIView):
+    @cacheResponse('foodsByRating')
     def post(self, request):
         areaId = request.data.get('areaId')
+        cursor, limit = request.data.get('cursor'), request.data.get('limit')
 
-        foods = Food.objects.filter(isAvailable=True)
-        if areaId:
-            try:
-                area = Area.objects.get(id=int(areaId))
-                restaurants = Restaurant.objects.filter(areas=area)
-                foods = foods.filter(restaurant__in=restaurants)
-            except Area.DoesNotExist:
-                # اگر منطقه یافت نشد، روی همه غذاها کار کن
-                pass
-
-        foods = foods.order_by('-ratingScore')[:100]
-
-        data = []
-        for food in foods:
-            data.append({
-                "id": food.id,
-                "name": food.name,
-                "price": food.price,
-                "description": food.description,
-                "image": food.image,
-                "categoryId": food.category.id,
-                "categoryName": food.category.name,
-                "restaurantId": food.restaurant.id,
-                "restaurantName": food.restaurant.name,
-                "isAvailable": food.isAvailable,
-                "ratingScore": float(food.ratingScore),
-                "ratingTotalVoters": food.ratingTotalVoters,
-            })
+        try:
+            openHour = getRequestedHour(request.data)
+        except InvalidHour:
+            return Response({
+                "status": "error",
+                "message": "پارامتر openAt نامعتبر است."
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            areaId = int(areaId) if areaId else None
+        except (TypeError, ValueError):
+            areaId = None
+        # اگر منطقه یافت نشد، روی همه غذاها کار کن
+        key = areaKey(areaId) if areaId in getKnownAreaIds() else ALL_KEY
+
+        try:
+            # صفحه از جدول top-K درون حافظه؛ فقط صفحه‌های عمیق‌تر از جدول (یا فیلتر ساعت کاری) به مرتب‌سازی دیتابیس می‌رسند
+            page = foodLeaderboards.page(key, cursor, limit) if openHour is None else None
+            if page is not None:
+                foodIds, nextCursor = page
+                data = getFoodCardsByIds(foodIds)
+            else:
+                foods = filterOpenAt(Food.objects.filter(isAvailable=True), openHour, 'restaurant__openHoursMask')
+                if key != ALL_KEY:
+                    foods = filterFoodsByArea(foods, areaId)
+                data, nextCursor = getFoodCardPage(
+                    foods, 'rankingScore', descending=True, cursor=cursor, limit=limit
+                )
+        except InvalidCursor:
+            return Response({
+                "status": "error",
+                "message": "پارامتر cursor نامعتبر است."
+            }, status=status.HTTP_400_BAD_REQUEST)
 
         return Response({
             "status": "success",
             "message": "غذاهای برتر بر اساس امتیاز جستجو شدند.",
-            "data": data
+            "data": data,
+            "nextCursor": nextCursor
         }, status=status.HTTP_200_OK)
 
 
 class FilterFoodsByCategory(APIView):
+    @cacheResponse('foodsByCategory')
     def post(self, request):
         areaId = request.data.get('areaId')
         categoryId = request.data.get('categoryId')
@@ -277,92 +409,196 @@ class FilterFoodsByCategory(APIView):
                 "message": "آیدی دسته‌بندی غذا را وارد کنید."
             }, status=status.HTTP_400_BAD_REQUEST)
 
-        foods = Food.objects.filter(isAvailable=True, category_id=categoryId)
-        if areaId:
-            try:
-                area = Area.objects.get(id=int(areaId))
-                restaurants = Restaurant.objects.filter(areas=area)
-                foods = foods.filter(restaurant__in=restaurants)
-            except Area.DoesNotExist:
+        try:
+            openHour = getRequestedHour(request.data)
+        except InvalidHour:
+            return Response({
+                "status": "error",
+                "message": "پارامتر openAt نامعتبر است."
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            areaId = int(areaId) if areaId else None
+        except (TypeError, ValueError):
+            return Response({
+                "status": "error",
+                "message": "پارامتر areaId نامعتبر است."
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        foods = filterOpenAt(Food.objects.filter(isAvailable=True, category_id=categoryId), openHour, 'restaurant__openHoursMask')
+        pageOptions = {'cursor': request.data.get('cursor'), 'limit': request.data.get('limit')}
+
+        try:
+            data = None
+            if areaId:
+                data, nextCursor = getFoodCardPageInArea(foods, areaId, **pageOptions)
+            if data is None:
                 # اگر منطقه یافت نشد، روی همه غذاها فیلتر دسته‌بندی بزن
-                pass
-
-        data = []
-        for food in foods:
-            data.append({
-                "id": food.id,
-                "name": food.name,
-                "price": food.price,
-                "description": food.description,
-                "image": food.image,
-                "categoryId": food.category.id,
-                "categoryName": food.category.name,
-                "restaurantId": food.restaurant.id,
-                "restaurantName": food.restaurant.name,
-                "isAvailable": food.isAvailable,
-                "ratingScore": float(food.ratingScore),
-                "ratingTotalVoters": food.ratingTotalVoters,
-            })
+                data, nextCursor = getFoodCardPage(foods, **pageOptions)
+        except InvalidCursor:
+            return Response({
+                "status": "error",
+                "message": "پارامتر cursor نامعتبر است."
+            }, status=status.HTTP_400_BAD_REQUEST)
 
         return Response({
             "status": "success",
             "message": "غذاهای دسته‌بندی شده جستجو شدند.",
-            "data": data
+            "data": data,
+            "nextCursor": nextCursor
         }, status=status.HTTP_200_OK)
 
 
 class FilterFoodsByPrice(APIView):
+    @cacheResponse('foodsByPrice')
     def post(self, request):
         areaId = request.data.get('areaId')
         priceOrder = request.data.get('priceOrder', 'asc')  # پیش‌فرض صعودی
         minPrice = request.data.get('minPrice')
         maxPrice = request.data.get('maxPrice')
 
-        foods = Food.objects.filter(isAvailable=True)
+        try:
+            openHour = getRequestedHour(request.data)
+        except InvalidHour:
+            return Response({
+                "status": "error",
+                "message": "پارامتر openAt نامعتبر است."
+            }, status=status.HTTP_400_BAD_REQUEST)
 
-        if areaId:
-            try:
-                area = Area.objects.get(id=int(areaId))
-                restaurants = Restaurant.objects.filter(areas=area)
-                foods = foods.filter(restaurant__in=restaurants)
-            except Area.DoesNotExist:
-                pass
+        try:
+            areaId = int(areaId) if areaId else None
+        except (TypeError, ValueError):
+            return Response({
+                "status": "error",
+                "message": "پارامتر areaId نامعتبر است."
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        foods = filterOpenAt(Food.objects.filter(isAvailable=True), openHour, 'restaurant__openHoursMask')
 
         if minPrice is not None:
             foods = foods.filter(price__gte=minPrice)
         if maxPrice is not None:
             foods = foods.filter(price__lte=maxPrice)
 
-        if priceOrder == "desc":
-            foods = foods.order_by("price")
-        else:
-            foods = foods.order_by("price")
-
-        data = []
-        for food in foods:
-            data.append({
-                "id": food.id,
-                "name": food.name,
-                "price": food.price,
-                "description": food.description,
-                "image": food.image,
-                "categoryId": food.category.id,
-                "categoryName": food.category.name,
-                "restaurantId": food.restaurant.id,
-                "restaurantName": food.restaurant.name,
-                "isAvailable": food.isAvailable,
-                "ratingScore": float(food.ratingScore),
-                "ratingTotalVoters": food.ratingTotalVoters,
-            })
+        pageOptions = {
+            'sortField': 'price', 'descending': priceOrder == "desc",
+            'cursor': request.data.get('cursor'), 'limit': request.data.get('limit'),
+        }
+
+        try:
+            data = None
+            if areaId:
+                data, nextCursor = getFoodCardPageInArea(foods, areaId, **pageOptions)
+            if data is None:
+                data, nextCursor = getFoodCardPage(foods, **pageOptions)
+        except InvalidCursor:
+            return Response({
+                "status": "error",
+                "message": "پارامتر cursor نامعتبر است."
+            }, status=status.HTTP_400_BAD_REQUEST)
 
         return Response({
             "status": "success",
             "message": "غذاها بر اساس بازه قیمت جستجو شدند.",
-            "data": data
+            "data": data,
+            "nextCursor": nextCursor
+        }, status=status.HTTP_200_OK)
+
+
+class SearchFoodsView(APIView):
+    # کلید مرتب‌سازی ← (فیلد، نزولی)
+    SORT_OPTIONS = {
+        "rating": ("rankingScore", True),
+        "price": ("price", False),
+        "priceDesc": ("price", True),
+        "newest": (None, True),
+    }
+
+    @cacheResponse('foodSearch')
+    def post(self, request):
+        data = request.data
+        sort = data.get('sort', 'newest')
+        if sort not in self.SORT_OPTIONS:
+            return Response({
+                "status": "error",
+                "message": "پارامتر sort نامعتبر است."
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            areaId = int(data['areaId']) if data.get('areaId') else None
+            categoryId = int(data['categoryId']) if data.get('categoryId') else None
+            minPrice = int(data['minPrice']) if data.get('minPrice') not in (None, '') else None
+            maxPrice = int(data['maxPrice']) if data.get('maxPrice') not in (None, '') else None
+            minRating = float(data['minRating']) if data.get('minRating') not in (None, '') else None
+        except (TypeError, ValueError):
+            return Response({
+                "status": "error",
+                "message": "پارامترهای عددی جستجو نامعتبر هستند."
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            openHour = getRequestedHour(request.data)
+        except InvalidHour:
+            return Response({
+                "status": "error",
+                "message": "پارامتر openAt نامعتبر است."
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        isAvailable = data.get('isAvailable')
+        if isAvailable is not None and isAvailable != '':
+            isAvailable = str(isAvailable).lower() in ('1', 'true')
+        else:
+            isAvailable = None
+
+        foods = Food.objects.all()
+        if areaId:
+            foods = filterFoodsByArea(foods, areaId, onlyAvailable=isAvailable is True)
+        if isAvailable is not None:
+            foods = foods.filter(isAvailable=isAvailable)
+        if categoryId:
+            foods = foods.filter(category_id=categoryId)
+        if minPrice is not None:
+            foods = foods.filter(price__gte=minPrice)
+        if maxPrice is not None:
+            foods = foods.filter(price__lte=maxPrice)
+        if minRating is not None:
+            foods = foods.filter(ratingScore__gte=minRating)
+        foods = filterOpenAt(foods, openHour, 'restaurant__openHoursMask')
+
+        sortField, descending = self.SORT_OPTIONS[sort]
+        # مرتب‌سازی امتیاز غذاهای قابل سفارش یک دسته‌بندی بدون فیلتر دیگر از جدول top-K همان دسته‌بندی خوانده می‌شود
+        useLeaderboard = (
+            sort == 'rating' and categoryId and isAvailable is True
+            and not areaId and minPrice is None and maxPrice is None and minRating is None and openHour is None
+        )
+        try:
+            page = None
+            if useLeaderboard:
+                page = foodLeaderboards.page(categoryKey(categoryId), data.get('cursor'), data.get('limit'))
+            if page is not None:
+                foodIds, nextCursor = page
+                foodList = getFoodCardsByIds(foodIds)
+            else:
+                foodList, nextCursor = getFoodCardPage(
+                    foods, sortField, descending, cursor=data.get('cursor'), limit=data.get('limit')
+                )
+        except InvalidCursor:
+            return Response({
+                "status": "error",
+                "message": "پارامتر cursor نامعتبر است."
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            "status": "success",
+            "message": "غذاها جستجو شدند.",
+            "data": foodList,
+            "facets": getFoodFacets(foods),
+            "nextCursor": nextCursor
         }, status=status.HTTP_200_OK)
 
 
 class GetFoodDetails(APIView):
+    @conditionalResponse('foodDetails', lambda request: getFoodDetailsStamp(request.data.get('foodId')))
     def post(self, request):
         food_id = request.data.get("foodId")
         if not food_id:
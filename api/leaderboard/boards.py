@@ -0,0 +1,185 @@
+import bisect
+import threading
+from decimal import Decimal, InvalidOperation
+
+from services.Pagination import InvalidCursor, decodeCursor, encodeCursor, getPageSize
+from services.ResponseCache import ALL_AREAS_SCOPE, areaScope, followVersion, getVersions
+
+# تعداد ردیف‌هایی که هر جدول حداقل نگه می‌دارد؛ برای جذب حذف‌ها تا دو برابر آن نگه داشته می‌شود
+LEADERBOARD_SIZE = 100
+
+ALL_KEY = ("all",)
+
+
+def areaKey(areaId):
+    return ("area", areaId)
+
+
+def categoryKey(categoryId):
+    return ("category", categoryId)
+
+
+class TopKBoard:
+    """
+    ردیف‌های برتر یک مجموعه به ترتیب (امتیاز، آیدی) نزولی؛ همان ترتیب صفحه‌بندی keyset در دیتابیس.
+    complete یعنی کل مجموعه در جدول جا شده و هر صفحه‌ای از آن قابل پاسخ است.
+    version نسخه scope کش کاتالوگ است که جدول با آن هماهنگ است؛ None یعنی باید دوباره از دیتابیس بارگذاری شود.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.capacity = 2 * size
+        self.entries = []  # (-score, -id) به ترتیب صعودی
+        self.scores = {}
+        self.complete = False
+        self.version = None
+
+    def __len__(self):
+        return len(self.entries)
+
+    def load(self, rows, version):
+        rows = [(itemId, Decimal(str(score))) for itemId, score in rows]
+        self.complete = len(rows) <= self.capacity
+        rows = rows[:self.capacity]
+        self.entries = sorted((-score, -itemId) for itemId, score in rows)
+        self.scores = dict(rows)
+        self.version = version
+
+    def _remove(self, itemId):
+        score = self.scores.pop(itemId, None)
+        if score is not None:
+            del self.entries[bisect.bisect_left(self.entries, (-score, -itemId))]
+
+    def _checkShortage(self):
+        # اگر بخشی از مجموعه بیرون جدول است و جدول از K کمتر شده، در خواندن بعدی دوباره پر می‌شود
+        if not self.complete and len(self.entries) < self.size:
+            self.version = None
+
+    def discard(self, itemId):
+        self._remove(itemId)
+        self._checkShortage()
+
+    def offer(self, itemId, score):
+        self._remove(itemId)
+        entry = (-score, -itemId)
+        # اگر ردیف از بدترین ردیف جدول بدتر باشد و ردیف‌هایی بیرون جدول وجود داشته باشند، جایگاهش معلوم نیست
+        if self.complete or (self.entries and entry < self.entries[-1]):
+            bisect.insort(self.entries, entry)
+            self.scores[itemId] = score
+            if len(self.entries) > self.capacity:
+                _, negativeId = self.entries.pop()
+                del self.scores[-negativeId]
+                self.complete = False
+        self._checkShortage()
+
+    def page(self, cursor, limit):
+        """(آیدی‌ها، cursor صفحه بعد)؛ اگر صفحه کامل در جدول نباشد None"""
+        start = 0
+        if cursor:
+            score, lastId = decodeCursor(cursor)
+            try:
+                start = bisect.bisect_right(self.entries, (-Decimal(str(score)), -int(lastId)))
+            except (InvalidOperation, TypeError, ValueError):
+                raise InvalidCursor(cursor)
+
+        window = self.entries[start:start + limit + 1]
+        if len(window) <= limit and not self.complete:
+            return None
+
+        ids = [-negativeId for _, negativeId in window[:limit]]
+        nextCursor = None
+        if len(window) > limit:
+            negativeScore, negativeId = window[limit - 1]
+            nextCursor = encodeCursor([-negativeScore, -negativeId])
+        return ids, nextCursor
+
+
+class Leaderboards:
+    """
+    جدول‌های top-K درون‌فرایندی به ازای هر کلید (همه، منطقه، دسته‌بندی).
+    جدول‌ها در اولین درخواست ساخته می‌شوند و با سیگنال‌های leaderboard/signals.py به صورت افزایشی به‌روز می‌مانند.
+    هماهنگی بین worker ها با نسخه scope های کش کاتالوگ انجام می‌شود: اگر نسخه scope جدول با نسخه‌ای که
+    جدول با آن هماهنگ است فرق کند (تغییری در worker دیگر)، جدول قبل از پاسخ دوباره بارگذاری می‌شود.
+    """
+
+    def __init__(self, loadRows):
+        self.loadRows = loadRows  # (key, limit) -> [(id, score), ...] به ترتیب نزولی
+        self.boards = {}
+        self.lock = threading.RLock()
+
+    @staticmethod
+    def scopeOf(key):
+        return areaScope(key[1]) if key[0] == "area" else ALL_AREAS_SCOPE
+
+    def getBoard(self, key):
+        version = getVersions([self.scopeOf(key)])[0]
+        with self.lock:
+            board = self.boards.get(key)
+            if board is None:
+                board = self.boards[key] = TopKBoard(LEADERBOARD_SIZE)
+            if board.version != version:
+                board.load(self.loadRows(key, board.capacity + 1), version)
+            return board
+
+    def page(self, key, cursor=None, limit=None):
+        limit = getPageSize(limit)
+        with self.lock:
+            return self.getBoard(key).page(cursor, limit)
+
+    def update(self, itemId, score, keys):
+        """ردیف را در جدول کلیدهای keys با امتیاز جدید قرار می‌دهد و از بقیه جدول‌ها حذف می‌کند"""
+        score = Decimal(str(score))
+        with self.lock:
+            for key, board in self.boards.items():
+                if key in keys:
+                    board.offer(itemId, score)
+                else:
+                    board.discard(itemId)
+
+    def invalidate(self, keys):
+        with self.lock:
+            for key in keys:
+                board = self.boards.get(key)
+                if board is not None:
+                    board.version = None
+
+    def onVersionsBumped(self, versions, bulk=False):
+        with self.lock:
+            for key, board in self.boards.items():
+                version = versions.get(self.scopeOf(key))
+                if version is not None:
+                    board.version = followVersion(board.version, version, bulk)
+
+
+def getFoodBoardQuerySet(key):
+    """غذاهای عضو جدول یک کلید؛ همان مجموعه‌ای که FilterFoodsByRating مرتب می‌کند"""
+    from food.models import Food
+    from food.services import filterFoodsByArea
+
+    foods = Food.objects.filter(isAvailable=True)
+    if key[0] == "area":
+        foods = filterFoodsByArea(foods, key[1])
+    elif key[0] == "category":
+        foods = foods.filter(category_id=key[1])
+    return foods
+
+
+def getRestaurantBoardQuerySet(key):
+    from restaurant.models import Restaurant
+
+    restaurants = Restaurant.objects.all()
+    if key[0] == "area":
+        restaurants = restaurants.filter(areas=key[1])
+    return restaurants
+
+
+def loadFoodRows(key, limit):
+    return getFoodBoardQuerySet(key).order_by("-rankingScore", "-id").values_list("id", "rankingScore")[:limit]
+
+
+def loadRestaurantRows(key, limit):
+    return getRestaurantBoardQuerySet(key).order_by("-rankingScore", "-id").values_list("id", "rankingScore")[:limit]
+
+
+foodLeaderboards = Leaderboards(loadFoodRows)
+restaurantLeaderboards = Leaderboards(loadRestaurantRows)
@@ -0,0 +1,81 @@
+from django.core.management.base import BaseCommand
+
+from Area.models import Area
+from FoodCategory.models import FoodCategory
+from leaderboard.boards import (
+    ALL_KEY,
+    areaKey,
+    categoryKey,
+    foodLeaderboards,
+    getFoodBoardQuerySet,
+    getRestaurantBoardQuerySet,
+    restaurantLeaderboards,
+)
+from services.Pagination import MAX_PAGE_SIZE, paginateByKeyset
+from services.ResponseCache import ALL_AREAS_SCOPE, areaScope, bumpScopes
+
+
+class Command(BaseCommand):
+    help = (
+        "بازسازی جدول‌های امتیاز (top-K) در همه worker ها با افزایش نسخه scope های کش کاتالوگ، "
+        "یا مقایسه صفحه‌های جدول با نتیجه SQL با --check"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true', help="فقط اختلاف‌ها را گزارش کن و چیزی ننویس")
+
+    def handle(self, *args, **options):
+        areaIds = list(Area.objects.values_list('id', flat=True))
+
+        if not options['check']:
+            # هر worker در خواندن بعدی جدول‌هایش را از دیتابیس بارگذاری می‌کند
+            # (با بک‌اند locmem نسخه‌ها مخصوص هر فرایند است و باید worker ها را restart کرد)
+            bumpScopes([ALL_AREAS_SCOPE] + [areaScope(areaId) for areaId in areaIds], bulk=True)
+            self.stdout.write(self.style.SUCCESS("نسخه جدول‌های امتیاز افزایش یافت؛ در خواندن بعدی بازسازی می‌شوند."))
+            return
+
+        areaKeys = [areaKey(areaId) for areaId in areaIds]
+        categoryKeys = [categoryKey(categoryId) for categoryId in FoodCategory.objects.values_list('id', flat=True)]
+        boards = [
+            ("food", foodLeaderboards, getFoodBoardQuerySet, "rankingScore", [ALL_KEY] + areaKeys + categoryKeys),
+            ("restaurant", restaurantLeaderboards, getRestaurantBoardQuerySet, "rankingScore", [ALL_KEY] + areaKeys),
+        ]
+
+        mismatches = 0
+        checked = 0
+        for name, leaderboards, getQuerySet, sortField, keys in boards:
+            for key in keys:
+                boardIds, sqlIds = self.walk(leaderboards, getQuerySet(key), sortField, key)
+                checked += 1
+                if boardIds != sqlIds:
+                    mismatches += 1
+                    self.stderr.write(f"{name} {key}: board={boardIds[:10]} sql={sqlIds[:10]}")
+
+        self.stdout.write(f"checked={checked} mismatched={mismatches}")
+        if mismatches:
+            self.stderr.write(self.style.ERROR("جدول‌های امتیاز با نتیجه SQL هماهنگ نیستند."))
+            raise SystemExit(1)
+        self.stdout.write(self.style.SUCCESS("جدول‌های امتیاز با نتیجه SQL هماهنگ هستند."))
+
+    @staticmethod
+    def walk(leaderboards, queryset, sortField, key):
+        """همه صفحه‌هایی که از جدول سرو می‌شوند و همان تعداد ردیف از صفحه‌بندی SQL"""
+        boardIds = []
+        cursor = None
+        while True:
+            page = leaderboards.page(key, cursor, MAX_PAGE_SIZE)
+            if page is None:
+                break
+            ids, cursor = page
+            boardIds.extend(ids)
+            if cursor is None:
+                break
+
+        sqlIds = []
+        cursor = None
+        while len(sqlIds) < len(boardIds):
+            rows, cursor = paginateByKeyset(queryset.values('id', sortField), sortField, True, cursor, MAX_PAGE_SIZE)
+            sqlIds.extend(row['id'] for row in rows)
+            if cursor is None:
+                break
+        return boardIds, sqlIds[:len(boardIds)]
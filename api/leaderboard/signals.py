@@ -0,0 +1,76 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from food.models import Food
+from restaurant.models import Restaurant
+from services.ResponseCache import versionsBumped
+from .boards import ALL_KEY, areaKey, categoryKey, foodLeaderboards, restaurantLeaderboards
+
+# تغییرات بعد از commit و قبل از افزایش نسخه‌های کش کاتالوگ اعمال می‌شوند (اپ leaderboard در INSTALLED_APPS
+# قبل از restaurant و food آمده است)، تا جدولی که نسخه جدید را می‌پذیرد همیشه شامل همان تغییر باشد.
+
+
+def _restaurantAreaIds(restaurantId):
+    if not restaurantId:
+        return []
+    return Restaurant.areas.through.objects.filter(restaurant_id=restaurantId).values_list("area_id", flat=True)
+
+
+def _updateFood(foodId):
+    food = Food.objects.filter(id=foodId).only("id", "rankingScore", "isAvailable", "category_id", "restaurant_id").first()
+    keys = set()
+    if food is not None and food.isAvailable:
+        keys = {ALL_KEY, categoryKey(food.category_id)}
+        keys.update(areaKey(areaId) for areaId in _restaurantAreaIds(food.restaurant_id))
+    foodLeaderboards.update(foodId, food.rankingScore if food else 0, keys)
+
+
+def _updateRestaurant(restaurantId):
+    restaurant = Restaurant.objects.filter(id=restaurantId).only("id", "rankingScore").first()
+    keys = set()
+    if restaurant is not None:
+        keys = {ALL_KEY}
+        keys.update(areaKey(areaId) for areaId in _restaurantAreaIds(restaurantId))
+    restaurantLeaderboards.update(restaurantId, restaurant.rankingScore if restaurant else 0, keys)
+
+
+@receiver(post_save, sender=Food)
+@receiver(post_delete, sender=Food)
+def updateFoodLeaderboards(sender, instance, raw=False, **kwargs):
+    if raw or not foodLeaderboards.boards:
+        return
+    foodId = instance.id
+    transaction.on_commit(lambda: _updateFood(foodId))
+
+
+@receiver(post_save, sender=Restaurant)
+@receiver(post_delete, sender=Restaurant)
+def updateRestaurantLeaderboards(sender, instance, raw=False, **kwargs):
+    if raw or not restaurantLeaderboards.boards:
+        return
+    restaurantId = instance.id
+    transaction.on_commit(lambda: _updateRestaurant(restaurantId))
+
+
+@receiver(m2m_changed, sender=Restaurant.areas.through)
+def invalidateAreaLeaderboards(sender, instance, action, reverse, pk_set, **kwargs):
+    # تغییر مناطق یک رستوران اعضای جدول‌های آن مناطق را عوض می‌کند؛ آن جدول‌ها دوباره بارگذاری می‌شوند
+    if action in ("post_add", "post_remove"):
+        areaIds = [instance.pk] if reverse else list(pk_set)
+    elif action == "pre_clear":
+        areaIds = [instance.pk] if reverse else list(_restaurantAreaIds(instance.pk))
+    else:
+        return
+    keys = [areaKey(areaId) for areaId in areaIds]
+
+    def invalidate():
+        foodLeaderboards.invalidate(keys)
+        restaurantLeaderboards.invalidate(keys)
+    transaction.on_commit(invalidate)
+
+
+@receiver(versionsBumped)
+def followCatalogVersions(sender, versions, bulk=False, **kwargs):
+    foodLeaderboards.onVersionsBumped(versions, bulk)
+    restaurantLeaderboards.onVersionsBumped(versions, bulk)
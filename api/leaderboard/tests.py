@@ -0,0 +1,98 @@
+import time
+from decimal import Decimal
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from services.ResponseCache import getCatalogCache
+from .boards import ALL_KEY, Leaderboards, TopKBoard, areaKey
+
+
+class TopKBoardTests(SimpleTestCase):
+    def test_orders_by_score_then_id_descending(self):
+        board = TopKBoard(2)
+        board.load([(1, "4.5"), (2, "3.0"), (3, "4.5")], version=1)
+        board.offer(4, Decimal("4.0"))
+        self.assertEqual(board.page(None, 10), ([3, 1, 4, 2], None))
+
+    def test_pages_follow_cursor(self):
+        board = TopKBoard(3)
+        board.load([(itemId, str(itemId)) for itemId in range(5, 0, -1)], version=1)
+        ids, cursor = board.page(None, 2)
+        self.assertEqual(ids, [5, 4])
+        ids, cursor = board.page(cursor, 2)
+        self.assertEqual(ids, [3, 2])
+        self.assertEqual(board.page(cursor, 2), ([1], None))
+
+    def test_evicts_lowest_entry_beyond_capacity(self):
+        board = TopKBoard(1)
+        board.load([(1, "1.0"), (2, "2.0")], version=1)
+        self.assertTrue(board.complete)
+        board.offer(3, Decimal("3.0"))
+        self.assertEqual(board.page(None, 1)[0], [3])
+        self.assertNotIn(1, board.scores)
+        # ردیف ۱ بیرون جدول است؛ صفحه‌ای که به آن برسد از جدول قابل پاسخ نیست
+        self.assertFalse(board.complete)
+        self.assertIsNone(board.page(None, 2))
+
+    def test_ignores_unknown_position_when_incomplete(self):
+        board = TopKBoard(1)
+        board.load([(1, "3.0"), (2, "2.0"), (3, "1.0")], version=1)
+        self.assertFalse(board.complete)
+        board.offer(4, Decimal("0.5"))
+        self.assertNotIn(4, board.scores)
+        self.assertEqual(board.version, 1)
+
+    def test_shortage_forces_reload(self):
+        board = TopKBoard(2)
+        board.load([(1, "3.0"), (2, "2.0"), (3, "1.0"), (4, "0.5"), (5, "0.1")], version=1)
+        board.discard(1)
+        board.discard(2)
+        self.assertEqual(board.version, 1)
+        board.discard(3)
+        self.assertIsNone(board.version)
+
+
+class LeaderboardsTests(SimpleTestCase):
+    def setUp(self):
+        getCatalogCache().clear()
+        self.rows = {
+            ALL_KEY: [(2, "4.0"), (1, "3.0")],
+            areaKey(1): [(1, "3.0")],
+        }
+        self.loads = []
+
+        def loadRows(key, limit):
+            self.loads.append(key)
+            return self.rows[key][:limit]
+
+        self.leaderboards = Leaderboards(loadRows)
+
+    def test_update_moves_item_between_boards(self):
+        self.leaderboards.page(ALL_KEY)
+        self.leaderboards.page(areaKey(1))
+        self.leaderboards.update(2, Decimal("5.0"), [ALL_KEY, areaKey(1)])
+        self.leaderboards.update(1, Decimal("3.5"), [ALL_KEY])
+        self.assertEqual(self.leaderboards.page(ALL_KEY), ([2, 1], None))
+        self.assertEqual(self.leaderboards.page(areaKey(1)), ([2], None))
+        self.assertEqual(self.loads, [ALL_KEY, areaKey(1)])
+        self.assertEqual(self.leaderboards.boards[ALL_KEY].scores, {2: Decimal("5.0"), 1: Decimal("3.5")})
+
+    def test_reloads_only_after_changes_from_another_worker(self):
+        self.leaderboards.page(ALL_KEY)
+        # تغییری که همین worker به جدول داده است: نسخه یک واحد بالا می‌رود
+        self.leaderboards.onVersionsBumped({"all": getCatalogCache().incr("version:all")})
+        self.leaderboards.page(ALL_KEY)
+        self.assertEqual(self.loads, [ALL_KEY])
+
+        self.leaderboards.onVersionsBumped({"all": getCatalogCache().incr("version:all", 5)})
+        self.leaderboards.page(ALL_KEY)
+        self.assertEqual(self.loads, [ALL_KEY, ALL_KEY])
+
+    def test_does_not_reload_without_changes(self):
+        self.leaderboards.page(ALL_KEY)
+        # نسخه scope ها منقضی نمی‌شود؛ بعد از یک ساعت بدون تغییر جدول دوباره از دیتابیس خوانده نمی‌شود
+        later = time.time() + 60 * 60
+        with mock.patch("django.core.cache.backends.locmem.time.time", return_value=later):
+            self.leaderboards.page(ALL_KEY)
+        self.assertEqual(self.loads, [ALL_KEY])
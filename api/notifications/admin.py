@@ -1,3 +1,11 @@
 from django.contrib import admin
+from .models import EmailOutbox
 
-# Register your models here.
+
+@admin.register(EmailOutbox)
+class EmailOutboxAdmin(admin.ModelAdmin):
+    list_display = ("id", "receiver", "subject", "status", "attempts", "nextAttemptAt", "createdAt", "sentAt")
+    list_filter = ("status",)
+    search_fields = ("receiver", "subject")
+    readonly_fields = ("createdAt", "sentAt", "lastError")
+    ordering = ("-createdAt",)
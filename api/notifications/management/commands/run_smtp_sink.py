@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from notifications.smtpSink import SmtpSink
+
+
+class Command(BaseCommand):
+    help = (
+        "اجرای سرور SMTP محلی به جای سرور ایمیل واقعی در توسعه و تست "
+        "(EmailHost=127.0.0.1 EmailPort=<port> EmailStartTls=0)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=1025)
+        parser.add_argument('--dir', default=None, help="پوشه ذخیره پیام‌ها به شکل فایل .eml")
+
+    def handle(self, *args, **options):
+        sink = SmtpSink(options['host'], options['port'], options['dir'])
+        host, port = sink.address
+        self.stdout.write(self.style.SUCCESS(f"SMTP محلی روی {host}:{port} در حال اجراست."))
+        try:
+            sink.serveForever()
+        except KeyboardInterrupt:
+            sink.stop()
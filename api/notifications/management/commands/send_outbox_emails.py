@@ -0,0 +1,55 @@
+import signal
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from notifications.models import EmailOutbox
+from notifications.outbox import OutboxWorkers
+from services.EmailService import emailPool
+
+
+class Command(BaseCommand):
+    help = (
+        "ارسال ایمیل‌های صف خروجی با چند worker (وقتی worker های درون وب‌سرور با EmailOutboxWorkers=0 خاموش‌اند)، "
+        "یا با --once فقط ارسال ایمیل‌های آماده فعلی"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=max(settings.EMAIL_OUTBOX_WORKERS, 1))
+        parser.add_argument('--once', action='store_true', help="ایمیل‌های آماده را بفرست و خارج شو")
+        parser.add_argument('--report-interval', type=float, default=60, help="فاصله گزارش آمار ارسال (ثانیه)")
+
+    def handle(self, *args, **options):
+        workers = OutboxWorkers()
+        if options['once']:
+            claimed = 0
+            while True:
+                count = workers.drainOnce()
+                if not count:
+                    break
+                claimed += count
+            self._report(claimed)
+            return
+
+        stop = threading.Event()
+        signal.signal(signal.SIGTERM, lambda *_: stop.set())
+        workers.start(options['workers'])
+        self.stdout.write(f"{options['workers']} worker صف ایمیل راه افتاد.")
+        try:
+            while not stop.wait(options['report_interval']):
+                self._reportMetrics()
+        except KeyboardInterrupt:
+            pass
+        self._reportMetrics()
+
+    def _report(self, claimed):
+        counts = {status: EmailOutbox.objects.filter(status=status).count() for status, _ in EmailOutbox.STATUS_CHOICES}
+        self.stdout.write(f"claimed={claimed} " + " ".join(f"{status}={count}" for status, count in counts.items()))
+        self._reportMetrics()
+        self.stdout.write(self.style.SUCCESS("ایمیل‌های آماده صف ارسال شد."))
+
+    def _reportMetrics(self):
+        # نرخ ارسال و نرخ خطای استخر اتصال SMTP
+        metrics = emailPool.metrics.snapshot()
+        self.stdout.write("smtp " + " ".join(f"{name}={value}" for name, value in metrics.items()))
@@ -1,3 +1,35 @@
 from django.db import models
 
-# Create your models here.
+
+class EmailOutbox(models.Model):
+    """
+    صف ایمیل‌های خروجی (notifications/outbox.py): ردیف در همان تراکنش تغییر اصلی (مثلا ثبت سفارش) نوشته و
+    ارسال آن بیرون از درخواست توسط worker ها با تلاش مجدد انجام می‌شود
+    """
+    PENDING = 'pending'
+    SENDING = 'sending'
+    SENT = 'sent'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'pending'),
+        (SENDING, 'sending'),
+        (SENT, 'sent'),
+        (FAILED, 'failed'),
+    ]
+
+    receiver = models.EmailField()
+    subject = models.CharField(max_length=255)
+    html = models.TextField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    # زمان تلاش بعدی؛ برای ردیف sending پایان مهلت worker است و بعد از آن ردیف دوباره برداشته می‌شود
+    nextAttemptAt = models.DateTimeField()
+    lastError = models.TextField(blank=True, default='')
+    createdAt = models.DateTimeField(auto_now_add=True)
+    sentAt = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'nextAttemptAt'])]
+
+    def __str__(self):
+        return f"{self.subject} → {self.receiver} ({self.status})"
@@ -0,0 +1,140 @@
+import logging
+import random
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from services.EmailService import deliverEmails
+from .models import EmailOutbox
+
+logger = logging.getLogger(__name__)
+
+
+def enqueueEmail(receiver, subject, html):
+    """
+    ثبت ایمیل در صف خروجی؛ اگر داخل تراکنش صدا زده شود همراه همان تراکنش commit یا rollback می‌شود
+    و worker ها بعد از commit بیدار می‌شوند
+    """
+    email = EmailOutbox.objects.create(
+        receiver=receiver, subject=subject, html=html, nextAttemptAt=timezone.now()
+    )
+    transaction.on_commit(outboxWorkers.wake)
+    return email
+
+
+def retryDelay(attempts):
+    """فاصله تلاش بعدی (ثانیه): نمایی با سقف EMAIL_OUTBOX_RETRY_MAX و کمی jitter تا تلاش‌ها هم‌زمان نشوند"""
+    delay = min(settings.EMAIL_OUTBOX_RETRY_BASE * 2 ** (attempts - 1), settings.EMAIL_OUTBOX_RETRY_MAX)
+    return delay * random.uniform(0.8, 1.2)
+
+
+_claimLock = threading.Lock()
+
+
+def claimEmails(limit):
+    """
+    برداشتن حداکثر limit ایمیل آماده ارسال؛ ردیف‌ها تا پایان مهلت EMAIL_OUTBOX_LEASE در وضعیت sending می‌مانند
+    و اگر worker در این مدت از کار بیفتد دوباره برداشته می‌شوند. skip_locked باعث می‌شود چند worker (یا چند
+    فرایند) ردیف‌های هم را برندارند.
+    """
+    now = timezone.now()
+    # قفل فرایند برای دیتابیس‌هایی مثل sqlite که select_for_update ندارند
+    with _claimLock, transaction.atomic():
+        emails = list(
+            EmailOutbox.objects.select_for_update(skip_locked=True)
+            .filter(status__in=[EmailOutbox.PENDING, EmailOutbox.SENDING], nextAttemptAt__lte=now)
+            .order_by('nextAttemptAt')[:limit]
+        )
+        leaseUntil = now + timedelta(seconds=settings.EMAIL_OUTBOX_LEASE)
+        for email in emails:
+            email.status = EmailOutbox.SENDING
+            email.attempts += 1
+            email.nextAttemptAt = leaseUntil
+        EmailOutbox.objects.bulk_update(emails, ['status', 'attempts', 'nextAttemptAt'])
+    return emails
+
+
+def recordDelivery(email, error):
+    """ثبت نتیجه ارسال یک ایمیل برداشته‌شده؛ در شکست تا EMAIL_OUTBOX_MAX_ATTEMPTS با تاخیر دوباره تلاش می‌شود"""
+    if error is None:
+        EmailOutbox.objects.filter(id=email.id).update(status=EmailOutbox.SENT, sentAt=timezone.now(), lastError='')
+        return True
+
+    message = f"{type(error).__name__}: {error}"
+    if email.attempts >= settings.EMAIL_OUTBOX_MAX_ATTEMPTS:
+        EmailOutbox.objects.filter(id=email.id).update(status=EmailOutbox.FAILED, lastError=message)
+    else:
+        EmailOutbox.objects.filter(id=email.id).update(
+            status=EmailOutbox.PENDING,
+            lastError=message,
+            nextAttemptAt=timezone.now() + timedelta(seconds=retryDelay(email.attempts)),
+        )
+    return False
+
+
+class OutboxWorkers:
+    """
+    مجموعه thread هایی که صف ایمیل را خالی می‌کنند. هر worker دسته‌ای از ایمیل‌های آماده را برمی‌دارد و می‌فرستد؛
+    اگر چیزی آماده نباشد تا ثبت ایمیل جدید یا حداکثر EMAIL_OUTBOX_POLL_INTERVAL ثانیه (برای تلاش‌های مجدد و
+    ایمیل‌های ثبت‌شده در فرایندهای دیگر) منتظر می‌ماند.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.threads = []
+
+    def start(self, count, daemon=True):
+        with self.lock:
+            while len(self.threads) < count:
+                thread = threading.Thread(
+                    target=self._run, name=f"email-outbox-{len(self.threads) + 1}", daemon=daemon
+                )
+                self.threads.append(thread)
+                thread.start()
+
+    def wake(self):
+        if settings.EMAIL_OUTBOX_WORKERS > 0 and not self.threads:
+            self.start(settings.EMAIL_OUTBOX_WORKERS)
+        self.wakeup.set()
+
+    def _run(self):
+        failures = 0
+        while True:
+            self.wakeup.clear()
+            backoff = None
+            try:
+                sent = self.drainOnce()
+                failures = 0
+            except Exception:
+                # خطای دیتابیس یا برنامه (شکست ارسال هر ایمیل را recordDelivery ثبت می‌کند)؛ ایمیل‌های برداشته‌شده
+                # بعد از EMAIL_OUTBOX_LEASE دوباره برداشته می‌شوند و worker با تاخیر نمایی دوباره تلاش می‌کند
+                failures += 1
+                sent = 0
+                backoff = min(
+                    settings.EMAIL_OUTBOX_POLL_INTERVAL * 2 ** (failures - 1), settings.EMAIL_OUTBOX_RETRY_MAX
+                )
+                logger.exception("خطا در ارسال صف ایمیل؛ تلاش دوباره %s ثانیه بعد", backoff)
+            finally:
+                close_old_connections()
+            if backoff is not None:
+                time.sleep(backoff)
+            elif not sent:
+                self.wakeup.wait(settings.EMAIL_OUTBOX_POLL_INTERVAL)
+
+    def drainOnce(self):
+        """یک دسته ایمیل آماده را می‌فرستد و تعداد ایمیل‌های برداشته‌شده را برمی‌گرداند"""
+        emails = claimEmails(settings.EMAIL_OUTBOX_BATCH_SIZE)
+        if emails:
+            # کل دسته روی یک اتصال استخر SMTP (services/EmailService.py) فرستاده می‌شود
+            errors = deliverEmails([(email.receiver, email.subject, email.html) for email in emails])
+            for email, error in zip(emails, errors):
+                recordDelivery(email, error)
+        return len(emails)
+
+
+outboxWorkers = OutboxWorkers()
@@ -0,0 +1,118 @@
+import os
+import socketserver
+import threading
+import time
+
+
+class _SmtpHandler(socketserver.StreamRequestHandler):
+    """زیرمجموعه کوچکی از SMTP که smtplib برای ارسال ساده لازم دارد (بدون STARTTLS و AUTH)"""
+
+    def reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        sink = self.server.sink
+        mailFrom, rcptTo = None, []
+        sink.countSession()
+        self.reply("220 elite-bite smtp sink")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode(errors="replace").strip()
+            verb = command[:4].upper()
+            if verb in ("HELO", "EHLO"):
+                self.reply("250 elite-bite")
+            elif verb == "MAIL":
+                mailFrom, rcptTo = command.split(":", 1)[1].strip().strip("<>"), []
+                self.reply("250 OK")
+            elif verb == "RCPT":
+                rcptTo.append(command.split(":", 1)[1].strip().strip("<>"))
+                self.reply("250 OK")
+            elif verb == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                lines = []
+                while True:
+                    dataLine = self.rfile.readline()
+                    if not dataLine or dataLine in (b".\r\n", b".\n"):
+                        break
+                    lines.append(dataLine[1:] if dataLine.startswith(b"..") else dataLine)
+                if sink.takeFailure():
+                    self.reply("451 Temporary failure")
+                else:
+                    sink.store(mailFrom, rcptTo, b"".join(lines))
+                    self.reply("250 OK")
+            elif verb == "RSET":
+                mailFrom, rcptTo = None, []
+                self.reply("250 OK")
+            elif verb == "NOOP":
+                self.reply("250 OK")
+            elif verb == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+class SmtpSink:
+    """
+    سرور SMTP محلی که به جای سرور ایمیل واقعی در تست و توسعه استفاده می‌شود: پیام‌ها در messages نگه داشته
+    و در صورت دادن directory به شکل فایل .eml نوشته می‌شوند. failNext(n) پیام‌های بعدی را با خطای موقت 451
+    رد می‌کند تا تلاش مجدد صف ایمیل‌ها (notifications/outbox.py) بررسی شود.
+    برای استفاده: EmailHost=127.0.0.1 و EmailPort=<port> و EmailStartTls=0 بدون EmailSenderPassword.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, directory=None):
+        self.server = _Server((host, port), _SmtpHandler)
+        self.server.sink = self
+        self.directory = directory
+        self.messages = []
+        self.failures = 0
+        self.sessions = 0
+        self.lock = threading.Lock()
+        self.thread = None
+
+    @property
+    def address(self):
+        return self.server.server_address
+
+    def failNext(self, count=1):
+        with self.lock:
+            self.failures += count
+
+    def countSession(self):
+        with self.lock:
+            self.sessions += 1
+
+    def takeFailure(self):
+        with self.lock:
+            if self.failures:
+                self.failures -= 1
+                return True
+            return False
+
+    def store(self, mailFrom, rcptTo, data):
+        with self.lock:
+            self.messages.append({"from": mailFrom, "to": rcptTo, "data": data})
+            index = len(self.messages)
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(os.path.join(self.directory, f"{time.time_ns()}-{index}.eml"), "wb") as file:
+                file.write(data)
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, name="smtp-sink", daemon=True)
+        self.thread.start()
+        return self
+
+    def serveForever(self):
+        self.server.serve_forever()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
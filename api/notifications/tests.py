@@ -1,3 +1,85 @@
-from django.test import TestCase
+import os
+import smtplib
+import socket
+from unittest import mock
 
-# Create your tests here.
+from django.test import SimpleTestCase, override_settings
+
+from services.EmailService import SmtpConnectionPool
+from .outbox import OutboxWorkers
+from .smtpSink import SmtpSink
+
+
+class SmtpConnectionPoolTests(SimpleTestCase):
+    def setUp(self):
+        self.sink = SmtpSink().start()
+        self.addCleanup(self.sink.stop)
+        environ = mock.patch.dict(os.environ, {
+            "EmailHost": "127.0.0.1",
+            "EmailPort": str(self.sink.address[1]),
+            "EmailStartTls": "0",
+            "EmailSender": "noreply@x.com",
+            "EmailSenderPassword": "",
+        })
+        environ.start()
+        self.addCleanup(environ.stop)
+        self.pool = SmtpConnectionPool(size=2, maxIdle=60, maxMessages=3)
+        self.addCleanup(self.pool.closeAll)
+
+    def send(self, *receivers):
+        return self.pool.sendMany([(receiver, "subject", "<p>body</p>") for receiver in receivers])
+
+    def test_reuses_connection_between_batches(self):
+        self.assertEqual(self.send("a@x.com", "b@x.com"), [None, None])
+        self.assertEqual(self.send("c@x.com"), [None])
+        self.assertEqual(len(self.sink.messages), 3)
+        self.assertEqual(self.sink.sessions, 1)
+        self.assertEqual(self.pool.metrics.snapshot()["messagesPerConnection"], 3)
+
+    def test_closes_connection_after_max_messages(self):
+        self.send("a@x.com", "b@x.com", "c@x.com")
+        self.assertEqual(self.pool.idle, [])
+        self.send("d@x.com")
+        self.assertEqual(self.sink.sessions, 2)
+
+    def test_reconnects_when_server_dropped_idle_connection(self):
+        self.send("a@x.com")
+        self.pool.idle[0].server.sock.shutdown(socket.SHUT_RDWR)
+        self.assertEqual(self.send("b@x.com"), [None])
+        self.assertEqual(len(self.sink.messages), 2)
+        self.assertEqual(self.sink.sessions, 2)
+        self.assertEqual(self.pool.metrics.snapshot()["reconnects"], 1)
+
+    def test_rejected_message_keeps_connection(self):
+        self.sink.failNext(1)
+        results = self.send("a@x.com", "b@x.com")
+        self.assertIsInstance(results[0], smtplib.SMTPDataError)
+        self.assertIsNone(results[1])
+        self.assertEqual(self.sink.sessions, 1)
+
+    def test_unreachable_server_fails_whole_batch(self):
+        self.sink.stop()
+        results = self.send("a@x.com", "b@x.com")
+        self.assertTrue(all(isinstance(error, OSError) for error in results))
+        self.assertEqual(self.pool.metrics.snapshot()["failed"], 2)
+
+
+class _StopWorker(BaseException):
+    pass
+
+
+class OutboxWorkersTests(SimpleTestCase):
+    @override_settings(EMAIL_OUTBOX_POLL_INTERVAL=5, EMAIL_OUTBOX_RETRY_MAX=60)
+    def test_failed_drain_is_logged_and_backs_off(self):
+        workers = OutboxWorkers()
+        error = RuntimeError("database is down")
+        drains = [error, error, 3, error, _StopWorker()]
+        with mock.patch.object(workers, "drainOnce", side_effect=drains), \
+                mock.patch("notifications.outbox.time.sleep") as sleep, \
+                self.assertLogs("notifications.outbox", "ERROR") as logs:
+            with self.assertRaises(_StopWorker):
+                workers._run()
+        # تاخیر با هر شکست پشت سر هم دو برابر و بعد از یک دسته موفق دوباره از اول شروع می‌شود
+        self.assertEqual([call.args[0] for call in sleep.call_args_list], [5, 10, 5])
+        self.assertEqual(len(logs.records), 3)
+        self.assertIs(logs.records[0].exc_info[1], error)
@@ -0,0 +1,154 @@
+import math
+import threading
+
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Subquery
+
+from services.ResponseCache import DELIVERY_FEES_SCOPE, bumpRestaurantAreas, bumpScopes, followVersion, getVersions
+from .models import Restaurant, RestaurantAreaDeliveryFee
+
+
+def _roundFee(baseFee):
+    return int(round(baseFee))
+
+
+def _roundThreshold(threshold):
+    return None if threshold is None else int(math.ceil(threshold))
+
+
+def _buildQuote(fee, threshold, areaId, subtotal):
+    if fee is not None and threshold is not None and subtotal >= threshold:
+        fee = 0
+    return {
+        "areaId": areaId,
+        "isDeliverable": fee is not None,
+        "deliveryFee": fee,
+        "freeDeliveryThreshold": threshold,
+        "remainingForFreeDelivery": None if threshold is None else max(0, threshold - subtotal),
+    }
+
+
+class DeliveryFees:
+    """
+    ماتریس درون‌فرایندی هزینه ارسال: برای هر رستوران {areaId: هزینه} فقط روی مناطق سرویس‌دهی آن
+    (هزینه اختصاصی منطقه یا در نبود آن deliveryFeeBase) به همراه حد آستانه ارسال رایگان.
+    پیش‌فاکتور نمایشی سبد خرید بدون کوئری از همین ماتریس ساخته می‌شود؛ هزینه‌ای که از سفارش گرفته می‌شود
+    با quoteFromDb خوانده می‌شود تا ماتریس کهنه یک worker روی مبلغ سفارش اثر نگذارد. مثل ایندکس مکانی، بعد از هر تغییر
+    ردیف همان رستوران دوباره خوانده و هماهنگی بین worker ها با نسخه scope «deliveryFees» انجام می‌شود.
+    """
+
+    def __init__(self):
+        self.fees = {}  # restaurantId -> {areaId: هزینه}
+        self.baseFees = {}  # restaurantId -> deliveryFeeBase
+        self.thresholds = {}  # restaurantId -> حد آستانه ارسال رایگان یا None
+        self.version = None
+        self.lock = threading.RLock()
+
+    def _read(self, restaurantIds=None):
+        restaurants = Restaurant.objects.all()
+        areas = Restaurant.areas.through.objects.all()
+        customFees = RestaurantAreaDeliveryFee.objects.all()
+        if restaurantIds is not None:
+            restaurants = restaurants.filter(id__in=restaurantIds)
+            areas = areas.filter(restaurant_id__in=restaurantIds)
+            customFees = customFees.filter(restaurant_id__in=restaurantIds)
+
+        baseFees, thresholds, fees = {}, {}, {}
+        for restaurantId, baseFee, threshold in restaurants.values_list(
+            "id", "deliveryFeeBase", "freeDeliveryThreshold"
+        ).iterator():
+            baseFees[restaurantId] = _roundFee(baseFee)
+            thresholds[restaurantId] = _roundThreshold(threshold)
+            fees[restaurantId] = {}
+        custom = {(restaurantId, areaId): fee for restaurantId, areaId, fee in customFees.values_list(
+            "restaurant_id", "area_id", "fee"
+        ).iterator()}
+        for restaurantId, areaId in areas.values_list("restaurant_id", "area_id").iterator():
+            if restaurantId in fees:
+                fees[restaurantId][areaId] = custom.get((restaurantId, areaId), baseFees[restaurantId])
+        return baseFees, thresholds, fees
+
+    def _load(self, version):
+        self.baseFees, self.thresholds, self.fees = self._read()
+        self.version = version
+
+    def _ensureLoaded(self):
+        version = getVersions([DELIVERY_FEES_SCOPE])[0]
+        with self.lock:
+            if self.version != version:
+                self._load(version)
+
+    def update(self, restaurantId):
+        baseFees, thresholds, fees = self._read([restaurantId])
+        with self.lock:
+            if restaurantId in fees:
+                self.baseFees[restaurantId] = baseFees[restaurantId]
+                self.thresholds[restaurantId] = thresholds[restaurantId]
+                self.fees[restaurantId] = fees[restaurantId]
+            else:
+                self.baseFees.pop(restaurantId, None)
+                self.thresholds.pop(restaurantId, None)
+                self.fees.pop(restaurantId, None)
+
+    def onVersionsBumped(self, versions, bulk=False):
+        version = versions.get(DELIVERY_FEES_SCOPE)
+        if version is None:
+            return
+        with self.lock:
+            self.version = followVersion(self.version, version, bulk)
+
+    def quote(self, restaurantId, areaId, subtotal):
+        """
+        پیش‌فاکتور ارسال سفارش subtotal از رستوران به منطقه؛ بدون منطقه هزینه پایه رستوران حساب می‌شود.
+        isDeliverable=False یعنی رستوران به این منطقه ارسال ندارد (deliveryFee آن None است).
+        """
+        self._ensureLoaded()
+        with self.lock:
+            baseFee = self.baseFees.get(restaurantId)
+            threshold = self.thresholds.get(restaurantId)
+            fee = baseFee if areaId is None else self.fees.get(restaurantId, {}).get(areaId)
+        return _buildQuote(fee, threshold, areaId, subtotal)
+
+
+deliveryFees = DeliveryFees()
+
+
+def quoteFromDb(restaurantId, areaId, subtotal):
+    """
+    همان پیش‌فاکتور DeliveryFees.quote با یک کوئری روی دیتابیس؛ برای مبلغی که از سفارش گرفته می‌شود
+    و باید داخل تراکنش ثبت سفارش صدا زده شود.
+    """
+    restaurants = Restaurant.objects.filter(id=restaurantId)
+    if areaId is not None:
+        restaurants = restaurants.annotate(
+            servesArea=Exists(Restaurant.areas.through.objects.filter(restaurant_id=OuterRef("id"), area_id=areaId)),
+            customFee=Subquery(RestaurantAreaDeliveryFee.objects.filter(
+                restaurant_id=OuterRef("id"), area_id=areaId
+            ).values("fee")[:1]),
+        )
+        row = restaurants.values_list("deliveryFeeBase", "freeDeliveryThreshold", "servesArea", "customFee").first()
+    else:
+        row = restaurants.values_list("deliveryFeeBase", "freeDeliveryThreshold").first()
+    if row is None:
+        return _buildQuote(None, None, areaId, subtotal)
+    fee = _roundFee(row[0])
+    if areaId is not None:
+        fee = (fee if row[3] is None else row[3]) if row[2] else None
+    return _buildQuote(fee, _roundThreshold(row[1]), areaId, subtotal)
+
+
+def refreshDeliveryFees(restaurantId):
+    """بعد از تغییر هزینه‌های ارسال رستوران: ماتریس بعد از commit به‌روز و پاسخ‌های کش‌شده مناطق باطل می‌شوند"""
+    transaction.on_commit(lambda: deliveryFees.update(restaurantId))
+    bumpScopes([DELIVERY_FEES_SCOPE])
+
+
+def setAreaDeliveryFees(restaurant, areaFees):
+    """areaFees: {areaId: هزینه}؛ هزینه‌های قبلی رستوران جایگزین می‌شوند"""
+    with transaction.atomic():
+        RestaurantAreaDeliveryFee.objects.filter(restaurant=restaurant).delete()
+        RestaurantAreaDeliveryFee.objects.bulk_create(
+            [RestaurantAreaDeliveryFee(restaurant=restaurant, area_id=areaId, fee=fee) for areaId, fee in areaFees.items()]
+        )
+        refreshDeliveryFees(restaurant.id)
+        bumpRestaurantAreas(restaurant.id)
@@ -0,0 +1,64 @@
+import threading
+
+from services.GeoIndex import GridIndex
+from services.ResponseCache import RESTAURANT_LOCATIONS_SCOPE, followVersion, getVersions
+from .models import Restaurant
+
+
+class RestaurantLocations:
+    """
+    ایندکس مکانی درون‌فرایندی رستوران‌های دارای مختصات، همراه با بیت‌مپ ساعات کاری آن‌ها برای فیلتر openNow.
+    ایندکس در اولین درخواست ساخته می‌شود و با سیگنال‌های restaurant/signals.py به صورت افزایشی به‌روز می‌ماند.
+    مثل جدول‌های امتیاز، هماهنگی بین worker ها با نسخه scope «restaurantLocations» کش کاتالوگ انجام می‌شود.
+    """
+
+    def __init__(self):
+        self.index = GridIndex()
+        self.masks = {}
+        self.version = None
+        self.lock = threading.RLock()
+
+    def _load(self, version):
+        self.index.clear()
+        self.masks = {}
+        rows = Restaurant.objects.filter(latitude__isnull=False, longitude__isnull=False).values_list(
+            "id", "latitude", "longitude", "openHoursMask"
+        )
+        for restaurantId, latitude, longitude, mask in rows.iterator():
+            self.index.add(restaurantId, float(latitude), float(longitude))
+            self.masks[restaurantId] = mask
+        self.version = version
+
+    def nearest(self, latitude, longitude, k=None, maxDistanceKm=None, openHour=None, after=None):
+        """[(restaurantId, فاصله کیلومتر)] به ترتیب فاصله؛ openHour فقط رستوران‌های باز در آن ساعت را نگه می‌دارد"""
+        version = getVersions([RESTAURANT_LOCATIONS_SCOPE])[0]
+        accept = None
+        if openHour is not None:
+            bit = 1 << openHour
+            accept = lambda restaurantId: self.masks[restaurantId] & bit  # noqa: E731
+        with self.lock:
+            if self.version != version:
+                self._load(version)
+            return self.index.nearest(latitude, longitude, k, maxDistanceKm, accept, after)
+
+    def update(self, restaurantId):
+        restaurant = Restaurant.objects.filter(id=restaurantId).values_list(
+            "latitude", "longitude", "openHoursMask"
+        ).first()
+        with self.lock:
+            if restaurant is None or restaurant[0] is None or restaurant[1] is None:
+                self.index.remove(restaurantId)
+                self.masks.pop(restaurantId, None)
+            else:
+                self.index.add(restaurantId, float(restaurant[0]), float(restaurant[1]))
+                self.masks[restaurantId] = restaurant[2]
+
+    def onVersionsBumped(self, versions, bulk=False):
+        version = versions.get(RESTAURANT_LOCATIONS_SCOPE)
+        if version is None:
+            return
+        with self.lock:
+            self.version = followVersion(self.version, version, bulk)
+
+
+restaurantLocations = RestaurantLocations()
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from restaurant.models import Restaurant
+from services.ResponseCache import CATALOG_SCOPE, RESTAURANT_LOCATIONS_SCOPE, bumpScopes
+from services.WorkingHours import computeOpenHoursMask
+
+
+class Command(BaseCommand):
+    help = (
+        "محاسبه بیت‌مپ ساعات کاری (openHoursMask) رستوران‌هایی که مقدار آن با startWorkHour و endWorkHour "
+        "هماهنگ نیست؛ بعد از هر deploy که ردیف‌های قدیمی بدون این ستون دارد اجرا شود"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true', help="فقط اختلاف‌ها را گزارش کن و چیزی ننویس")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        stale = []
+        for restaurantId, startHour, endHour, mask in Restaurant.objects.values_list(
+            'id', 'startWorkHour', 'endWorkHour', 'openHoursMask'
+        ).iterator():
+            expected = computeOpenHoursMask(startHour, endHour)
+            if mask != expected:
+                stale.append(Restaurant(id=restaurantId, openHoursMask=expected))
+
+        if options['check']:
+            self.stdout.write(f"stale={len(stale)}")
+            if stale:
+                self.stderr.write(self.style.ERROR("ساعات کاری بعضی رستوران‌ها با openHoursMask هماهنگ نیست."))
+                raise SystemExit(1)
+            self.stdout.write(self.style.SUCCESS("openHoursMask همه رستوران‌ها هماهنگ است."))
+            return
+
+        if stale:
+            with transaction.atomic():
+                Restaurant.objects.bulk_update(stale, ['openHoursMask'], batch_size=options['batch_size'])
+                # بدون سیگنال مدل نوشته شده است؛ ایندکس مکانی و پاسخ‌های کش‌شده فیلتر openNow دوباره ساخته می‌شوند
+                bumpScopes([CATALOG_SCOPE, RESTAURANT_LOCATIONS_SCOPE], bulk=True)
+        self.stdout.write(self.style.SUCCESS(f"openHoursMask {len(stale)} رستوران به‌روز شد."))
@@ -3,6 +3,7 @@ from django.db import models
 from Area.models import Area
 from City.models import City
 from restaurantManager.models import RestaurantManager
+from services.WorkingHours import computeOpenHoursMask
 
 class Restaurant(models.Model):
     owner = models.OneToOneField(RestaurantManager, on_delete=models.CASCADE, related_name="restaurant")
@@ -16,10 +17,15 @@ class Restaurant(models.Model):
     address = models.TextField()
     city = models.ForeignKey(City, on_delete=models.CASCADE)
     areas = models.ManyToManyField(Area)
+    # مختصات جغرافیایی برای جستجوی نزدیک‌ترین رستوران‌ها (restaurant/locations.py)
+    latitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
+    longitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
     phoneNumber = models.CharField(max_length=20)
     contactEmail = models.EmailField(blank=True, null=True)
     startWorkHour = models.IntegerField(default=0, blank=True, null=True)
     endWorkHour = models.IntegerField(default=0, blank=True, null=True)
+    # بیت‌مپ ۲۴ بیتی ساعات کاری (بیت h یعنی باز در ساعت h)؛ در save از startWorkHour و endWorkHour ساخته می‌شود
+    openHoursMask = models.PositiveIntegerField(default=0)
     # تنظیمات ارسال
     deliveryFeeBase = models.DecimalField(max_digits=7, decimal_places=2, default=0.0)
     freeDeliveryThreshold = models.DecimalField(max_digits=8, decimal_places=2, null=True, blank=True)
@@ -29,7 +35,32 @@ class Restaurant(models.Model):
     # امتیازدهی
     ratingAvg = models.DecimalField(max_digits=3, decimal_places=2, default=0.0)
     ratingCount = models.PositiveIntegerField(default=0)
+    ratingSum = models.PositiveIntegerField(default=0)
+    # میانگین بیزی امتیاز با prior سراسری (review.RatingPrior)
+    rankingScore = models.DecimalField(max_digits=6, decimal_places=4, default=0.0, db_index=True)
     # تایید و امنیت
     isVerified = models.BooleanField(default=False)
+    updatedAt = models.DateTimeField(auto_now=True)
+
+    def save(self, *args, **kwargs):
+        self.openHoursMask = computeOpenHoursMask(self.startWorkHour, self.endWorkHour)
+        updateFields = kwargs.get("update_fields")
+        if updateFields is not None and {"startWorkHour", "endWorkHour"} & set(updateFields):
+            kwargs["update_fields"] = {*updateFields, "openHoursMask"}
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return self.name
+
+
+class RestaurantAreaDeliveryFee(models.Model):
+    """هزینه ارسال رستوران به هر منطقه سرویس‌دهی (areasPrices[]؛ در نبود ردیف، deliveryFeeBase رستوران)"""
+    restaurant = models.ForeignKey(Restaurant, on_delete=models.CASCADE, related_name="areaDeliveryFees")
+    area = models.ForeignKey(Area, on_delete=models.CASCADE, related_name="restaurantDeliveryFees")
+    fee = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ("restaurant", "area")
+
+    def __str__(self):
+        return f"{self.restaurant_id} -> {self.area_id}: {self.fee}"
@@ -1,6 +1,77 @@
+from django.db.models import Count, Max, Prefetch
+
+from Area.models import Area
 from restaurant.models import Restaurant
 
+# ستون‌هایی از خود رستوران که در کارت رستوران نمایش داده می‌شوند
+RESTAURANT_CARD_FIELDS = (
+    "id", "name", "image", "description", "isActive", "startWorkHour", "endWorkHour",
+    "ratingAvg", "ratingCount", "rankingScore", "deliveryFeeBase", "city__id", "city__name",
+)
+
 
 def getRestaurantByRestaurantManagerId(restaurantManagerId):
     restaurant = Restaurant.objects.filter(owner=restaurantManagerId)
-    return restaurant
\ No newline at end of file
+    return restaurant
+
+
+def getRestaurantCardQuerySet(restaurants=None):
+    """
+    کوئری کارت رستوران: شهر در همان کوئری join می‌شود و مناطق همه رستوران‌های صفحه با یک کوئری prefetch می‌شوند؛
+    بنابراین هزینه هر صفحه دو کوئری است و به تعداد رستوران‌ها بستگی ندارد.
+    """
+    if restaurants is None:
+        restaurants = Restaurant.objects.all()
+    return restaurants.select_related("city").only(*RESTAURANT_CARD_FIELDS).prefetch_related(
+        Prefetch("areas", queryset=Area.objects.only("id", "name"))
+    )
+
+
+def serializeRestaurantCard(restaurant, **extra):
+    return {
+        "id": restaurant.id,
+        "name": restaurant.name,
+        "image": restaurant.image,
+        "description": restaurant.description,
+        "isActive": restaurant.isActive,
+        "startWorkHour": restaurant.startWorkHour,
+        "endWorkHour": restaurant.endWorkHour,
+        "ratingAvg": restaurant.ratingAvg,
+        "ratingCount": restaurant.ratingCount,
+        "rankingScore": float(restaurant.rankingScore),
+        "cityName": restaurant.city.name,
+        "cityId": restaurant.city.id,
+        "areas": [{"id": area.id, "name": area.name} for area in restaurant.areas.all()],
+        "deliveryFeeBase": restaurant.deliveryFeeBase,
+        **extra,
+    }
+
+
+def getRestaurantCards(restaurants):
+    """restaurants می‌تواند کوئری getRestaurantCardQuerySet یا لیست ردیف‌های آن (مثلاً یک صفحه) باشد"""
+    return [serializeRestaurantCard(restaurant) for restaurant in restaurants]
+
+
+def getRestaurantCardsByIds(restaurantIds):
+    """کارت رستوران‌ها به همان ترتیب آیدی‌های داده‌شده"""
+    restaurants = getRestaurantCardQuerySet().in_bulk(restaurantIds)
+    return [serializeRestaurantCard(restaurants[i]) for i in restaurantIds if i in restaurants]
+
+
+def getRestaurantDetailsStamp(restaurantId):
+    """مهر نسخه جزئیات رستوران، منو، شهر، مناطق و دسته‌بندی غذاها؛ اگر رستوران وجود نداشته باشد None"""
+    try:
+        restaurantId = int(restaurantId)
+    except (TypeError, ValueError):
+        return None
+    stamp = Restaurant.objects.filter(id=restaurantId).aggregate(
+        updatedAt=Max("updatedAt"),
+        foodCount=Count("food", distinct=True),
+        foodsUpdatedAt=Max("food__updatedAt"),
+        cityUpdatedAt=Max("city__updatedAt"),
+        areasUpdatedAt=Max("areas__updatedAt"),
+        categoriesUpdatedAt=Max("food__category__updatedAt"),
+    )
+    if stamp["updatedAt"] is None:
+        return None
+    return list(stamp.values())
@@ -0,0 +1,100 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from services.ResponseCache import (
+    DELIVERY_FEES_SCOPE,
+    RESTAURANT_LOCATIONS_SCOPE,
+    bumpAreas,
+    bumpRestaurantAreas,
+    bumpScopes,
+    versionsBumped,
+)
+from .delivery import deliveryFees, refreshDeliveryFees
+from .locations import restaurantLocations
+from .models import Restaurant
+
+LOCATION_FIELDS = {"latitude", "longitude", "openHoursMask"}
+DELIVERY_FIELDS = {"deliveryFeeBase", "freeDeliveryThreshold"}
+RATING_FIELDS = {"ratingSum", "ratingCount", "ratingAvg", "rankingScore", "updatedAt"}
+
+
+# قبل از باطل‌سازی پاسخ‌ها تعریف شده تا ایندکس مکانی قبل از افزایش نسخه کش کاتالوگ به‌روز شود
+@receiver(post_save, sender=Restaurant)
+@receiver(post_delete, sender=Restaurant)
+def updateRestaurantLocations(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields is not None and not LOCATION_FIELDS & set(update_fields)):
+        return
+    restaurantId = instance.id
+    transaction.on_commit(lambda: restaurantLocations.update(restaurantId))
+    bumpScopes([RESTAURANT_LOCATIONS_SCOPE])
+
+
+@receiver(versionsBumped)
+def followLocationVersions(sender, versions, bulk=False, **kwargs):
+    restaurantLocations.onVersionsBumped(versions, bulk)
+
+
+@receiver(post_save, sender=Restaurant)
+@receiver(post_delete, sender=Restaurant)
+def updateDeliveryFees(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields is not None and not DELIVERY_FIELDS & set(update_fields)):
+        return
+    refreshDeliveryFees(instance.id)
+
+
+@receiver(m2m_changed, sender=Restaurant.areas.through)
+def updateAreaDeliveryFees(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if not reverse:
+        refreshDeliveryFees(instance.pk)
+    elif pk_set:
+        for restaurantId in pk_set:
+            refreshDeliveryFees(restaurantId)
+    else:
+        # پاک کردن رستوران‌های یک منطقه؛ رستوران‌های تغییرکرده مشخص نیستند و ماتریس در همه worker ها بازسازی می‌شود
+        bumpScopes([DELIVERY_FEES_SCOPE], bulk=True)
+
+
+@receiver(versionsBumped)
+def followDeliveryFeeVersions(sender, versions, bulk=False, **kwargs):
+    deliveryFees.onVersionsBumped(versions, bulk)
+
+
+@receiver(post_save, sender=Restaurant)
+def invalidateRestaurantResponses(sender, instance, raw=False, update_fields=None, **kwargs):
+    # ثبت رأی (review/services.py) فقط ستون‌های امتیاز را می‌نویسد و پاسخ‌ها را سیگنال FoodReview باطل می‌کند
+    if raw or (update_fields is not None and set(update_fields) <= RATING_FIELDS):
+        return
+    bumpRestaurantAreas(instance.pk)
+
+
+@receiver(pre_delete, sender=Restaurant)
+def invalidateDeletedRestaurantResponses(sender, instance, **kwargs):
+    # مناطق رستوران باید قبل از حذف ردیف‌های جدول واسط خوانده شوند
+    bumpRestaurantAreas(instance.pk)
+
+
+@receiver(m2m_changed, sender=Restaurant.areas.through)
+def invalidateRestaurantAreasResponses(sender, instance, action, reverse, pk_set, **kwargs):
+    if action in ("post_add", "post_remove"):
+        bumpAreas([instance.pk] if reverse else pk_set)
+    elif action == "pre_clear":
+        if reverse:
+            bumpAreas([instance.pk])
+        else:
+            bumpRestaurantAreas(instance.pk)
+
+
+@receiver(m2m_changed, sender=Restaurant.areas.through)
+def touchRestaurantOnAreasChange(sender, instance, action, reverse, pk_set, **kwargs):
+    # تغییر مناطق در updatedAt رستوران ثبت می‌شود تا ETag جزئیات رستوران عوض شود
+    if action in ("post_add", "post_remove"):
+        restaurants = Restaurant.objects.filter(id__in=pk_set) if reverse else Restaurant.objects.filter(id=instance.pk)
+    elif action == "pre_clear":
+        restaurants = Restaurant.objects.filter(areas=instance) if reverse else Restaurant.objects.filter(id=instance.pk)
+    else:
+        return
+    restaurants.update(updatedAt=timezone.now())
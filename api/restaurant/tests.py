@@ -0,0 +1,479 @@
+import random
+import time
+from io import StringIO
+from unittest import mock
+
+from django.apps import apps
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from Area.models import Area
+from City.models import City
+from food.models import Food, RestaurantPriceSummary
+from food.signals import backfillPriceSummaries
+from FoodCategory.models import FoodCategory
+from restaurantManager.models import RestaurantManager
+from services.GeoIndex import GridIndex, haversineKm
+from services.ResponseCache import (
+    ALL_AREAS_SCOPE,
+    CATALOG_SCOPE,
+    DELIVERY_FEES_SCOPE,
+    RESTAURANT_LOCATIONS_SCOPE,
+    areaScope,
+    bumpScopes,
+    getCatalogCache,
+    getVersions,
+)
+from services.WorkingHours import computeOpenHoursMask
+from .delivery import DeliveryFees, quoteFromDb, setAreaDeliveryFees
+from .locations import RestaurantLocations
+from .models import Restaurant, RestaurantAreaDeliveryFee
+
+
+class BackfillOpenHoursMaskTests(TestCase):
+    def test_backfills_rows_saved_before_the_mask_existed(self):
+        city = City.objects.create(name="Tehran")
+        manager = RestaurantManager.objects.create(email="m@x.com", firstName="a", lastName="b", isVerified=True)
+        restaurant = Restaurant.objects.create(
+            owner=manager, name="rest", address="addr addr addr", city=city, phoneNumber="09120000000",
+            startWorkHour=8, endWorkHour=22, isVerified=True
+        )
+        # ردیف قدیمی: ستون با مقدار پیش‌فرض اضافه شده است
+        Restaurant.objects.filter(id=restaurant.id).update(openHoursMask=0)
+
+        with self.assertRaises(SystemExit):
+            call_command("backfill_open_hours_mask", "--check", stdout=StringIO(), stderr=StringIO())
+        call_command("backfill_open_hours_mask", stdout=StringIO())
+
+        restaurant.refresh_from_db()
+        self.assertEqual(restaurant.openHoursMask, computeOpenHoursMask(8, 22))
+        call_command("backfill_open_hours_mask", "--check", stdout=StringIO())
+
+
+class RestaurantListQueryCountTests(TestCase):
+    """تعداد کوئری‌های فهرست‌های کارت رستوران به تعداد ردیف‌های صفحه بستگی ندارد"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.city = City.objects.create(name="Tehran")
+        self.area = Area.objects.create(name="A1", city=self.city)
+        self.category = FoodCategory.objects.create(name="c")
+        self.restaurantCount = 0
+        self.addRestaurants(1)
+
+    def addRestaurants(self, count):
+        for _ in range(count):
+            self.restaurantCount += 1
+            manager = RestaurantManager.objects.create(
+                email=f"m{self.restaurantCount}@x.com", firstName="a", lastName="b", isVerified=True
+            )
+            restaurant = Restaurant.objects.create(
+                owner=manager, name=f"rest{self.restaurantCount}", address="addr addr addr", city=self.city,
+                phoneNumber="09120000000", startWorkHour=8, endWorkHour=22, isVerified=True,
+                latitude=35.7 + self.restaurantCount / 1000, longitude=51.4
+            )
+            restaurant.areas.add(self.area)
+            Food.objects.create(
+                name="food", price=1000 + self.restaurantCount, category=self.category, isAvailable=True,
+                restaurant=restaurant
+            )
+
+    def post(self, url, data, rows):
+        # نسخه‌های کش کاتالوگ در TestCase بعد از commit بالا نمی‌روند؛ هر درخواست از کش خالی شروع می‌شود
+        getCatalogCache().clear()
+        response = self.client.post(url, data, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["data"]), rows)
+
+    def test_query_count_does_not_depend_on_row_count(self):
+        requests = (
+            ("/api/restaurant/nearest", {}),
+            ("/api/restaurant/nearest", {"areaId": self.area.id, "openAt": 12}),
+            ("/api/restaurant/nearest", {"latitude": 35.7, "longitude": 51.4}),
+            ("/api/restaurant/filter/rating", {}),
+            ("/api/restaurant/filter/rating", {"areaId": self.area.id, "openAt": 12}),
+            ("/api/restaurant/filter/price", {}),
+            ("/api/restaurant/filter/price", {"areaId": self.area.id, "sortBy": "deliveredPrice"}),
+            ("/api/restaurant/filter/foodCategory", {"foodCategoryId": self.category.id}),
+        )
+        counts = []
+        for url, data in requests:
+            with CaptureQueriesContext(connection) as context:
+                self.post(url, data, 1)
+            counts.append(len(context))
+
+        self.addRestaurants(20)
+        for (url, data), count in zip(requests, counts):
+            with self.subTest(url=url, data=data), self.assertNumQueries(count):
+                self.post(url, data, 21)
+
+
+class RestaurantListLatencyTests(TestCase):
+    """
+    بنچمارک زمان پاسخ فهرست‌های کارت رستوران با ۱۰ و ۱۰۰۰ رستوران: هر صفحه با تعداد ثابت کوئری و صفحه‌بندی
+    keyset ساخته می‌شود، پس زمان یک صفحه هم‌اندازه تقریبا به تعداد کل رستوران‌ها بستگی ندارد.
+    """
+
+    SIZES = (10, 1000)
+    PAGE_SIZE = 10
+    RUNS = 5
+
+    def setUp(self):
+        self.client = APIClient()
+        self.city = City.objects.create(name="Tehran")
+        self.area = Area.objects.create(name="A1", city=self.city)
+        self.category = FoodCategory.objects.create(name="c")
+        self.restaurantCount = 0
+
+    def addRestaurants(self, count):
+        numbers = range(self.restaurantCount + 1, self.restaurantCount + count + 1)
+        self.restaurantCount += count
+        managers = RestaurantManager.objects.bulk_create(
+            RestaurantManager(email=f"m{number}@x.com", firstName="a", lastName="b", isVerified=True)
+            for number in numbers
+        )
+        restaurants = Restaurant.objects.bulk_create(
+            Restaurant(
+                owner=manager, name=f"rest{number}", address="addr addr addr", city=self.city,
+                phoneNumber="09120000000", startWorkHour=8, endWorkHour=22,
+                openHoursMask=computeOpenHoursMask(8, 22), isVerified=True,
+                latitude=35.7 + number / 10000, longitude=51.4, rankingScore=number % 500 / 100
+            )
+            for number, manager in zip(numbers, managers)
+        )
+        Restaurant.areas.through.objects.bulk_create(
+            Restaurant.areas.through(restaurant=restaurant, area=self.area) for restaurant in restaurants
+        )
+        Food.objects.bulk_create(
+            Food(name="food", price=1000 + number, category=self.category, isAvailable=True, restaurant=restaurant)
+            for number, restaurant in zip(numbers, restaurants)
+        )
+        # بدون سیگنال مدل نوشته شده است؛ خلاصه قیمت‌ها و ساختارهای درون حافظه دوباره ساخته می‌شوند
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command("rebuild_restaurant_price_summary", stdout=StringIO())
+            bumpScopes(
+                [ALL_AREAS_SCOPE, areaScope(self.area.id), RESTAURANT_LOCATIONS_SCOPE, DELIVERY_FEES_SCOPE], bulk=True
+            )
+
+    def post(self, url, data):
+        # فقط پاسخ‌های کش‌شده باطل می‌شوند (ساختاری در حافظه از scope کاتالوگ پیروی نمی‌کند)
+        with self.captureOnCommitCallbacks(execute=True):
+            bumpScopes([CATALOG_SCOPE])
+        started = time.perf_counter()
+        response = self.client.post(url, {**data, "limit": self.PAGE_SIZE}, format="json")
+        elapsed = time.perf_counter() - started
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["data"]), self.PAGE_SIZE)
+        return elapsed
+
+    def measure(self, url, data):
+        # درخواست اول ایندکس‌های درون حافظه را می‌سازد و در زمان‌گیری حساب نمی‌شود
+        self.post(url, data)
+        return min(self.post(url, data) for _ in range(self.RUNS))
+
+    def test_latency_stays_flat_from_10_to_1000_restaurants(self):
+        requests = (
+            ("/api/restaurant/nearest", {"areaId": self.area.id}),
+            ("/api/restaurant/nearest", {"latitude": 35.7, "longitude": 51.4}),
+            ("/api/restaurant/filter/rating", {"areaId": self.area.id}),
+            ("/api/restaurant/filter/price", {"areaId": self.area.id}),
+            ("/api/restaurant/filter/price", {"areaId": self.area.id, "sortBy": "deliveredPrice"}),
+            ("/api/restaurant/filter/foodCategory", {"foodCategoryId": self.category.id}),
+        )
+        timings = {}
+        for size in self.SIZES:
+            self.addRestaurants(size - self.restaurantCount)
+            timings[size] = [self.measure(url, data) for url, data in requests]
+
+        small, large = timings[self.SIZES[0]], timings[self.SIZES[-1]]
+        for (url, data), smallTime, largeTime in zip(requests, small, large):
+            with self.subTest(url=url, data=data, ms=(round(smallTime * 1000, 2), round(largeTime * 1000, 2))):
+                # سقف شل برای نویز زمان‌گیری؛ خواندن یا مرتب‌سازی همه رستوران‌ها برای هر صفحه با صد برابر شدن تعداد دیده می‌شود
+                self.assertLess(largeTime, smallTime * 3 + 0.01)
+
+
+class RestaurantDetailsETagTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.city = City.objects.create(name="Tehran")
+        manager = RestaurantManager.objects.create(email="m@x.com", firstName="a", lastName="b", isVerified=True)
+        self.restaurant = Restaurant.objects.create(
+            owner=manager, name="rest", address="addr addr addr", city=self.city, phoneNumber="09120000000",
+            startWorkHour=8, endWorkHour=22, isVerified=True
+        )
+        self.category = FoodCategory.objects.create(name="c")
+        Food.objects.create(name="food", price=1000, category=self.category, restaurant=self.restaurant)
+
+    def post(self, etag=None):
+        headers = {"If-None-Match": etag} if etag else {}
+        return self.client.post(
+            "/api/restaurant/details", {"restaurantId": self.restaurant.id}, format="json", headers=headers
+        )
+
+    def test_unchanged_restaurant_returns_304(self):
+        etag = self.post()["ETag"]
+        response = self.post(etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+
+    def test_etag_does_not_depend_on_catalog_cache(self):
+        etag = self.post()["ETag"]
+        # worker دیگر یا کلید نسخه حذف‌شده: ETag فقط از داده‌ها ساخته می‌شود
+        getCatalogCache().clear()
+        self.assertEqual(self.post(etag).status_code, 304)
+        self.assertEqual(self.post()["ETag"], etag)
+
+    def test_related_row_change_changes_etag(self):
+        etag = self.post()["ETag"]
+        for row in (self.category, self.city):
+            with self.subTest(model=type(row).__name__):
+                row.name += "2"
+                row.save()
+                response = self.post(etag)
+                self.assertEqual(response.status_code, 200)
+                self.assertNotEqual(response["ETag"], etag)
+                etag = response["ETag"]
+
+
+class RestaurantsByPriceTests(TestCase):
+    def setUp(self):
+        getCatalogCache().clear()
+        self.client = APIClient()
+        self.city = City.objects.create(name="Tehran")
+        self.category = FoodCategory.objects.create(name="c")
+        # بازه کل منو: اولی ارزان‌تر است، ولی داخل بازه ۲۰۰۰ تا ۶۰۰۰ دومی ارزان‌تر است
+        self.first = self.createRestaurant(1, [1000, 5000])
+        self.second = self.createRestaurant(2, [3000, 9000])
+
+    def createRestaurant(self, number, prices):
+        manager = RestaurantManager.objects.create(
+            email=f"m{number}@x.com", firstName="a", lastName="b", isVerified=True
+        )
+        restaurant = Restaurant.objects.create(
+            owner=manager, name=f"rest{number}", address="addr addr addr", city=self.city,
+            phoneNumber="09120000000", startWorkHour=8, endWorkHour=22, isVerified=True
+        )
+        for price in prices:
+            Food.objects.create(
+                name="food", price=price, category=self.category, isAvailable=True, restaurant=restaurant
+            )
+        return restaurant
+
+    def post(self, **data):
+        response = self.client.post("/api/restaurant/filter/price", data, format="json")
+        self.assertEqual(response.status_code, 200)
+        return [(row["id"], row["minFoodPrice"]) for row in response.data["data"]]
+
+    def test_range_sorts_by_price_inside_range(self):
+        self.assertEqual(self.post(), [(self.first.id, 1000), (self.second.id, 3000)])
+        self.assertEqual(
+            self.post(minPrice=2000, maxPrice=6000), [(self.second.id, 3000), (self.first.id, 5000)]
+        )
+        self.assertEqual(
+            self.post(minPrice=2000, maxPrice=6000, priceOrder="desc"), [(self.first.id, 5000), (self.second.id, 3000)]
+        )
+        self.assertEqual(self.post(minPrice=6000), [(self.second.id, 9000)])
+
+    def test_missing_summaries_are_backfilled_after_migrate(self):
+        RestaurantPriceSummary.objects.filter(restaurant=self.second).delete()
+        self.assertEqual(self.post(), [(self.first.id, 1000)])
+
+        backfillPriceSummaries(sender=None, app_config=apps.get_app_config("food"))
+        getCatalogCache().clear()
+        self.assertEqual(self.post(), [(self.first.id, 1000), (self.second.id, 3000)])
+
+
+class DeliveryFeesTests(TestCase):
+    """پیش‌فاکتور ماتریس درون حافظه (سبد) و quoteFromDb (ثبت سفارش) برای هر حالت یکسان است"""
+
+    def setUp(self):
+        getCatalogCache().clear()
+        self.client = APIClient()
+        self.city = City.objects.create(name="Tehran")
+        self.customArea = Area.objects.create(name="A1", city=self.city)
+        self.baseArea = Area.objects.create(name="A2", city=self.city)
+        self.unservedArea = Area.objects.create(name="A3", city=self.city)
+        self.category = FoodCategory.objects.create(name="c")
+        self.restaurant = self.createRestaurant(1, 500, 10000, 1000, {self.customArea.id: 200})
+        self.restaurant.areas.add(self.baseArea)
+
+    def createRestaurant(self, number, baseFee, threshold, price, areaFees):
+        manager = RestaurantManager.objects.create(
+            email=f"m{number}@x.com", firstName="a", lastName="b", isVerified=True
+        )
+        restaurant = Restaurant.objects.create(
+            owner=manager, name=f"rest{number}", address="addr addr addr", city=self.city,
+            phoneNumber="09120000000", startWorkHour=8, endWorkHour=22, isVerified=True,
+            deliveryFeeBase=baseFee, freeDeliveryThreshold=threshold
+        )
+        restaurant.areas.add(*areaFees)
+        with self.captureOnCommitCallbacks(execute=True):
+            setAreaDeliveryFees(restaurant, {areaId: fee for areaId, fee in areaFees.items() if fee is not None})
+        Food.objects.create(name="food", price=price, category=self.category, isAvailable=True, restaurant=restaurant)
+        return restaurant
+
+    def quotes(self, areaId, subtotal):
+        return [
+            ("matrix", DeliveryFees().quote(self.restaurant.id, areaId, subtotal)),
+            ("db", quoteFromDb(self.restaurant.id, areaId, subtotal)),
+        ]
+
+    def test_area_fee_overrides_base_fee(self):
+        for areaId, fee in ((self.customArea.id, 200), (self.baseArea.id, 500), (None, 500)):
+            for source, quote in self.quotes(areaId, 1000):
+                with self.subTest(source=source, areaId=areaId):
+                    self.assertTrue(quote["isDeliverable"])
+                    self.assertEqual(quote["deliveryFee"], fee)
+                    self.assertEqual(quote["remainingForFreeDelivery"], 9000)
+
+    def test_free_delivery_threshold(self):
+        for subtotal, fee, remaining in ((9999, 200, 1), (10000, 0, 0), (15000, 0, 0)):
+            for source, quote in self.quotes(self.customArea.id, subtotal):
+                with self.subTest(source=source, subtotal=subtotal):
+                    self.assertEqual(quote["deliveryFee"], fee)
+                    self.assertEqual(quote["freeDeliveryThreshold"], 10000)
+                    self.assertEqual(quote["remainingForFreeDelivery"], remaining)
+
+    def test_unserved_area_is_not_deliverable(self):
+        for source, quote in self.quotes(self.unservedArea.id, 20000):
+            with self.subTest(source=source):
+                self.assertFalse(quote["isDeliverable"])
+                self.assertIsNone(quote["deliveryFee"])
+
+    def test_db_quote_reads_fees_the_matrix_has_not_seen(self):
+        fees = DeliveryFees()
+        fees.quote(self.restaurant.id, self.customArea.id, 1000)
+        # تغییر بدون سیگنال (یا قبل از رسیدن نسخه جدید به این worker)
+        RestaurantAreaDeliveryFee.objects.filter(restaurant=self.restaurant).update(fee=300)
+        self.assertEqual(fees.quote(self.restaurant.id, self.customArea.id, 1000)["deliveryFee"], 200)
+        self.assertEqual(quoteFromDb(self.restaurant.id, self.customArea.id, 1000)["deliveryFee"], 300)
+
+    def test_sorts_by_delivered_price(self):
+        # اولی: 1000 + 200؛ دومی ارزان‌تر است ولی با هزینه ارسال 900 گران‌تر می‌شود؛ سومی به حد ارسال رایگان رسیده است
+        second = self.createRestaurant(2, 900, None, 800, {self.customArea.id: None})
+        third = self.createRestaurant(3, 900, 1500, 1500, {self.customArea.id: None})
+        response = self.client.post(
+            "/api/restaurant/filter/price", {"areaId": self.customArea.id, "sortBy": "deliveredPrice"}, format="json"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(row["id"], row["minFoodPrice"], row["deliveryFee"], row["deliveredPrice"]) for row in response.data["data"]],
+            [(self.restaurant.id, 1000, 200, 1200), (third.id, 1500, 0, 1500), (second.id, 800, 900, 1700)]
+        )
+
+    def test_delivered_price_requires_area(self):
+        response = self.client.post("/api/restaurant/filter/price", {"sortBy": "deliveredPrice"}, format="json")
+        self.assertEqual(response.status_code, 400)
+
+
+class GridIndexTests(SimpleTestCase):
+    def setUp(self):
+        generator = random.Random(7)
+        self.index = GridIndex()
+        self.points = {}
+        for itemId in range(1, 301):
+            # بیشتر نقاط نزدیک هم و چند نقطه پراکنده دور از بقیه
+            spread = 0.1 if itemId % 10 else 3
+            self.points[itemId] = (35.7 + generator.uniform(-spread, spread), 51.4 + generator.uniform(-spread, spread))
+            self.index.add(itemId, *self.points[itemId])
+
+    def bruteForce(self, latitude, longitude, k=None, maxDistanceKm=None):
+        rows = sorted(
+            (round(haversineKm(latitude, longitude, *point), 3), itemId) for itemId, point in self.points.items()
+        )
+        if maxDistanceKm is not None:
+            rows = [row for row in rows if row[0] <= maxDistanceKm]
+        return [(itemId, distance) for distance, itemId in rows[:k]]
+
+    def test_orders_by_distance(self):
+        for latitude, longitude in ((35.7, 51.4), (35.75, 51.33), (38.0, 54.0), (10.0, 10.0)):
+            with self.subTest(point=(latitude, longitude)):
+                self.assertEqual(self.index.nearest(latitude, longitude, k=15), self.bruteForce(latitude, longitude, 15))
+                self.assertEqual(
+                    self.index.nearest(latitude, longitude, maxDistanceKm=5),
+                    self.bruteForce(latitude, longitude, maxDistanceKm=5)
+                )
+
+    def test_pages_continue_after_last_result(self):
+        page = self.index.nearest(35.7, 51.4, k=10)
+        itemId, distance = page[-1]
+        page += self.index.nearest(35.7, 51.4, k=10, after=(distance, itemId))
+        self.assertEqual(page, self.bruteForce(35.7, 51.4, 20))
+
+    def test_moved_and_removed_points(self):
+        self.points[5] = (35.7, 51.4)
+        self.index.add(5, 35.7, 51.4)
+        self.index.remove(6)
+        del self.points[6]
+        self.assertEqual(self.index.nearest(35.7, 51.4, k=10)[0], (5, 0.0))
+        self.assertEqual(self.index.nearest(35.7, 51.4, k=10), self.bruteForce(35.7, 51.4, 10))
+        self.assertEqual(len(self.index), 299)
+
+
+class RestaurantLocationsTests(TestCase):
+    def setUp(self):
+        getCatalogCache().clear()
+        city = City.objects.create(name="Tehran")
+        self.restaurants = []
+        for number, (latitude, longitude) in enumerate(((35.70, 51.40), (35.71, 51.40), (35.80, 51.40))):
+            manager = RestaurantManager.objects.create(
+                email=f"m{number}@x.com", firstName="a", lastName="b", isVerified=True
+            )
+            self.restaurants.append(Restaurant.objects.create(
+                owner=manager, name=f"rest{number}", address="addr addr addr", city=city,
+                phoneNumber="09120000000", startWorkHour=8, endWorkHour=22, isVerified=True,
+                latitude=latitude, longitude=longitude
+            ))
+        self.locations = RestaurantLocations()
+        self.locations.nearest(35.69, 51.4, k=10)
+        # مثل نمونه سراسری ایندکس، تغییر نسخه‌ها و ذخیره رستوران‌ها را دنبال می‌کند
+        patcher = mock.patch("restaurant.signals.restaurantLocations", self.locations)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def nearestIds(self, **kwargs):
+        return [restaurantId for restaurantId, _ in self.locations.nearest(35.69, 51.4, k=10, **kwargs)]
+
+    def test_orders_by_distance_and_open_hour(self):
+        first, second, third = (restaurant.id for restaurant in self.restaurants)
+        self.assertEqual(self.nearestIds(), [first, second, third])
+        self.assertEqual(self.nearestIds(maxDistanceKm=5), [first, second])
+        with self.captureOnCommitCallbacks(execute=True):
+            second = Restaurant.objects.get(id=second)
+            second.startWorkHour, second.endWorkHour = 18, 23
+            second.save()
+        self.assertEqual(self.nearestIds(openHour=12), [first, third])
+
+    def test_saved_restaurant_updates_index_without_reload(self):
+        first, second, third = self.restaurants
+        with mock.patch.object(RestaurantLocations, "_load") as load:
+            with self.captureOnCommitCallbacks(execute=True):
+                third.latitude, third.longitude = 35.69, 51.4
+                third.save()
+            self.assertEqual(self.nearestIds()[0], third.id)
+            with self.captureOnCommitCallbacks(execute=True):
+                first.delete()
+            self.assertEqual(self.nearestIds(), [third.id, second.id])
+            # ذخیره‌ای که مختصات و ساعات کاری را تغییر نمی‌دهد ایندکس را دست نمی‌زند
+            with self.captureOnCommitCallbacks(execute=True):
+                second.save(update_fields=["name"])
+        load.assert_not_called()
+        self.assertEqual(self.locations.version, getVersions([RESTAURANT_LOCATIONS_SCOPE])[0])
+
+    def test_reloads_after_change_in_other_worker(self):
+        first, second, third = self.restaurants
+        # تغییر بدون سیگنال در worker دیگر که فقط نسخه scope را بالا برده است
+        Restaurant.objects.filter(id=third.id).update(latitude=35.69, longitude=51.4)
+        self.assertEqual(self.nearestIds()[0], first.id)
+        getCatalogCache().incr(f"version:{RESTAURANT_LOCATIONS_SCOPE}")
+        self.assertEqual(self.nearestIds(), [third.id, first.id, second.id])
+
+    def test_reloads_after_bulk_change(self):
+        first, second, third = self.restaurants
+        Restaurant.objects.filter(id=third.id).update(latitude=35.69, longitude=51.4)
+        with self.captureOnCommitCallbacks(execute=True):
+            bumpScopes([RESTAURANT_LOCATIONS_SCOPE], bulk=True)
+        self.assertEqual(self.nearestIds(), [third.id, first.id, second.id])
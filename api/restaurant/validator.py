@@ -1,5 +1,28 @@
 import re
 
+from services.GeoIndex import InvalidCoordinates, parseCoordinates
+
+def validateAreasPrices(areas, areas_prices):
+    if not isinstance(areas_prices, list) or len(areas_prices) != len(areas):
+        return 'تعداد قیمت‌های مناطق باید با تعداد مناطق برابر باشد.'
+    for price in areas_prices:
+        try:
+            p = float(price)
+            if p < 0:
+                return 'هزینه ارسال مناطق نباید منفی باشد.'
+        except (ValueError, TypeError):
+            return 'هزینه‌های مناطق باید عددی باشند.'
+    return None
+
+
+def getAreaFees(data):
+    """{آیدی منطقه: هزینه ارسال} از areas[] و areasPrices[] اعتبارسنجی‌شده"""
+    return {
+        int(area): int(round(float(price)))
+        for area, price in zip(data.getlist('areas[]'), data.getlist('areasPrices[]'))
+    }
+
+
 def validateRestaurantData(data):
     name = data.get('name', '').strip()
     if len(name) < 3:
@@ -17,16 +40,9 @@ def validateRestaurantData(data):
     if not isinstance(areas, list) or len(areas) == 0:
         return 'حداقل یک منطقه سرویس‌دهی باید مشخص شود.'
 
-    areas_prices = data.getlist('areasPrices[]')
-    if not isinstance(areas_prices, list) or len(areas_prices) != len(areas):
-        return 'تعداد قیمت‌های مناطق باید با تعداد مناطق برابر باشد.'
-    for price in areas_prices:
-        try:
-            p = float(price)
-            if p < 0:
-                return 'هزینه ارسال مناطق نباید منفی باشد.'
-        except (ValueError, TypeError):
-            return 'هزینه‌های مناطق باید عددی باشند.'
+    areas_prices_error = validateAreasPrices(areas, data.getlist('areasPrices[]'))
+    if areas_prices_error:
+        return areas_prices_error
 
     phone = data.get('phoneNumber', '').strip()
     if not re.fullmatch(r'09\d{9}', phone):
@@ -44,9 +60,14 @@ def validateRestaurantData(data):
         if intValue < 0 or intValue > 23:
             return f'{field} باید عددی بین ۰ تا ۲۳ باشد.'
         data[field] = intValue
+    # ساعت پایان کمتر از شروع یعنی کار تا بعد از نیمه‌شب ادامه دارد و شروع و پایان برابر یعنی شبانه‌روزی
 
-    if data['endWorkHour'] <= data['startWorkHour']:
-        return 'ساعت پایان باید بعد از ساعت شروع باشد.'
+    # مختصات اختیاری است ولی اگر ارسال شود هر دو مقدار باید معتبر باشند
+    try:
+        point = parseCoordinates(data.get('latitude'), data.get('longitude'))
+    except InvalidCoordinates:
+        return 'مختصات جغرافیایی نامعتبر است.'
+    data['latitude'], data['longitude'] = point or (None, None)
 
     try:
         delivery_fee = float(data.get('deliveryFeeBase', 0))
@@ -1,16 +1,31 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from django.db.models import Min, Max, Q
+from django.db.models import Case, F, IntegerField, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Cast, Coalesce
 from Area.models import Area
 from City.models import City
 from food.models import Food
+from leaderboard.boards import ALL_KEY, areaKey, restaurantLeaderboards
 from restaurantManager.services import getRestaurantManager
 from services.Authorization import require_authorization_manager
 from services.ImageValidation import ImageValidation
+from services.GeoIndex import InvalidCoordinates, parseCoordinates
+from services.Pagination import InvalidCursor, decodeCursor, encodeCursor, getPageSize, paginateByKeyset
+from services.ResponseCache import cacheResponse, conditionalResponse, getKnownAreaIds
 from services.UploadImages import uploadImage
-from .models import Restaurant
-from .validator import validateRestaurantData
+from services.WorkingHours import InvalidHour, filterOpenAt, getRequestedHour
+from .delivery import setAreaDeliveryFees
+from .locations import restaurantLocations
+from .models import Restaurant, RestaurantAreaDeliveryFee
+from .services import (
+    getRestaurantCardQuerySet,
+    getRestaurantCards,
+    getRestaurantCardsByIds,
+    getRestaurantDetailsStamp,
+    serializeRestaurantCard,
+)
+from .validator import getAreaFees, validateAreasPrices, validateRestaurantData
 
 class AddRestaurantView(APIView):
     @require_authorization_manager
@@ -58,12 +73,16 @@ class AddRestaurantView(APIView):
             contactEmail=data['contactEmail'].strip(),
             startWorkHour=int(data['startWorkHour']),
             endWorkHour=int(data['endWorkHour']),
+            latitude=data.get('latitude'),
+            longitude=data.get('longitude'),
             deliveryFeeBase=float(data['deliveryFeeBase']),
             freeDeliveryThreshold=data.get('freeDeliveryThreshold'),
             bankAccountNumber=data['bankAccountNumber'].strip(),
             commissionRate=5.00
         )
         restaurant.areas.set(mArea)
+        areaFees = getAreaFees(data)
+        setAreaDeliveryFees(restaurant, {area.id: areaFees[area.id] for area in mArea})
         return Response({
             "status": "success",
             "message": "رستوران با موفقیت اضافه شد.",
@@ -127,13 +146,31 @@ class EditRestaurantView(APIView):
             restaurant.startWorkHour = int(data["startWorkHour"])
         if data.get("endWorkHour"):
             restaurant.endWorkHour = int(data["endWorkHour"])
+        if data.get("latitude") or data.get("longitude"):
+            try:
+                restaurant.latitude, restaurant.longitude = parseCoordinates(data.get("latitude"), data.get("longitude"))
+            except InvalidCoordinates:
+                return Response({
+                    "status": "error",
+                    "message": "مختصات جغرافیایی نامعتبر است."
+                }, status=status.HTTP_400_BAD_REQUEST)
         if data.get("deliveryFeeBase"):
             restaurant.deliveryFeeBase = float(data["deliveryFeeBase"])
         if "freeDeliveryThreshold" in data:
             restaurant.freeDeliveryThreshold = data["freeDeliveryThreshold"]
 
-        # بروزرسانی مناطق سرویس‌دهی
+        # بروزرسانی مناطق سرویس‌دهی و هزینه ارسال هر منطقه (بدون areasPrices[] هزینه‌های قبلی مناطق باقی‌مانده حفظ می‌شوند)
         if data.getlist('areas[]'):
+            if data.getlist('areasPrices[]'):
+                areas_prices_error = validateAreasPrices(data.getlist('areas[]'), data.getlist('areasPrices[]'))
+                if areas_prices_error:
+                    return Response({
+                        "status": "error",
+                        "message": areas_prices_error
+                    }, status=status.HTTP_400_BAD_REQUEST)
+                areaFees = getAreaFees(data)
+            else:
+                areaFees = dict(RestaurantAreaDeliveryFee.objects.filter(restaurant=restaurant).values_list('area_id', 'fee'))
             mArea = []
             for area in data.getlist('areas[]'):
                 try:
@@ -141,6 +178,7 @@ class EditRestaurantView(APIView):
                 except Area.DoesNotExist:
                     continue
             restaurant.areas.set(mArea)
+            setAreaDeliveryFees(restaurant, {area.id: areaFees[area.id] for area in mArea if area.id in areaFees})
 
         restaurant.save()
         return Response({
@@ -151,94 +189,171 @@ class EditRestaurantView(APIView):
 
 
 class GetNearestRestaurant(APIView):
+    @cacheResponse('nearestRestaurants')
     def post(self, request):
         areaId = request.data.get('areaId')
 
+        try:
+            openHour = getRequestedHour(request.data)
+        except InvalidHour:
+            return Response({
+                "status": "error",
+                "message": "پارامتر openAt نامعتبر است."
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            point = parseCoordinates(request.data.get('latitude'), request.data.get('longitude'))
+            radiusKm = request.data.get('radiusKm')
+            radiusKm = float(radiusKm) if radiusKm not in (None, '') else None
+            if radiusKm is not None and radiusKm <= 0:
+                raise ValueError(radiusKm)
+        except (InvalidCoordinates, TypeError, ValueError):
+            return Response({
+                "status": "error",
+                "message": "مختصات یا شعاع جستجو نامعتبر است."
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        # با مختصات، رستوران‌ها به ترتیب فاصله واقعی از ایندکس مکانی خوانده می‌شوند؛ بدون آن بر اساس منطقه
+        if point is not None:
+            return self.nearestByLocation(request, point, radiusKm, openHour)
+
         if not areaId:
-            selectedRestaurants = Restaurant.objects.all()[:100]
+            selectedRestaurants = Restaurant.objects.all()
         else:
             try:
                 area = Area.objects.get(id=int(areaId))
                 selectedRestaurants = Restaurant.objects.filter(areas=area)
             except Area.DoesNotExist:
-                selectedRestaurants = Restaurant.objects.all()[:100]
-
-        data = []
-        for r in selectedRestaurants:
-            areas = r.areas.all()
-            data.append({
-                "id": r.id,
-                "name": r.name,
-                "image": r.image,
-                "description": r.description,
-                "isActive": r.isActive,
-                "startWorkHour": r.startWorkHour,
-                "endWorkHour": r.endWorkHour,
-                "ratingAvg": r.ratingAvg,
-                "ratingCount": r.ratingCount,
-                "cityName": r.city.name,
-                "cityId": r.city.id,
-                "areas": [
-                    {"id": a.id, "name": a.name} for a in areas
-                ]
-            })
+                selectedRestaurants = Restaurant.objects.all()
+        selectedRestaurants = filterOpenAt(selectedRestaurants, openHour)
+
+        try:
+            selectedRestaurants, nextCursor = paginateByKeyset(
+                getRestaurantCardQuerySet(selectedRestaurants), cursor=request.data.get('cursor'), limit=request.data.get('limit')
+            )
+        except InvalidCursor:
+            return Response({
+                "status": "error",
+                "message": "پارامتر cursor نامعتبر است."
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        data = getRestaurantCards(selectedRestaurants)
 
         return Response({
             "status": "success",
             "message": "نزدیک ترین رستوران ها جستجو شد.",
-            "data": data
+            "data": data,
+            "nextCursor": nextCursor
+        }, status=status.HTTP_200_OK)
+
+    def nearestByLocation(self, request, point, radiusKm, openHour):
+        cursor = request.data.get('cursor')
+        limit = getPageSize(request.data.get('limit'))
+        try:
+            after = None
+            if cursor:
+                distance, lastId = decodeCursor(cursor)
+                after = (float(distance), int(lastId))
+        except (InvalidCursor, TypeError, ValueError):
+            return Response({
+                "status": "error",
+                "message": "پارامتر cursor نامعتبر است."
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        nearest = restaurantLocations.nearest(*point, k=limit + 1, maxDistanceKm=radiusKm, openHour=openHour, after=after)
+        nextCursor = None
+        if len(nearest) > limit:
+            nearest = nearest[:limit]
+            nextCursor = encodeCursor([nearest[-1][1], nearest[-1][0]])
+
+        distances = dict(nearest)
+        data = getRestaurantCardsByIds([restaurantId for restaurantId, _ in nearest])
+        for card in data:
+            card['distanceKm'] = distances[card['id']]
+
+        return Response({
+            "status": "success",
+            "message": "نزدیک ترین رستوران ها جستجو شد.",
+            "data": data,
+            "nextCursor": nextCursor
         }, status=status.HTTP_200_OK)
 
 
 class GetRestaurantsByRating(APIView):
+    @cacheResponse('restaurantsByRating')
     def post(self, request):
         areaId = request.data.get('areaId')
+        cursor, limit = request.data.get('cursor'), request.data.get('limit')
 
-        if areaId:
-            try:
-                area = Area.objects.get(id=int(areaId))
-                restaurants = Restaurant.objects.filter(areas=area)
-            except Area.DoesNotExist:
-                restaurants = Restaurant.objects.all()
-        else:
-            restaurants = Restaurant.objects.all()
+        try:
+            openHour = getRequestedHour(request.data)
+        except InvalidHour:
+            return Response({
+                "status": "error",
+                "message": "پارامتر openAt نامعتبر است."
+            }, status=status.HTTP_400_BAD_REQUEST)
 
-        restaurants = restaurants.order_by('-ratingAvg')[:100]
-
-        data = []
-        for r in restaurants:
-            areas = r.areas.all()
-            data.append({
-                "id": r.id,
-                "name": r.name,
-                "description": r.description,
-                "isActive": r.isActive,
-                "startWorkHour": r.startWorkHour,
-                "endWorkHour": r.endWorkHour,
-                "ratingAvg": r.ratingAvg,
-                "ratingCount": r.ratingCount,
-                "cityName": r.city.name,
-                "cityId": r.city.id,
-                "areas": [{"id": a.id, "name": a.name} for a in areas],
-                "deliveryFeeBase": r.deliveryFeeBase
-            })
+        try:
+            areaId = int(areaId) if areaId else None
+        except (TypeError, ValueError):
+            areaId = None
+        # اگر منطقه یافت نشد، روی همه رستوران‌ها کار کن
+        key = areaKey(areaId) if areaId in getKnownAreaIds() else ALL_KEY
+
+        try:
+            # صفحه از جدول top-K درون حافظه؛ فقط صفحه‌های عمیق‌تر از جدول (یا فیلتر ساعت کاری) به مرتب‌سازی دیتابیس می‌رسند
+            page = restaurantLeaderboards.page(key, cursor, limit) if openHour is None else None
+            if page is not None:
+                restaurantIds, nextCursor = page
+                data = getRestaurantCardsByIds(restaurantIds)
+            else:
+                restaurants = filterOpenAt(Restaurant.objects.all(), openHour)
+                if key != ALL_KEY:
+                    restaurants = restaurants.filter(areas=areaId)
+                restaurants, nextCursor = paginateByKeyset(
+                    getRestaurantCardQuerySet(restaurants), 'rankingScore', descending=True, cursor=cursor, limit=limit
+                )
+                data = getRestaurantCards(restaurants)
+        except InvalidCursor:
+            return Response({
+                "status": "error",
+                "message": "پارامتر cursor نامعتبر است."
+            }, status=status.HTTP_400_BAD_REQUEST)
 
         return Response({
             "status": "success",
             "message": "رستوران‌ها بر اساس امتیاز مرتب شدند.",
-            "data": data
+            "data": data,
+            "nextCursor": nextCursor
         }, status=status.HTTP_200_OK)
 
 
 
 class GetRestaurantsByPrice(APIView):
+    @cacheResponse('restaurantsByPrice')
     def post(self, request):
         areaId = request.data.get('areaId')
         priceOrder = request.data.get('priceOrder', 'asc')  # 'asc' یا 'desc'
+        sortBy = request.data.get('sortBy', 'price')  # 'price' یا 'deliveredPrice' (قیمت به همراه هزینه ارسال به منطقه)
         minPrice = request.data.get('minPrice')
         maxPrice = request.data.get('maxPrice')
 
+        if sortBy not in ('price', 'deliveredPrice'):
+            return Response({
+                "status": "error",
+                "message": "پارامتر sortBy نامعتبر است."
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            openHour = getRequestedHour(request.data)
+        except InvalidHour:
+            return Response({
+                "status": "error",
+                "message": "پارامتر openAt نامعتبر است."
+            }, status=status.HTTP_400_BAD_REQUEST)
+
         # فیلتر رستوران‌ها براساس منطقه (اگر ارسال شده)
+        area = None
         if areaId:
             try:
                 area = Area.objects.get(id=int(areaId))
@@ -249,8 +364,15 @@ class GetRestaurantsByPrice(APIView):
         else:
             restaurants = Restaurant.objects.all()
 
-        # فیلتر غذاها بر اساس قیمت
-        food_filter = Q()
+        if sortBy == 'deliveredPrice' and area is None:
+            return Response({
+                "status": "error",
+                "message": "برای مرتب‌سازی با هزینه ارسال، areaId معتبر الزامی است."
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        restaurants = filterOpenAt(restaurants, openHour)
+
+        food_filter = Q(isAvailable=True, restaurant=OuterRef('pk'))
         if minPrice is not None:
             try:
                 minPrice = float(minPrice)
@@ -270,41 +392,66 @@ class GetRestaurantsByPrice(APIView):
                     "message": "maxPrice باید عدد باشد."
                 }, status=status.HTTP_400_BAD_REQUEST)
 
-        # فقط رستوران‌هایی که حداقل یک غذا با قیمت در بازه دارند
-        restaurants = restaurants.filter(food__isAvailable=True).filter(food_filter).distinct()
-
-        # به ازای هر رستوران کمترین یا بیشترین قیمت غذای داخل بازه را می‌گیریم برای مرتب‌سازی
-        if priceOrder == 'desc':
-            restaurants = restaurants.annotate(price=Max('food__price')).order_by('-price')
+        # مرتب‌سازی صعودی بر اساس ارزان‌ترین و نزولی بر اساس گران‌ترین غذای قابل سفارش رستوران
+        if minPrice is not None or maxPrice is not None:
+            # با بازه قیمت، ارزان‌ترین (یا گران‌ترین) غذای داخل همان بازه با یک زیرکوئری روی ایندکس restaurant غذا؛
+            # رستوران بدون غذای داخل بازه حذف می‌شود
+            inRange = Food.objects.filter(food_filter).order_by('-price' if priceOrder == 'desc' else 'price')
+            restaurants = restaurants.annotate(foodPrice=Subquery(inRange.values('price')[:1])).filter(
+                foodPrice__isnull=False
+            )
+        else:
+            # بدون بازه از روی خلاصه قیمت منو (food.RestaurantPriceSummary) بدون GROUP BY روی جدول غذا
+            restaurants = restaurants.filter(priceSummary__availableFoodCount__gt=0).annotate(
+                foodPrice=F('priceSummary__maxPrice' if priceOrder == 'desc' else 'priceSummary__minPrice')
+            )
+        restaurants = restaurants.annotate(
+            medianFoodPrice=F('priceSummary__medianPrice'),
+            availableFoodCount=F('priceSummary__availableFoodCount'),
+        )
+        if sortBy == 'deliveredPrice':
+            # هزینه ارسال به همان منطقه (ردیف اختصاصی منطقه یا هزینه پایه)؛ اگر همان غذا به حد ارسال رایگان برسد صفر
+            areaFee = RestaurantAreaDeliveryFee.objects.filter(restaurant=OuterRef('pk'), area=area).values('fee')[:1]
+            restaurants = restaurants.annotate(
+                deliveryFee=Case(
+                    When(freeDeliveryThreshold__lte=F('foodPrice'), then=Value(0)),
+                    default=Coalesce(Subquery(areaFee), Cast('deliveryFeeBase', IntegerField())),
+                    output_field=IntegerField(),
+                ),
+            ).annotate(price=F('foodPrice') + F('deliveryFee'))
         else:
-            restaurants = restaurants.annotate(price=Min('food__price')).order_by('price')
-
-        data = []
-        for r in restaurants:
-            areas = r.areas.all()
-            data.append({
-                "id": r.id,
-                "name": r.name,
-                "description": r.description,
-                "isActive": r.isActive,
-                "startWorkHour": r.startWorkHour,
-                "endWorkHour": r.endWorkHour,
-                "ratingAvg": r.ratingAvg,
-                "ratingCount": r.ratingCount,
-                "cityName": r.city.name,
-                "cityId": r.city.id,
-                "areas": [{"id": a.id, "name": a.name} for a in areas],
-                "minFoodPrice": r.price  # قیمت کمینه یا بیشینه غذای داخل بازه
-            })
+            restaurants = restaurants.annotate(price=F('foodPrice'))
+
+        try:
+            restaurants, nextCursor = paginateByKeyset(
+                getRestaurantCardQuerySet(restaurants), 'price', descending=priceOrder == 'desc',
+                cursor=request.data.get('cursor'), limit=request.data.get('limit')
+            )
+        except InvalidCursor:
+            return Response({
+                "status": "error",
+                "message": "پارامتر cursor نامعتبر است."
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        # قیمت کمینه (یا در مرتب‌سازی نزولی بیشینه) غذاهای داخل بازه، میانه و تعداد غذاهای قابل سفارش رستوران
+        data = [
+            serializeRestaurantCard(
+                r, minFoodPrice=r.foodPrice, medianFoodPrice=r.medianFoodPrice, availableFoodCount=r.availableFoodCount,
+                **({'deliveryFee': r.deliveryFee, 'deliveredPrice': r.price} if sortBy == 'deliveredPrice' else {})
+            )
+            for r in restaurants
+        ]
 
         return Response({
             "status": "success",
             "message": "رستوران‌ها بر اساس قیمت غذا فیلتر و مرتب شدند.",
-            "data": data
+            "data": data,
+            "nextCursor": nextCursor
         }, status=status.HTTP_200_OK)
 
 
 class GetRestaurantsByFoodCategory(APIView):
+    @cacheResponse('restaurantsByFoodCategory')
     def post(self, request):
         areaId = request.data.get('areaId')
         foodCategoryId = request.data.get('foodCategoryId')
@@ -315,6 +462,14 @@ class GetRestaurantsByFoodCategory(APIView):
                 "message": "آیدی دسته‌بندی غذا ارسال نشده است."
             }, status=status.HTTP_400_BAD_REQUEST)
 
+        try:
+            openHour = getRequestedHour(request.data)
+        except InvalidHour:
+            return Response({
+                "status": "error",
+                "message": "پارامتر openAt نامعتبر است."
+            }, status=status.HTTP_400_BAD_REQUEST)
+
         if areaId:
             try:
                 area = Area.objects.get(id=int(areaId))
@@ -324,31 +479,26 @@ class GetRestaurantsByFoodCategory(APIView):
         else:
             restaurants = Restaurant.objects.all()
 
-        # فیلتر رستوران‌هایی که حداقل یک غذا با این دسته دارند
-        restaurants = restaurants.filter(food__category_id=foodCategoryId).distinct()
-
-        data = []
-        for r in restaurants:
-            areas = r.areas.all()
-            data.append({
-                "id": r.id,
-                "name": r.name,
-                "description": r.description,
-                "isActive": r.isActive,
-                "startWorkHour": r.startWorkHour,
-                "endWorkHour": r.endWorkHour,
-                "ratingAvg": r.ratingAvg,
-                "ratingCount": r.ratingCount,
-                "cityName": r.city.name,
-                "cityId": r.city.id,
-                "areas": [{"id": a.id, "name": a.name} for a in areas],
-                "deliveryFeeBase": r.deliveryFeeBase
-            })
+        # فیلتر رستوران‌هایی که حداقل یک غذای قابل سفارش با این دسته دارند (مجموعه دسته‌بندی‌های خلاصه منو)
+        restaurants = filterOpenAt(restaurants, openHour).filter(priceSummary__categories=foodCategoryId)
+
+        try:
+            restaurants, nextCursor = paginateByKeyset(
+                getRestaurantCardQuerySet(restaurants), cursor=request.data.get('cursor'), limit=request.data.get('limit')
+            )
+        except InvalidCursor:
+            return Response({
+                "status": "error",
+                "message": "پارامتر cursor نامعتبر است."
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        data = getRestaurantCards(restaurants)
 
         return Response({
             "status": "success",
             "message": "رستوران‌ها بر اساس دسته‌بندی غذا فیلتر شدند.",
-            "data": data
+            "data": data,
+            "nextCursor": nextCursor
         }, status=status.HTTP_200_OK)
 
 
@@ -400,6 +550,7 @@ class GetRestaurantInfo(APIView):
 
 
 class GetRestaurantDetails(APIView):
+    @conditionalResponse('restaurantDetails', lambda request: getRestaurantDetailsStamp(request.data.get('restaurantId')))
     def post(self, request):
         try:
             restaurant = Restaurant.objects.get(id=request.data['restaurantId'])
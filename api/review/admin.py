@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import FoodReview
+from .models import FoodReview, RatingPrior
 
 
 @admin.register(FoodReview)
@@ -22,3 +22,9 @@ class FoodReviewAdmin(admin.ModelAdmin):
             "fields": ("createdAt",)
         }),
     )
+
+
+@admin.register(RatingPrior)
+class RatingPriorAdmin(admin.ModelAdmin):
+    list_display = ("target", "mean", "weight", "updatedAt")
+    readonly_fields = ("updatedAt",)
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from review.services import refreshRatingPriors
+
+
+class Command(BaseCommand):
+    help = "محاسبه دوباره prior سراسری امتیاز بیزی و بازسازی rankingScore همه غذاها و رستوران‌ها (اجرای دوره‌ای)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--min-weight', type=int, default=1, help="حداقل وزن prior (تعداد رأی فرضی)")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        priors, changedFoods, changedRestaurants = refreshRatingPriors(options['min_weight'], options['batch_size'])
+        for target, (mean, weight) in priors.items():
+            self.stdout.write(f"{target}: mean={mean} weight={weight}")
+        self.stdout.write(self.style.SUCCESS(
+            f"امتیاز {changedFoods} غذا و {changedRestaurants} رستوران به‌روز شد."
+        ))
@@ -12,3 +12,21 @@ class FoodReview(models.Model):
 
     def __str__(self):
         return f"{self.customer} - {self.food} ({self.rating})"
+
+
+class RatingPrior(models.Model):
+    """
+    prior سراسری میانگین بیزی: rankingScore = (weight * mean + مجموع امتیازها) / (weight + تعداد رأی‌ها)
+    با دستور refresh_rating_prior به صورت دوره‌ای دوباره محاسبه می‌شود.
+    """
+    TARGET_CHOICES = [
+        ('food', 'غذا'),
+        ('restaurant', 'رستوران'),
+    ]
+    target = models.CharField(max_length=20, choices=TARGET_CHOICES, unique=True)
+    mean = models.DecimalField(max_digits=4, decimal_places=2)
+    weight = models.PositiveIntegerField()
+    updatedAt = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.target}: {self.mean} × {self.weight}"
@@ -0,0 +1,167 @@
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from Area.models import Area
+from food.models import Food
+from food.services import refreshAreaFoodRatings
+from restaurant.models import Restaurant
+from services.ResponseCache import ALL_AREAS_SCOPE, CATALOG_SCOPE, areaScope, bumpScopes
+from .models import FoodReview, RatingPrior
+
+# prior پیش‌فرض تا قبل از اولین اجرای refresh_rating_prior
+DEFAULT_PRIOR_MEAN = Decimal("3.00")
+DEFAULT_PRIOR_WEIGHT = 10
+
+FOOD_TARGET = "food"
+RESTAURANT_TARGET = "restaurant"
+
+
+def getRatingPriors():
+    priors = {
+        FOOD_TARGET: (DEFAULT_PRIOR_MEAN, DEFAULT_PRIOR_WEIGHT),
+        RESTAURANT_TARGET: (DEFAULT_PRIOR_MEAN, DEFAULT_PRIOR_WEIGHT),
+    }
+    for target, mean, weight in RatingPrior.objects.values_list("target", "mean", "weight"):
+        priors[target] = (mean, weight)
+    return priors
+
+
+def bayesianScore(ratingSum, count, prior):
+    mean, weight = prior
+    if not count and not weight:
+        return Decimal(0)
+    score = (Decimal(weight) * mean + ratingSum) / (weight + count)
+    return score.quantize(Decimal("0.0001"), rounding=ROUND_HALF_UP)
+
+
+def priorRankingScore(target, priors=None):
+    """rankingScore ردیف جدید بدون رأی (میانگین prior)؛ تا اولین رأی یا اجرای بعدی refresh_rating_prior معتبر است"""
+    return bayesianScore(0, 0, (priors or getRatingPriors())[target])
+
+
+def averageRating(ratingSum, count):
+    if not count:
+        return Decimal(0)
+    return (Decimal(ratingSum) / count).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+
+
+def addFoodRating(food, rating):
+    """
+    افزودن یک رأی به غذا و رستورانش در O(1).
+    باید داخل تراکنش و روی ردیف قفل‌شده غذا (select_for_update) صدا زده شود؛ ردیف رستوران همین‌جا قفل می‌شود.
+    """
+    priors = getRatingPriors()
+
+    food.ratingSum += rating
+    food.ratingTotalVoters += 1
+    food.ratingScore = averageRating(food.ratingSum, food.ratingTotalVoters)
+    food.rankingScore = bayesianScore(food.ratingSum, food.ratingTotalVoters, priors[FOOD_TARGET])
+    food.save(update_fields=["ratingSum", "ratingTotalVoters", "ratingScore", "rankingScore", "updatedAt"])
+
+    if food.restaurant_id:
+        restaurant = Restaurant.objects.select_for_update().get(id=food.restaurant_id)
+        restaurant.ratingSum += rating
+        restaurant.ratingCount += 1
+        restaurant.ratingAvg = averageRating(restaurant.ratingSum, restaurant.ratingCount)
+        restaurant.rankingScore = bayesianScore(
+            restaurant.ratingSum, restaurant.ratingCount, priors[RESTAURANT_TARGET]
+        )
+        restaurant.save(update_fields=["ratingSum", "ratingCount", "ratingAvg", "rankingScore", "updatedAt"])
+
+
+def _foodTotals(foodIds):
+    return {
+        foodId: (ratingSum, count)
+        for foodId, ratingSum, count in FoodReview.objects.filter(food_id__in=foodIds).values("food_id").annotate(
+            ratingSum=Sum("rating"), count=Count("id")
+        ).values_list("food_id", "ratingSum", "count")
+    }
+
+
+def _restaurantTotals(restaurantIds):
+    return {
+        restaurantId: (ratingSum, count)
+        for restaurantId, ratingSum, count in FoodReview.objects.filter(
+            food__restaurant_id__in=restaurantIds
+        ).values("food__restaurant_id").annotate(ratingSum=Sum("rating"), count=Count("id")).values_list(
+            "food__restaurant_id", "ratingSum", "count"
+        )
+    }
+
+
+def _refreshScores(model, getTotals, countField, averageField, prior, batchSize):
+    """
+    امتیاز ردیف‌ها دسته به دسته، هر دسته در یک تراکنش: ردیف‌ها اول قفل (select_for_update) و بعد مجموع رأی‌هایشان
+    خوانده می‌شود. رأی‌ای که پیش از قفل ثبت شده در مجموع دیده می‌شود و رأی بعدی، addFoodRating را روی همین ردیف
+    قفل‌شده منتظر می‌گذارد تا روی مقدار نوشته‌شده افزایش دهد؛ پس هیچ رأی هم‌زمانی گم نمی‌شود.
+    """
+    fields = ["ratingSum", countField, averageField, "rankingScore", "updatedAt"]
+    ids = list(model.objects.order_by("id").values_list("id", flat=True))
+    changed = []
+    for start in range(0, len(ids), batchSize):
+        with transaction.atomic():
+            items = list(
+                model.objects.select_for_update().filter(id__in=ids[start:start + batchSize]).order_by("id").only(
+                    "id", "ratingSum", countField, averageField, "rankingScore"
+                )
+            )
+            totals = getTotals([item.id for item in items])
+            now = timezone.now()
+            batch = []
+            for item in items:
+                ratingSum, count = totals.get(item.id, (0, 0))
+                average = averageRating(ratingSum, count)
+                rankingScore = bayesianScore(ratingSum, count, prior)
+                if (item.ratingSum, getattr(item, countField), getattr(item, averageField), item.rankingScore) == (
+                    ratingSum, count, average, rankingScore
+                ):
+                    continue
+                item.ratingSum = ratingSum
+                setattr(item, countField, count)
+                setattr(item, averageField, average)
+                item.rankingScore = rankingScore
+                item.updatedAt = now
+                batch.append(item)
+            if batch:
+                model.objects.bulk_update(batch, fields)
+        changed.extend(item.id for item in batch)
+    return changed
+
+
+def refreshRatingPriors(minWeight=1, batchSize=1000):
+    """
+    محاسبه دوباره prior سراسری از روی همه نظرها و بازسازی امتیاز همه غذاها و رستوران‌ها.
+    mean میانگین همه رأی‌هاست و weight میانگین تعداد رأی غذاها (یا رستوران‌های) رأی‌دار.
+    خروجی: (priors، تعداد غذاهای تغییرکرده، تعداد رستوران‌های تغییرکرده)
+    """
+    overall = FoodReview.objects.aggregate(
+        ratingSum=Sum("rating"),
+        count=Count("id"),
+        foods=Count("food_id", distinct=True),
+        restaurants=Count("food__restaurant_id", distinct=True),
+    )
+    totalCount = overall["count"]
+    mean = averageRating(overall["ratingSum"], totalCount) if totalCount else DEFAULT_PRIOR_MEAN
+
+    priors = {}
+    for target, rated in ((FOOD_TARGET, overall["foods"]), (RESTAURANT_TARGET, overall["restaurants"])):
+        weight = round(totalCount / rated) if rated else DEFAULT_PRIOR_WEIGHT
+        priors[target] = (mean, max(weight, minWeight))
+        RatingPrior.objects.update_or_create(target=target, defaults={"mean": mean, "weight": priors[target][1]})
+
+    changedFoods = _refreshScores(Food, _foodTotals, "ratingTotalVoters", "ratingScore", priors[FOOD_TARGET], batchSize)
+    changedRestaurants = _refreshScores(
+        Restaurant, _restaurantTotals, "ratingCount", "ratingAvg", priors[RESTAURANT_TARGET], batchSize
+    )
+
+    # bulk_update سیگنال ندارد: ایندکس AreaFood به‌روز و کل کش کاتالوگ و جدول‌های امتیاز باطل می‌شوند
+    if changedFoods or changedRestaurants:
+        refreshAreaFoodRatings(changedFoods)
+        bumpScopes(
+            [CATALOG_SCOPE, ALL_AREAS_SCOPE] + [areaScope(areaId) for areaId in Area.objects.values_list("id", flat=True)],
+            bulk=True,
+        )
+    return priors, len(changedFoods), len(changedRestaurants)
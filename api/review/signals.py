@@ -0,0 +1,30 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from food.models import Food
+from restaurant.models import Restaurant
+from services.ResponseCache import bumpRestaurantAreas
+from .models import FoodReview
+from .services import FOOD_TARGET, RESTAURANT_TARGET, priorRankingScore
+
+
+# ردیف‌های جدید بدون رأی به جای صفر با امتیاز prior وارد مرتب‌سازی امتیاز می‌شوند
+@receiver(pre_save, sender=Food)
+def setFoodPriorScore(sender, instance, raw=False, **kwargs):
+    if not raw and instance._state.adding and not instance.ratingTotalVoters:
+        instance.rankingScore = priorRankingScore(FOOD_TARGET)
+
+
+@receiver(pre_save, sender=Restaurant)
+def setRestaurantPriorScore(sender, instance, raw=False, **kwargs):
+    if not raw and instance._state.adding and not instance.ratingCount:
+        instance.rankingScore = priorRankingScore(RESTAURANT_TARGET)
+
+
+@receiver(post_save, sender=FoodReview)
+@receiver(post_delete, sender=FoodReview)
+def invalidateReviewResponses(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    restaurantId = Food.objects.filter(id=instance.food_id).values_list("restaurant_id", flat=True).first()
+    bumpRestaurantAreas(restaurantId)
@@ -1,3 +1,95 @@
+from decimal import Decimal
+from io import BytesIO
+from unittest import mock
+
+from django.db import transaction
 from django.test import TestCase
 
-# Create your tests here.
+from City.models import City
+from customer.models import Customer
+from food.menu import importMenu
+from food.models import Food
+from FoodCategory.models import FoodCategory
+from restaurant.models import Restaurant
+from restaurantManager.models import RestaurantManager
+from . import services
+from .models import FoodReview, RatingPrior
+from .services import DEFAULT_PRIOR_MEAN, addFoodRating, refreshRatingPriors
+
+
+class PriorRankingScoreTests(TestCase):
+    def setUp(self):
+        self.city = City.objects.create(name="Tehran")
+        self.category = FoodCategory.objects.create(name="c")
+
+    def createRestaurant(self, email="m@x.com"):
+        manager = RestaurantManager.objects.create(email=email, firstName="a", lastName="b", isVerified=True)
+        return Restaurant.objects.create(
+            owner=manager, name="rest", address="addr addr addr", city=self.city, phoneNumber="09120000000",
+            startWorkHour=8, endWorkHour=22, isVerified=True
+        )
+
+    def test_new_rows_start_at_prior_mean(self):
+        restaurant = self.createRestaurant()
+        food = Food.objects.create(name="food", price=1000, category=self.category, restaurant=restaurant)
+        self.assertEqual(restaurant.rankingScore, DEFAULT_PRIOR_MEAN)
+        food.refresh_from_db()
+        self.assertEqual(food.rankingScore, DEFAULT_PRIOR_MEAN)
+
+    def test_new_rows_follow_refreshed_prior(self):
+        RatingPrior.objects.create(target="food", mean=Decimal("4.20"), weight=5)
+        RatingPrior.objects.create(target="restaurant", mean=Decimal("3.70"), weight=5)
+        restaurant = self.createRestaurant()
+        food = Food.objects.create(name="food", price=1000, category=self.category, restaurant=restaurant)
+        self.assertEqual(restaurant.rankingScore, Decimal("3.7000"))
+        self.assertEqual(food.rankingScore, Decimal("4.2000"))
+
+    def test_imported_foods_start_at_prior_mean(self):
+        restaurant = self.createRestaurant()
+        importMenu(restaurant, BytesIO("name,price,category\nfood,1000,c\n".encode()), "csv")
+        self.assertEqual(Food.objects.get(restaurant=restaurant).rankingScore, DEFAULT_PRIOR_MEAN)
+
+
+class RefreshRatingPriorsTests(TestCase):
+    def setUp(self):
+        city = City.objects.create(name="Tehran")
+        category = FoodCategory.objects.create(name="c")
+        manager = RestaurantManager.objects.create(email="m@x.com", firstName="a", lastName="b", isVerified=True)
+        restaurant = Restaurant.objects.create(
+            owner=manager, name="rest", address="addr addr addr", city=city, phoneNumber="09120000000",
+            startWorkHour=8, endWorkHour=22, isVerified=True
+        )
+        self.foods = [
+            Food.objects.create(name=f"food{i}", price=1000, category=category, restaurant=restaurant)
+            for i in range(2)
+        ]
+        self.customer = Customer.objects.create(email="c@x.com", firstName="a", lastName="b", isVerified=True)
+        for food in self.foods:
+            self.rate(food, 4)
+
+    def rate(self, food, rating):
+        # همان مسیر ثبت نظر (review/views.py)
+        with transaction.atomic():
+            food = Food.objects.select_for_update().get(id=food.id)
+            FoodReview.objects.create(food=food, customer=self.customer, rating=rating)
+            addFoodRating(food, rating)
+
+    def test_review_during_refresh_is_kept(self):
+        foodTotals = services._foodTotals
+        batches = []
+
+        def rateDuringRefresh(foodIds):
+            # نظری که بعد از پردازش دسته اول و قبل از دسته دوم ثبت می‌شود
+            if not batches:
+                self.rate(self.foods[1], 2)
+            batches.append(foodIds)
+            return foodTotals(foodIds)
+
+        with mock.patch.object(services, "_foodTotals", side_effect=rateDuringRefresh):
+            refreshRatingPriors(batchSize=1)
+
+        self.assertEqual(len(batches), 2)
+        food = Food.objects.get(id=self.foods[1].id)
+        self.assertEqual((food.ratingSum, food.ratingTotalVoters), (6, 2))
+        restaurant = Restaurant.objects.get(id=self.foods[1].restaurant_id)
+        self.assertEqual((restaurant.ratingSum, restaurant.ratingCount), (10, 3))
@@ -1,5 +1,5 @@
 # views.py
-from django.db import models
+from django.db import models, transaction
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
@@ -9,6 +9,7 @@ from customer.services import getCustomer
 from food.models import Food
 from services.Authorization import require_authorization_customer
 from .models import FoodReview
+from .services import addFoodRating
 
 class SubmitFoodReviewView(APIView):
     @require_authorization_customer
@@ -42,17 +43,17 @@ class SubmitFoodReviewView(APIView):
             return Response({"message": "شما قبلاً این غذا را نخریده‌اید یا سفارش شما تکمیل نشده است."},
                             status=status.HTTP_403_FORBIDDEN)
 
-        food = get_object_or_404(Food, id=food_id)
+        with transaction.atomic():
+            # قفل ردیف غذا تا رأی‌های هم‌زمان مجموع و تعداد را گم نکنند
+            food = get_object_or_404(Food.objects.select_for_update(), id=food_id)
 
-        FoodReview.objects.create(
-            food=food,
-            customer=customer,
-            rating=rating,
-            comment=comment
-        )
+            FoodReview.objects.create(
+                food=food,
+                customer=customer,
+                rating=rating,
+                comment=comment
+            )
 
-        food.ratingScore = round((food.ratingScore * food.ratingTotalVoters + int(rating)) / (food.ratingTotalVoters + 1), 2)
-        food.ratingTotalVoters = food.ratingTotalVoters + 1
-        food.save()
+            addFoodRating(food, rating)
 
         return Response({"message": "نظر شما با موفقیت ثبت شد."}, status=status.HTTP_201_CREATED)
@@ -0,0 +1,414 @@
+import bisect
+import heapq
+import math
+import re
+import threading
+from collections import defaultdict
+
+from services.ResponseCache import SEARCH_INDEX_SCOPE, followVersion, getVersions
+
+# یکسان‌سازی حروف عربی/فارسی، ارقام و حذف اعراب
+PERSIAN_CHAR_MAP = str.maketrans({
+    "ي": "ی", "ى": "ی", "ئ": "ی",
+    "ك": "ک",
+    "ة": "ه", "ۀ": "ه",
+    "أ": "ا", "إ": "ا", "ٱ": "ا",
+    "ؤ": "و",
+    "\u200c": " ",  # نیم‌فاصله
+    "\u200d": None, "\u200e": None, "\u200f": None,
+    "\u0640": None,  # کشیده
+    **{chr(0x06F0 + i): str(i) for i in range(10)},  # ارقام فارسی
+    **{chr(0x0660 + i): str(i) for i in range(10)},  # ارقام عربی
+    **{chr(code): None for code in range(0x064B, 0x0660)},  # اعراب
+    "\u0670": None,
+})
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+STOP_WORDS = {"و", "در", "با", "از", "به", "را", "که", "یا", "برای", "the", "and", "with"}
+
+# حداکثر تعداد واژه‌هایی که پیشوندِ آخرین کلمه جستجو به آن‌ها گسترش داده می‌شود
+MAX_PREFIX_EXPANSION = 20
+
+
+def normalizeText(text):
+    if not text:
+        return ""
+    return text.lower().translate(PERSIAN_CHAR_MAP)
+
+
+def tokenize(text):
+    return [token for token in TOKEN_PATTERN.findall(normalizeText(text)) if token not in STOP_WORDS]
+
+
+class InvertedIndex:
+    """
+    ایندکس معکوس با رتبه‌بندی BM25.
+    هر سند چند فیلد وزن‌دار دارد؛ tf هر واژه مجموع وزن فیلدهایی است که واژه در آن‌ها آمده (BM25F ساده).
+    برای هر واژه لیستی مرتب بر اساس سهم BM25 (impact) نگه داشته می‌شود تا جستجو با الگوریتم
+    Threshold به محض قطعی شدن k نتیجه اول متوقف شود و کل posting واژه‌های پرتکرار پیمایش نشود.
+    افزودن و حذف سند، لیست واژه‌هایش را با bisect در جا به‌روز می‌کند و لیست فقط وقتی دوباره مرتب می‌شود که
+    میانگین طول اسناد بیش از ۱۰٪ تغییر کرده باشد.
+    """
+
+    def __init__(self, fieldWeights, k1=1.2, b=0.75):
+        self.fieldWeights = fieldWeights
+        self.k1 = k1
+        self.b = b
+        self.postings = defaultdict(dict)  # term -> {docId: tf}
+        self.docTerms = {}  # docId -> {term: tf}
+        self.docLengths = {}
+        self.totalLength = 0.0
+        self.sortedTerms = []
+        # term -> (averageLength, [(-impact, -docId), ...] صعودی، یعنی impact نزولی و برای bisect مرتب)
+        self.impactLists = {}
+
+    def __len__(self):
+        return len(self.docLengths)
+
+    def add(self, docId, fields):
+        self.remove(docId)
+        terms = defaultdict(float)
+        for field, text in fields.items():
+            weight = self.fieldWeights.get(field, 1.0)
+            for token in tokenize(text):
+                terms[token] += weight
+        if not terms:
+            return
+
+        length = sum(terms.values())
+        self.docTerms[docId] = terms
+        self.docLengths[docId] = length
+        self.totalLength += length
+        for term, tf in terms.items():
+            posting = self.postings[term]
+            if not posting:
+                bisect.insort(self.sortedTerms, term)
+            posting[docId] = tf
+            cached = self.impactLists.get(term)
+            if cached is not None:
+                bisect.insort(cached[1], self._impactKey(tf, docId, cached[0]))
+
+    def remove(self, docId):
+        terms = self.docTerms.pop(docId, None)
+        if terms is None:
+            return
+        for term, tf in terms.items():
+            cached = self.impactLists.get(term)
+            if cached is not None:
+                # کلید با همان طول سند و میانگینی که هنگام درج استفاده شده دوباره ساخته می‌شود
+                impacts = cached[1]
+                key = self._impactKey(tf, docId, cached[0])
+                index = bisect.bisect_left(impacts, key)
+                if index < len(impacts) and impacts[index] == key:
+                    del impacts[index]
+                else:
+                    self.impactLists.pop(term)
+        self.totalLength -= self.docLengths.pop(docId)
+        for term in terms:
+            posting = self.postings[term]
+            posting.pop(docId, None)
+            if not posting:
+                del self.postings[term]
+                self.impactLists.pop(term, None)
+                index = bisect.bisect_left(self.sortedTerms, term)
+                if index < len(self.sortedTerms) and self.sortedTerms[index] == term:
+                    del self.sortedTerms[index]
+
+    def expandPrefix(self, prefix):
+        index = bisect.bisect_left(self.sortedTerms, prefix)
+        expanded = []
+        while index < len(self.sortedTerms) and len(expanded) < MAX_PREFIX_EXPANSION:
+            term = self.sortedTerms[index]
+            if not term.startswith(prefix):
+                break
+            expanded.append(term)
+            index += 1
+        return expanded
+
+    def _impact(self, tf, docId, averageLength):
+        return tf * (self.k1 + 1) / (tf + self.k1 * (1 - self.b + self.b * self.docLengths[docId] / averageLength))
+
+    def _impactKey(self, tf, docId, averageLength):
+        return -self._impact(tf, docId, averageLength), -docId
+
+    def _impactList(self, term, averageLength):
+        # لیست مرتب تا زمانی که میانگین طول اسناد بیش از ۱۰٪ تغییر نکرده معتبر است
+        cached = self.impactLists.get(term)
+        if cached is not None and abs(cached[0] - averageLength) <= 0.1 * averageLength:
+            return cached
+        impacts = sorted(self._impactKey(tf, docId, averageLength) for docId, tf in self.postings[term].items())
+        cached = self.impactLists[term] = (averageLength, impacts)
+        return cached
+
+    def search(self, tokens, limit=20, accept=None, prefixLast=True):
+        docCount = len(self.docLengths)
+        if not tokens or not docCount:
+            return []
+
+        # هر کلمه جستجو یک گروه است؛ کلمه آخر (در حال تایپ) به واژه‌هایی که با آن شروع می‌شوند گسترش می‌یابد
+        # و امتیاز سند در یک گروه، بیشترین امتیاز بین واژه‌های آن گروه است.
+        termGroups = [[token] for token in dict.fromkeys(tokens[:-1])]
+        lastTerms = (self.expandPrefix(tokens[-1]) if prefixLast else None) or [tokens[-1]]
+        termGroups.append(lastTerms)
+
+        averageLength = self.totalLength / docCount
+        groups = []
+        for terms in termGroups:
+            alternatives = []
+            for term in terms:
+                posting = self.postings.get(term)
+                if not posting:
+                    continue
+                df = len(posting)
+                idf = math.log(1 + (docCount - df + 0.5) / (df + 0.5))
+                listAverageLength, impacts = self._impactList(term, averageLength)
+                alternatives.append((idf, listAverageLength, impacts, posting))
+            if alternatives:
+                groups.append(alternatives)
+        if not groups:
+            return []
+
+        def groupScore(alternatives, docId):
+            best = 0.0
+            for idf, listAverageLength, _, posting in alternatives:
+                tf = posting.get(docId)
+                if tf:
+                    best = max(best, idf * self._impact(tf, docId, listAverageLength))
+            return best
+
+        # Threshold Algorithm: لیست هر گروه به ترتیب نزولی امتیاز (به صورت lazy) خوانده می‌شود و امتیاز کامل
+        # هر سند با دسترسی مستقیم به posting ها محاسبه می‌شود؛ وقتی k-امین امتیاز از سقف امتیاز اسناد
+        # دیده‌نشده بیشتر شد، بقیه لیست‌ها خوانده نمی‌شوند.
+        cursors = [
+            heapq.merge(*[
+                ((-idf * negativeImpact, -negativeDocId) for negativeImpact, negativeDocId in impacts)
+                for idf, _, impacts, _ in alternatives
+            ], reverse=True)
+            for alternatives in groups
+        ]
+        top = []
+        seen = set()
+        while True:
+            threshold = 0.0
+            exhausted = True
+            for cursor in cursors:
+                item = next(cursor, None)
+                if item is None:
+                    continue
+                exhausted = False
+                value, docId = item
+                threshold += value
+                if docId in seen:
+                    continue
+                seen.add(docId)
+                if accept is not None and not accept(docId):
+                    continue
+                score = sum(groupScore(alternatives, docId) for alternatives in groups)
+                if len(top) < limit:
+                    heapq.heappush(top, (score, docId))
+                elif score > top[0][0]:
+                    heapq.heapreplace(top, (score, docId))
+            if exhausted or (len(top) == limit and top[0][0] >= threshold):
+                break
+
+        return [(docId, score) for score, docId in sorted(top, reverse=True)]
+
+
+class SearchEngine:
+    """
+    موتور جستجوی درون‌فرایندی غذا و رستوران.
+    ایندکس در اولین جستجو از دیتابیس ساخته می‌شود و پس از آن با سیگنال‌های search/signals.py بعد از commit
+    به صورت افزایشی به‌روز می‌ماند (هر worker ایندکس مخصوص خودش را دارد). مثل ایندکس مکانی رستوران‌ها،
+    هماهنگی بین worker ها با نسخه scope «searchIndex» کش کاتالوگ انجام می‌شود و فقط تغییر worker دیگر (یا تغییر
+    گروهی) ایندکس را دوباره می‌سازد. بازسازی بیرون از قفل و در ایندکس جدا انجام می‌شود و تا پایان آن جستجوها
+    از ایندکس قبلی جواب می‌گیرند؛ تغییرات افزایشی همین مدت روی ایندکس جدید هم دوباره اعمال می‌شوند.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.buildLock = threading.Lock()
+        self.version = None
+        # در حین بازسازی: تغییرات افزایشی که باید روی ایندکس جدید هم اعمال شوند و نسخه‌ای که ایندکس جدید دارد
+        self.pending = None
+        self.buildVersion = None
+        self._reset()
+
+    def _reset(self):
+        self.foods = InvertedIndex({"name": 3.0, "description": 1.0})
+        self.restaurants = InvertedIndex({"name": 1.0})
+        self.foodRestaurant = {}
+        self.availableFoods = set()
+        self.restaurantAreas = defaultdict(set)
+        self.areaRestaurants = defaultdict(set)
+
+    @property
+    def loaded(self):
+        return self.version is not None
+
+    @property
+    def tracksChanges(self):
+        """آیا تغییرات افزایشی لازم است (ایندکس ساخته شده یا در حال ساخت است)"""
+        return self.version is not None or self.pending is not None
+
+    def _fill(self):
+        from food.models import Food
+        from restaurant.models import Restaurant
+
+        for foodId, name, description, restaurantId, isAvailable in Food.objects.values_list(
+            "id", "name", "description", "restaurant_id", "isAvailable"
+        ).iterator():
+            self._indexFood(foodId, name, description, restaurantId, isAvailable)
+        for restaurantId, name in Restaurant.objects.values_list("id", "name").iterator():
+            self.restaurants.add(restaurantId, {"name": name})
+        for restaurantId, areaId in Restaurant.areas.through.objects.values_list(
+            "restaurant_id", "area_id"
+        ).iterator():
+            self.restaurantAreas[restaurantId].add(areaId)
+            self.areaRestaurants[areaId].add(restaurantId)
+
+    def ensureLoaded(self):
+        version = getVersions([SEARCH_INDEX_SCOPE])[0]
+        if self.version == version:
+            return
+        # اگر ایندکس قبلی وجود دارد و درخواست دیگری در حال بازسازی است، همان ایندکس قبلی جواب می‌دهد
+        if not self.buildLock.acquire(blocking=not self.loaded):
+            return
+        try:
+            version = getVersions([SEARCH_INDEX_SCOPE])[0]
+            if self.version == version:
+                return
+            with self.lock:
+                self.pending = []
+                self.buildVersion = version
+            fresh = SearchEngine()
+            try:
+                fresh._fill()
+            except BaseException:
+                with self.lock:
+                    self.pending = self.buildVersion = None
+                raise
+            with self.lock:
+                for change in self.pending:
+                    change(fresh)
+                self.foods, self.restaurants = fresh.foods, fresh.restaurants
+                self.foodRestaurant, self.availableFoods = fresh.foodRestaurant, fresh.availableFoods
+                self.restaurantAreas, self.areaRestaurants = fresh.restaurantAreas, fresh.areaRestaurants
+                self.version = self.buildVersion
+                self.pending = self.buildVersion = None
+        finally:
+            self.buildLock.release()
+
+    def onVersionsBumped(self, versions, bulk=False):
+        version = versions.get(SEARCH_INDEX_SCOPE)
+        if version is None:
+            return
+        with self.lock:
+            self.version = followVersion(self.version, version, bulk)
+            if self.pending is not None:
+                self.buildVersion = followVersion(self.buildVersion, version, bulk)
+
+    def _apply(self, change):
+        """change(engine) روی ایندکس فعلی و اگر بازسازی در جریان است، بعدا روی ایندکس جدید هم اعمال می‌شود"""
+        with self.lock:
+            if self.loaded:
+                change(self)
+            if self.pending is not None:
+                self.pending.append(change)
+
+    def _indexFood(self, foodId, name, description, restaurantId, isAvailable):
+        self.foods.add(foodId, {"name": name, "description": description})
+        self.foodRestaurant[foodId] = restaurantId
+        if isAvailable:
+            self.availableFoods.add(foodId)
+        else:
+            self.availableFoods.discard(foodId)
+
+    def _removeFood(self, foodId):
+        self.foods.remove(foodId)
+        self.foodRestaurant.pop(foodId, None)
+        self.availableFoods.discard(foodId)
+
+    def _removeRestaurant(self, restaurantId):
+        self.restaurants.remove(restaurantId)
+        self._setRestaurantAreas(restaurantId, ())
+
+    def _setRestaurantAreas(self, restaurantId, areaIds):
+        for areaId in self.restaurantAreas.pop(restaurantId, ()):
+            self.areaRestaurants[areaId].discard(restaurantId)
+        for areaId in areaIds:
+            self.restaurantAreas[restaurantId].add(areaId)
+            self.areaRestaurants[areaId].add(restaurantId)
+
+    def _removeArea(self, areaId):
+        for restaurantId in self.areaRestaurants.pop(areaId, ()):
+            self.restaurantAreas[restaurantId].discard(areaId)
+
+    # --- به‌روزرسانی افزایشی ---
+    def indexFood(self, foodId, name, description, restaurantId, isAvailable):
+        if self.tracksChanges:
+            self._apply(lambda engine: engine._indexFood(foodId, name, description, restaurantId, isAvailable))
+
+    def reindexFoods(self, restaurantIds, foodIds=None):
+        """غذاهای چند رستوران (یا فقط foodIds) را بعد از تغییر گروهی دوباره از دیتابیس می‌خواند"""
+        if not self.tracksChanges:
+            return
+        from food.models import Food
+
+        foods = Food.objects.filter(restaurant_id__in=restaurantIds)
+        if foodIds is not None:
+            foods = foods.filter(id__in=foodIds)
+        rows = list(foods.values_list("id", "name", "description", "restaurant_id", "isAvailable"))
+
+        def reindex(engine):
+            for row in rows:
+                engine._indexFood(*row)
+
+        self._apply(reindex)
+
+    def removeFood(self, foodId):
+        if self.tracksChanges:
+            self._apply(lambda engine: engine._removeFood(foodId))
+
+    def indexRestaurant(self, restaurantId, name):
+        if self.tracksChanges:
+            self._apply(lambda engine: engine.restaurants.add(restaurantId, {"name": name}))
+
+    def removeRestaurant(self, restaurantId):
+        if self.tracksChanges:
+            self._apply(lambda engine: engine._removeRestaurant(restaurantId))
+
+    def setRestaurantAreas(self, restaurantId, areaIds):
+        if self.tracksChanges:
+            self._apply(lambda engine: engine._setRestaurantAreas(restaurantId, areaIds))
+
+    def removeArea(self, areaId):
+        if self.tracksChanges:
+            self._apply(lambda engine: engine._removeArea(areaId))
+
+    # --- جستجو ---
+    def search(self, query, areaId=None, limit=20):
+        tokens = tokenize(query)
+        if not tokens:
+            return {"foods": [], "restaurants": []}
+
+        self.ensureLoaded()
+        with self.lock:
+            if areaId is None:
+                acceptFood = self.availableFoods.__contains__
+                acceptRestaurant = None
+            else:
+                restaurantIds = self.areaRestaurants.get(areaId, set())
+
+                def acceptFood(foodId):
+                    return foodId in self.availableFoods and self.foodRestaurant.get(foodId) in restaurantIds
+
+                acceptRestaurant = restaurantIds.__contains__
+
+            return {
+                "foods": self.foods.search(tokens, limit, acceptFood),
+                "restaurants": self.restaurants.search(tokens, limit, acceptRestaurant),
+            }
+
+
+searchEngine = SearchEngine()
@@ -0,0 +1,84 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from food.models import Food
+from food.signals import foodsBulkChanged, touchesFields
+from restaurant.models import Restaurant
+from services.ResponseCache import SEARCH_INDEX_SCOPE, bumpScopes, versionsBumped
+from .engine import searchEngine
+
+# ستون‌هایی که در ایندکس جستجو هستند؛ save با update_fields بدون آن‌ها (مثل ثبت رأی) ایندکس را دست نمی‌زند
+FOOD_INDEX_FIELDS = {"name", "description", "isAvailable", "restaurant", "restaurant_id"}
+RESTAURANT_INDEX_FIELDS = {"name"}
+
+
+# ایندکس فقط بعد از commit تغییر می‌کند تا تغییرات تراکنش rollback شده در نتایج جستجو دیده نشوند؛
+# افزایش نسخه scope بعد از آن، ایندکس worker های دیگر را دوباره می‌سازد
+def _applyOnCommit(change):
+    transaction.on_commit(change)
+    bumpScopes([SEARCH_INDEX_SCOPE])
+
+
+@receiver(post_save, sender=Food)
+def indexFood(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or not touchesFields(update_fields, FOOD_INDEX_FIELDS):
+        return
+    row = (instance.id, instance.name, instance.description, instance.restaurant_id, instance.isAvailable)
+    _applyOnCommit(lambda: searchEngine.indexFood(*row))
+
+
+@receiver(post_delete, sender=Food)
+def removeFood(sender, instance, **kwargs):
+    foodId = instance.id
+    _applyOnCommit(lambda: searchEngine.removeFood(foodId))
+
+
+@receiver(foodsBulkChanged)
+def reindexBulkChangedFoods(sender, restaurantIds, foodIds=None, **kwargs):
+    _applyOnCommit(lambda: searchEngine.reindexFoods(restaurantIds, foodIds))
+
+
+@receiver(post_save, sender=Restaurant)
+def indexRestaurant(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or not touchesFields(update_fields, RESTAURANT_INDEX_FIELDS):
+        return
+    restaurantId, name = instance.id, instance.name
+    _applyOnCommit(lambda: searchEngine.indexRestaurant(restaurantId, name))
+
+
+@receiver(post_delete, sender=Restaurant)
+def removeRestaurant(sender, instance, **kwargs):
+    restaurantId = instance.id
+    _applyOnCommit(lambda: searchEngine.removeRestaurant(restaurantId))
+
+
+@receiver(m2m_changed, sender=Restaurant.areas.through)
+def updateRestaurantAreas(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+
+    if reverse and action == "post_clear":
+        areaId = instance.pk
+        _applyOnCommit(lambda: searchEngine.removeArea(areaId))
+        return
+
+    restaurantIds = list(pk_set) if reverse else [instance.pk]
+
+    def setAreas():
+        if not searchEngine.tracksChanges:
+            return
+        areasByRestaurant = {restaurantId: [] for restaurantId in restaurantIds}
+        for restaurantId, areaId in sender.objects.filter(restaurant_id__in=restaurantIds).values_list(
+            "restaurant_id", "area_id"
+        ):
+            areasByRestaurant[restaurantId].append(areaId)
+        for restaurantId, areaIds in areasByRestaurant.items():
+            searchEngine.setRestaurantAreas(restaurantId, areaIds)
+
+    _applyOnCommit(setAreas)
+
+
+@receiver(versionsBumped)
+def followSearchIndexVersions(sender, versions, bulk=False, **kwargs):
+    searchEngine.onVersionsBumped(versions, bulk)
@@ -0,0 +1,174 @@
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase
+
+from Area.models import Area
+from City.models import City
+from food.models import Food
+from FoodCategory.models import FoodCategory
+from restaurant.models import Restaurant
+from restaurantManager.models import RestaurantManager
+from services.ResponseCache import SEARCH_INDEX_SCOPE, getCatalogCache, getVersions
+from .engine import InvertedIndex, SearchEngine, normalizeText, searchEngine, tokenize
+
+
+class NormalizeTextTests(SimpleTestCase):
+    def test_unifies_arabic_letters(self):
+        self.assertEqual(normalizeText("كباب علي"), "کباب علی")
+
+    def test_splits_on_zwnj(self):
+        self.assertEqual(tokenize("نان\u200cبربری"), ["نان", "بربری"])
+
+    def test_converts_persian_and_arabic_digits(self):
+        self.assertEqual(normalizeText("پیتزا ۱۲ ٣"), "پیتزا 12 3")
+
+    def test_removes_diacritics(self):
+        self.assertEqual(normalizeText("کَبابِ"), "کباب")
+
+    def test_drops_stop_words(self):
+        self.assertEqual(tokenize("جوجه با برنج"), ["جوجه", "برنج"])
+
+
+class InvertedIndexTests(SimpleTestCase):
+    def setUp(self):
+        self.index = InvertedIndex({"name": 3.0, "description": 1.0})
+
+    def search(self, query, **kwargs):
+        return [docId for docId, _ in self.index.search(tokenize(query), **kwargs)]
+
+    def test_ranks_by_bm25(self):
+        self.index.add(1, {"name": "سالاد", "description": "کباب"})
+        self.index.add(2, {"name": "کباب کوبیده", "description": ""})
+        self.index.add(3, {"name": "کباب", "description": ""})
+        self.index.add(4, {"name": "پیتزا", "description": ""})
+        # وزن نام بیشتر از توضیحات است و سند کوتاه‌تر امتیاز بیشتری دارد
+        self.assertEqual(self.search("کباب"), [3, 2, 1])
+
+    def test_expands_last_word_as_prefix(self):
+        self.index.add(1, {"name": "پیتزا قارچ"})
+        self.index.add(2, {"name": "پیتزا مخصوص"})
+        self.index.add(3, {"name": "قارچ سوخاری"})
+        # سندی که هر دو کلمه را دارد اول است؛ بقیه با یکی از کلمه‌ها پیدا می‌شوند
+        results = self.search("پیتزا قار")
+        self.assertEqual(results[0], 1)
+        self.assertEqual(sorted(results), [1, 2, 3])
+        self.assertEqual(self.search("قار", prefixLast=False), [])
+        self.assertEqual(sorted(self.search("قا")), [1, 3])
+
+    def test_incremental_changes_keep_results_ordered(self):
+        self.index.add(1, {"name": "کباب"})
+        self.index.add(2, {"name": "کباب برگ"})
+        self.assertEqual(self.search("کباب"), [1, 2])
+        self.index.add(3, {"name": "کباب کباب"})
+        self.index.remove(1)
+        self.index.add(2, {"name": "جوجه"})
+        self.assertEqual(self.search("کباب"), [3])
+        self.assertEqual(self.search("جوجه"), [2])
+
+
+class SearchEngineRebuildTests(TestCase):
+    def setUp(self):
+        getCatalogCache().clear()
+        city = City.objects.create(name="Tehran")
+        manager = RestaurantManager.objects.create(email="m@x.com", firstName="a", lastName="b", isVerified=True)
+        self.restaurant = Restaurant.objects.create(
+            owner=manager, name="rest", address="addr addr addr", city=city, phoneNumber="09120000000",
+            startWorkHour=8, endWorkHour=22, isVerified=True
+        )
+        self.food = Food.objects.create(
+            name="کباب کوبیده", price=1000, category=FoodCategory.objects.create(name="c"), isAvailable=True,
+            restaurant=self.restaurant
+        )
+        self.engine = SearchEngine()
+        self.engine.ensureLoaded()
+
+    def foodIds(self, query):
+        return sorted(foodId for foodId, _ in self.engine.search(query)["foods"])
+
+    def test_local_changes_do_not_rebuild(self):
+        version = getCatalogCache().incr(f"version:{SEARCH_INDEX_SCOPE}")
+        self.engine.onVersionsBumped({SEARCH_INDEX_SCOPE: version})
+        with mock.patch.object(SearchEngine, "_fill") as fill:
+            self.engine.ensureLoaded()
+        fill.assert_not_called()
+
+    def test_rebuild_serves_old_index_and_keeps_concurrent_changes(self):
+        fill = SearchEngine._fill
+
+        def slowFill(engine):
+            # جستجوی هم‌زمان منتظر بازسازی نمی‌ماند و از ایندکس قبلی جواب می‌گیرد
+            self.assertEqual(self.foodIds("کباب"), [self.food.id])
+            # تغییری که در حین بازسازی commit شده و در خواندن دیتابیس دیده نشده است
+            self.engine.indexFood(self.food.id + 1, "کباب برگ", "", self.restaurant.id, True)
+            fill(engine)
+
+        # تغییر در worker دیگر
+        getCatalogCache().incr(f"version:{SEARCH_INDEX_SCOPE}", 5)
+        with mock.patch.object(SearchEngine, "_fill", slowFill):
+            self.engine.ensureLoaded()
+        self.assertEqual(self.foodIds("کباب"), [self.food.id, self.food.id + 1])
+        self.assertEqual(self.engine.version, getVersions([SEARCH_INDEX_SCOPE])[0])
+
+
+class SearchSignalsTests(TestCase):
+    def setUp(self):
+        getCatalogCache().clear()
+        self.addCleanup(self.resetEngine)
+        city = City.objects.create(name="Tehran")
+        self.area = Area.objects.create(name="A1", city=city)
+        self.otherArea = Area.objects.create(name="A2", city=city)
+        self.category = FoodCategory.objects.create(name="c")
+        self.restaurant = self.createRestaurant("m1@x.com", self.area)
+        self.otherRestaurant = self.createRestaurant("m2@x.com", self.otherArea)
+        self.food = self.createFood("کباب کوبیده", self.restaurant)
+        self.otherFood = self.createFood("کباب برگ", self.otherRestaurant)
+        searchEngine.ensureLoaded()
+
+    def resetEngine(self):
+        searchEngine._reset()
+        searchEngine.version = None
+
+    def createRestaurant(self, email, area):
+        manager = RestaurantManager.objects.create(email=email, firstName="a", lastName="b", isVerified=True)
+        restaurant = Restaurant.objects.create(
+            owner=manager, name="rest", address="addr addr addr", city=self.area.city, phoneNumber="09120000000",
+            startWorkHour=8, endWorkHour=22, isVerified=True
+        )
+        restaurant.areas.add(area)
+        return restaurant
+
+    def createFood(self, name, restaurant):
+        return Food.objects.create(
+            name=name, price=1000, category=self.category, isAvailable=True, restaurant=restaurant
+        )
+
+    def foodIds(self, query, areaId=None):
+        return sorted(foodId for foodId, _ in searchEngine.search(query, areaId=areaId)["foods"])
+
+    def test_scopes_results_by_area(self):
+        self.assertEqual(self.foodIds("کباب"), sorted([self.food.id, self.otherFood.id]))
+        self.assertEqual(self.foodIds("کباب", self.area.id), [self.food.id])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.otherRestaurant.areas.add(self.area)
+        self.assertEqual(self.foodIds("کباب", self.area.id), sorted([self.food.id, self.otherFood.id]))
+
+    def test_saves_and_deletes_update_index_after_commit(self):
+        with mock.patch.object(SearchEngine, "_fill") as fill:
+            with self.captureOnCommitCallbacks(execute=True):
+                food = self.createFood("کباب بختیاری", self.restaurant)
+            self.assertIn(food.id, self.foodIds("بختیاری"))
+
+            with self.captureOnCommitCallbacks(execute=True):
+                food.isAvailable = False
+                food.save()
+            self.assertEqual(self.foodIds("بختیاری"), [])
+
+            with self.captureOnCommitCallbacks(execute=True):
+                self.food.delete()
+            self.assertEqual(self.foodIds("کوبیده"), [])
+        fill.assert_not_called()
+
+    def test_changes_are_not_applied_before_commit(self):
+        with self.captureOnCommitCallbacks(execute=False):
+            self.createFood("کباب بختیاری", self.restaurant)
+        self.assertEqual(self.foodIds("بختیاری"), [])
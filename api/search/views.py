@@ -0,0 +1,59 @@
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from rest_framework import status
+
+from food.models import Food
+from food.services import getFoodCardQuerySet, serializeFoodCard
+from restaurant.models import Restaurant
+from services.Pagination import getPageSize
+from .engine import searchEngine
+
+
+class SearchView(APIView):
+    def post(self, request):
+        query = (request.data.get('q') or '').strip()
+        areaId = request.data.get('areaId')
+
+        if not query:
+            return Response({
+                "status": "error",
+                "message": "عبارت جستجو را وارد کنید."
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            areaId = int(areaId) if areaId else None
+        except (TypeError, ValueError):
+            return Response({
+                "status": "error",
+                "message": "پارامتر areaId نامعتبر است."
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        results = searchEngine.search(query, areaId=areaId, limit=getPageSize(request.data.get('limit')))
+
+        foodScores = dict(results["foods"])
+        foods = {
+            row["id"]: serializeFoodCard(row)
+            for row in getFoodCardQuerySet(Food.objects.filter(id__in=foodScores))
+        }
+        restaurantScores = dict(results["restaurants"])
+        restaurants = {
+            row["id"]: row
+            for row in Restaurant.objects.filter(id__in=restaurantScores).values(
+                "id", "name", "image", "description", "isActive", "ratingAvg", "ratingCount"
+            )
+        }
+
+        return Response({
+            "status": "success",
+            "message": "نتایج جستجو ارسال شد.",
+            "data": {
+                "foods": [
+                    dict(foods[foodId], score=round(score, 4))
+                    for foodId, score in results["foods"] if foodId in foods
+                ],
+                "restaurants": [
+                    dict(restaurants[restaurantId], score=round(score, 4))
+                    for restaurantId, score in results["restaurants"] if restaurantId in restaurants
+                ],
+            }
+        }, status=status.HTTP_200_OK)
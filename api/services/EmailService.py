@@ -1,31 +1,204 @@
+import atexit
 import os
 import random
 import smtplib
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
 from ctypes.wintypes import HHOOK
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from dotenv import load_dotenv
 load_dotenv()
 
-def sendEmail(receiver_email: str, subject: str, html: str) -> int:
-    smtp_server = "smtp.gmail.com"
-    port = os.getenv("EmailPort")
-    sender_email = os.getenv("EmailSender")
-    password = os.getenv("EmailSenderPassword")
+def buildEmail(sender_email: str, receiver_email: str, subject: str, html: str) -> MIMEMultipart:
     message = MIMEMultipart("alternative")
     message["Subject"] = subject
     message["From"] = sender_email
     message["To"] = receiver_email
-    html_body = html
-
-    html_part = MIMEText(html_body, "html")
+    html_part = MIMEText(html, "html")
     message.attach(html_part)
+    return message
+
+
+def _isDisconnect(error):
+    """خطاهایی که یعنی اتصال SMTP از دست رفته (نه رد شدن خود پیام) و باید با اتصال تازه دوباره تلاش کرد"""
+    if isinstance(error, smtplib.SMTPServerDisconnected):
+        return True
+    if isinstance(error, smtplib.SMTPResponseException):
+        return error.smtp_code == 421
+    return isinstance(error, OSError) and not isinstance(error, smtplib.SMTPException)
+
+
+class EmailMetrics:
+    """شمارنده‌های ارسال ایمیل؛ نرخ ارسال و نرخ خطا روی پنجره window ثانیه آخر حساب می‌شوند"""
+
+    def __init__(self, window=60):
+        self.window = window
+        self.lock = threading.Lock()
+        self.counters = {"sent": 0, "failed": 0, "connections": 0, "reconnects": 0}
+        self.recent = deque()  # (زمان، موفق بودن)
+
+    def record(self, name):
+        with self.lock:
+            self.counters[name] += 1
+            if name in ("sent", "failed"):
+                now = time.monotonic()
+                self.recent.append((now, name == "sent"))
+                while self.recent and self.recent[0][0] < now - self.window:
+                    self.recent.popleft()
+
+    def snapshot(self):
+        with self.lock:
+            now = time.monotonic()
+            recent = [ok for at, ok in self.recent if at >= now - self.window]
+            counters = dict(self.counters)
+        sent = sum(recent)
+        return {
+            **counters,
+            "sentPerMinute": round(sent * 60 / self.window, 2),
+            "errorRate": round((len(recent) - sent) / len(recent), 4) if recent else 0.0,
+            "messagesPerConnection": round(counters["sent"] / counters["connections"], 2) if counters["connections"] else 0.0,
+        }
+
+
+class _Session:
+    def __init__(self, server):
+        self.server = server
+        self.lastUsed = time.monotonic()
+        self.sent = 0
+
+
+class SmtpConnectionPool:
+    """
+    استخر اتصال‌های SMTP احراز هویت‌شده: هر اتصال بعد از ارسال به استخر برمی‌گردد و پیام‌های بعدی
+    (یا یک دسته کامل با sendMany) روی همان اتصال فرستاده می‌شوند تا برای هر پیام اتصال، STARTTLS و login
+    تکرار نشود. اتصال بیکار بیشتر از EmailPoolMaxIdle ثانیه یا با بیشتر از EmailPoolMaxMessages پیام بسته
+    می‌شود و با قطع اتصال یک بار با اتصال تازه دوباره تلاش می‌شود.
+    """
+
+    def __init__(self, size=None, maxIdle=None, maxMessages=None):
+        self.size = size or int(os.getenv("EmailPoolSize", 4))
+        self.maxIdle = maxIdle or float(os.getenv("EmailPoolMaxIdle", 60))
+        self.maxMessages = maxMessages or int(os.getenv("EmailPoolMaxMessages", 100))
+        self.slots = threading.BoundedSemaphore(self.size)
+        self.idle = []
+        self.lock = threading.Lock()
+        self.metrics = EmailMetrics()
 
+    def _connect(self):
+        smtp_server = os.getenv("EmailHost", "smtp.gmail.com")
+        port = os.getenv("EmailPort")
+        sender_email = os.getenv("EmailSender")
+        password = os.getenv("EmailSenderPassword")
+        server = smtplib.SMTP(smtp_server, port, timeout=30)
+        try:
+            if os.getenv("EmailStartTls", "1") == "1":
+                server.starttls()
+            if password:
+                server.login(sender_email, password)
+        except Exception:
+            server.close()
+            raise
+        self.metrics.record("connections")
+        return server
+
+    @staticmethod
+    def _close(server):
+        try:
+            server.quit()
+        except Exception:
+            server.close()
+
+    @contextmanager
+    def session(self):
+        """یک اتصال از استخر (یا اتصال تازه در اولین ارسال)؛ حداکثر size اتصال هم‌زمان باز است"""
+        with self.slots:
+            with self.lock:
+                session = self.idle.pop() if self.idle else None
+            if session is not None and time.monotonic() - session.lastUsed > self.maxIdle:
+                self._close(session.server)
+                session = None
+            session = session or _Session(None)
+            try:
+                yield session
+            finally:
+                session.lastUsed = time.monotonic()
+                if session.server is not None and session.sent < self.maxMessages:
+                    with self.lock:
+                        self.idle.append(session)
+                elif session.server is not None:
+                    self._close(session.server)
+
+    def _send(self, session, sender_email, receiver_email, message):
+        for attempt in range(2):
+            try:
+                if session.server is None:
+                    session.server = self._connect()
+                session.server.sendmail(sender_email, receiver_email, message)
+                session.sent += 1
+                return
+            except Exception as e:
+                if not _isDisconnect(e):
+                    raise
+                if session.server is not None:
+                    session.server.close()
+                    session.server = None
+                if attempt:
+                    raise
+                self.metrics.record("reconnects")
+
+    def sendMany(self, emails):
+        """
+        ارسال [(receiver, subject, html)] روی یک اتصال؛ برای هر پیام None یا خطای آن برگردانده می‌شود.
+        بعد از دو بار شکست اتصال، بقیه پیام‌های دسته هم با همان خطا برمی‌گردند.
+        """
+        sender_email = os.getenv("EmailSender")
+        results, broken = [], None
+        with self.session() as session:
+            for receiver_email, subject, html in emails:
+                error = broken
+                if error is None:
+                    try:
+                        message = buildEmail(sender_email, receiver_email, subject, html).as_string()
+                        self._send(session, sender_email, receiver_email, message)
+                    except Exception as e:
+                        error = e
+                        broken = e if _isDisconnect(e) else None
+                self.metrics.record("sent" if error is None else "failed")
+                results.append(error)
+        return results
+
+    def closeAll(self):
+        with self.lock:
+            sessions, self.idle = self.idle, []
+        for session in sessions:
+            self._close(session.server)
+
+
+emailPool = SmtpConnectionPool()
+atexit.register(emailPool.closeAll)
+
+
+def deliverEmails(emails):
+    """ارسال دسته‌ای [(receiver, subject, html)] روی یک اتصال استخر؛ برای هر پیام None یا خطای آن"""
+    return emailPool.sendMany(emails)
+
+
+def deliverEmail(receiver_email: str, subject: str, html: str) -> None:
+    """
+    ارسال یک ایمیل با استخر اتصال و بالا بردن خطا در صورت شکست.
+    با EmailHost/EmailPort و EmailStartTls=0 می‌توان به جای gmail یک SMTP محلی (notifications/smtpSink.py) داد.
+    """
+    error = emailPool.sendMany([(receiver_email, subject, html)])[0]
+    if error is not None:
+        raise error
+
+
+def sendEmail(receiver_email: str, subject: str, html: str) -> int:
     try:
-        with smtplib.SMTP(smtp_server, port) as server:
-            server.starttls()
-            server.login(sender_email, password)
-            server.sendmail(sender_email, receiver_email, message.as_string())
+        deliverEmail(receiver_email, subject, html)
         return True
     except Exception as e:
         return -False
@@ -0,0 +1,172 @@
+import heapq
+import math
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+# اندازه هر خانه شبکه به درجه (حدود ۱.۱ کیلومتر در راستای عرض جغرافیایی)
+DEFAULT_CELL_SIZE = 0.01
+
+
+class InvalidCoordinates(ValueError):
+    pass
+
+
+def parseCoordinates(latitude, longitude):
+    """(عرض، طول) به صورت float؛ اگر هر دو خالی باشند None و اگر نامعتبر باشند InvalidCoordinates"""
+    if latitude in (None, "") and longitude in (None, ""):
+        return None
+    try:
+        latitude, longitude = float(latitude), float(longitude)
+    except (TypeError, ValueError):
+        raise InvalidCoordinates((latitude, longitude))
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        raise InvalidCoordinates((latitude, longitude))
+    return latitude, longitude
+
+
+def haversineKm(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+class GridIndex:
+    """
+    ایندکس مکانی درون حافظه روی یک شبکه یکنواخت طول و عرض جغرافیایی (بدون نیاز به افزونه GIS دیتابیس).
+    جستجوی نزدیک‌ترین‌ها از خانه نقطه شروع می‌شود و حلقه به حلقه بیرون می‌رود تا وقتی که کمترین فاصله
+    ممکن تا حلقه بعدی از فاصله k-امین نتیجه بیشتر شود؛ بنابراین فقط خانه‌های اطراف نقطه بررسی می‌شوند.
+    """
+
+    def __init__(self, cellSize=DEFAULT_CELL_SIZE):
+        self.cellSize = cellSize
+        self.clear()
+
+    def __len__(self):
+        return len(self.points)
+
+    def cellOf(self, latitude, longitude):
+        return math.floor(latitude / self.cellSize), math.floor(longitude / self.cellSize)
+
+    def clear(self):
+        self.cells = {}
+        self.points = {}  # id -> (lat, lon)
+        self.bounds = None  # (کمترین سطر، بیشترین سطر، کمترین ستون، بیشترین ستون) خانه‌های پر
+
+    def add(self, itemId, latitude, longitude):
+        self.remove(itemId)
+        self.points[itemId] = (latitude, longitude)
+        row, col = self.cellOf(latitude, longitude)
+        self.cells.setdefault((row, col), set()).add(itemId)
+        if self.bounds is None:
+            self.bounds = (row, row, col, col)
+        else:
+            minRow, maxRow, minCol, maxCol = self.bounds
+            self.bounds = (min(minRow, row), max(maxRow, row), min(minCol, col), max(maxCol, col))
+
+    def remove(self, itemId):
+        point = self.points.pop(itemId, None)
+        if point is None:
+            return
+        cell = self.cellOf(*point)
+        members = self.cells.get(cell)
+        if members is not None:
+            members.discard(itemId)
+            if not members:
+                del self.cells[cell]
+
+    def _maxRing(self, row, col):
+        # حلقه‌ای که کل محدوده خانه‌های پر را می‌پوشاند (با حذف نقاط کوچک نمی‌شود و فقط محافظه‌کارانه است)
+        if not self.cells:
+            return -1
+        minRow, maxRow, minCol, maxCol = self.bounds
+        return max(row - minRow, maxRow - row, col - minCol, maxCol - col)
+
+    def _occupiedRings(self, row, col):
+        rings = {}
+        for r, c in self.cells:
+            rings.setdefault(max(abs(r - row), abs(c - col)), []).append((r, c))
+        return rings
+
+    def _ringLowerBoundKm(self, latitude, longitude, row, col, ring):
+        """کمترین فاصله ممکن از نقطه تا هر خانه بیرون از حلقه ring"""
+        size = self.cellSize
+        latGap = min(latitude - (row - ring) * size, (row + ring + 1) * size - latitude)
+        lonGap = min(longitude - (col - ring) * size, (col + ring + 1) * size - longitude)
+        # کسینوس در دورترین عرض جغرافیایی باند فعلی؛ فاصله طولی کمتر از واقع تخمین زده می‌شود
+        farthestLat = min(90.0, abs(latitude) + (ring + 1) * size)
+        return min(latGap * KM_PER_DEGREE, lonGap * KM_PER_DEGREE * math.cos(math.radians(farthestLat)))
+
+    def _cellLowerBoundKm(self, latitude, longitude, cell):
+        # فاصله تا نزدیک‌ترین نقطه مستطیل خانه؛ با حاشیه کوچک تا خطای تقریب روی کره آن را بیش از واقع نکند
+        size = self.cellSize
+        nearestLat = min(max(latitude, cell[0] * size), (cell[0] + 1) * size)
+        nearestLon = min(max(longitude, cell[1] * size), (cell[1] + 1) * size)
+        return haversineKm(latitude, longitude, nearestLat, nearestLon) * 0.99 - 0.001
+
+    def _ringCells(self, row, col, ring):
+        if ring == 0:
+            yield row, col
+            return
+        for c in range(col - ring, col + ring + 1):
+            yield row - ring, c
+            yield row + ring, c
+        for r in range(row - ring + 1, row + ring):
+            yield r, col - ring
+            yield r, col + ring
+
+    def nearest(self, latitude, longitude, k=None, maxDistanceKm=None, accept=None, after=None):
+        """
+        نزدیک‌ترین نقاط به ترتیب (فاصله، آیدی) به صورت [(id, فاصله کیلومتر)].
+        k: حداکثر تعداد نتیجه (None یعنی همه نقاط داخل maxDistanceKm).
+        accept(id): فیلتر اختیاری نقاط. after: (فاصله، آیدی) آخرین نتیجه صفحه قبل.
+        فاصله‌ها به متر گرد می‌شوند تا cursor صفحه‌بندی پایدار باشد.
+        """
+        if k is None and maxDistanceKm is None:
+            raise ValueError("k or maxDistanceKm is required")
+        row, col = self.cellOf(latitude, longitude)
+        maxRing = self._maxRing(row, col)
+        best = []  # max-heap روی (-فاصله، -آیدی)
+        occupiedRings = nextRings = None
+        ring = 0
+        while ring <= maxRing:
+            if occupiedRings is None and (2 * ring + 1) ** 2 > len(self.cells):
+                # خانه‌های پیمایش‌شده از تعداد خانه‌های پر بیشتر شده‌اند (نقطه دور از داده‌ها یا داده پراکنده)؛
+                # از اینجا فقط خانه‌های پر بر اساس حلقه‌شان پیمایش می‌شوند و حلقه‌های خالی رد می‌شوند
+                occupiedRings = self._occupiedRings(row, col)
+                nextRings = iter(sorted(r for r in occupiedRings if r > ring))
+            if occupiedRings is not None:
+                cells = occupiedRings.get(ring, ())
+            else:
+                cells = self._ringCells(row, col, ring)
+            for cell in cells:
+                members = self.cells.get(cell)
+                if not members:
+                    continue
+                limit = maxDistanceKm
+                if k is not None and len(best) == k:
+                    limit = -best[0][0] if limit is None else min(limit, -best[0][0])
+                if limit is not None and self._cellLowerBoundKm(latitude, longitude, cell) > limit:
+                    continue
+                for itemId in members:
+                    distance = round(haversineKm(latitude, longitude, *self.points[itemId]), 3)
+                    if maxDistanceKm is not None and distance > maxDistanceKm:
+                        continue
+                    if after is not None and (distance, itemId) <= after:
+                        continue
+                    if accept is not None and not accept(itemId):
+                        continue
+                    entry = (-distance, -itemId)
+                    if k is None or len(best) < k:
+                        heapq.heappush(best, entry)
+                    elif entry > best[0]:
+                        heapq.heapreplace(best, entry)
+            bound = self._ringLowerBoundKm(latitude, longitude, row, col, ring)
+            if maxDistanceKm is not None and bound > maxDistanceKm:
+                break
+            if k is not None and len(best) == k and bound > -best[0][0]:
+                break
+            if occupiedRings is not None:
+                ring = next(nextRings, maxRing + 1)
+            else:
+                ring += 1
+        return [(-negativeId, -negativeDistance) for negativeDistance, negativeId in sorted(best, reverse=True)]
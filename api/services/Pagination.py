@@ -0,0 +1,103 @@
+import base64
+import binascii
+import json
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 100
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encodeCursor(values):
+    raw = json.dumps(values, default=str, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _cursorValue(field, value):
+    if value is None or isinstance(value, (bool, list, dict)):
+        raise ValueError(value)
+    return field.to_python(value)
+
+
+def decodeCursor(cursor, fields=None):
+    """
+    fields: فیلد مدل متناظر هر مقدار cursor (None یعنی بدون بررسی)؛ مقدارها با to_python همان فیلد تبدیل
+    می‌شوند و cursor دست‌کاری‌شده به جای خطای دیتابیس InvalidCursor می‌دهد
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (binascii.Error, ValueError, TypeError, AttributeError):
+        raise InvalidCursor(cursor)
+    if not isinstance(values, list) or len(values) != 2:
+        raise InvalidCursor(cursor)
+    if fields is not None:
+        try:
+            values = [value if field is None else _cursorValue(field, value) for field, value in zip(fields, values)]
+        except (ValidationError, ValueError, TypeError):
+            raise InvalidCursor(cursor)
+    return values
+
+
+def getPageSize(limit):
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        return DEFAULT_PAGE_SIZE
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def _rowValue(row, key):
+    if isinstance(row, dict):
+        return row[key]
+    return getattr(row, key)
+
+
+def _sortFieldOf(queryset, sortField):
+    """فیلد مدل یا output_field ستون محاسبه‌شده (annotate) که مرتب‌سازی روی آن است"""
+    annotation = queryset.query.annotations.get(sortField)
+    if annotation is not None:
+        return annotation.output_field
+    try:
+        return queryset.model._meta.get_field(sortField)
+    except FieldDoesNotExist:
+        return None
+
+
+def paginateByKeyset(queryset, sortField=None, descending=False, cursor=None, limit=None, sortKey=None):
+    """
+    صفحه‌بندی keyset روی (sortField, id).
+    به جای OFFSET، شرط «بعد از آخرین ردیف صفحه قبل» به کوئری اضافه می‌شود؛
+    بنابراین هزینه صفحه‌های عمیق با صفحه اول یکسان است.
+    sortKey نام کلید مقدار مرتب‌سازی در ردیف‌های خروجی است (پیش‌فرض همان sortField).
+    """
+    limit = getPageSize(limit)
+    sortKey = sortKey or sortField
+    op = "lt" if descending else "gt"
+    prefix = "-" if descending else ""
+
+    if cursor:
+        sortValue, lastId = decodeCursor(
+            cursor, (_sortFieldOf(queryset, sortField) if sortField else None, queryset.model._meta.pk)
+        )
+        if sortField:
+            queryset = queryset.filter(
+                Q(**{f"{sortField}__{op}": sortValue}) | Q(**{sortField: sortValue, f"id__{op}": lastId})
+            )
+        else:
+            queryset = queryset.filter(**{f"id__{op}": lastId})
+
+    ordering = (prefix + sortField, prefix + "id") if sortField else (prefix + "id",)
+    rows = list(queryset.order_by(*ordering)[:limit + 1])
+
+    nextCursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        nextCursor = encodeCursor([_rowValue(last, sortKey) if sortKey else None, _rowValue(last, "id")])
+    return rows, nextCursor
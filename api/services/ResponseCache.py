@@ -0,0 +1,231 @@
+import hashlib
+import json
+import time
+from functools import wraps
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.db import transaction
+from django.dispatch import Signal
+from rest_framework import status
+from rest_framework.response import Response
+
+from services.WorkingHours import InvalidHour, getRequestedHour
+
+# scope سراسری کاتالوگ؛ تغییرات نادر مثل تغییر نام شهر یا دسته‌بندی همه پاسخ‌ها را باطل می‌کند
+CATALOG_SCOPE = "catalog"
+# scope پاسخ‌هایی که به منطقه خاصی محدود نیستند؛ هر تغییر غذا یا رستوران آن را باطل می‌کند
+ALL_AREAS_SCOPE = "all"
+CITIES_SCOPE = "cities"
+CATEGORIES_SCOPE = "categories"
+# مختصات و ساعات کاری رستوران‌ها (ایندکس مکانی restaurant/locations.py)
+RESTAURANT_LOCATIONS_SCOPE = "restaurantLocations"
+# هزینه ارسال رستوران‌ها به مناطق (ماتریس restaurant/delivery.py)
+DELIVERY_FEES_SCOPE = "deliveryFees"
+# نام، توضیحات و مناطق غذاها و رستوران‌ها (ایندکس جستجوی search/engine.py)
+SEARCH_INDEX_SCOPE = "searchIndex"
+
+AREA_IDS_KEY = "areaIds"
+
+# بعد از افزایش نسخه scope ها ارسال می‌شود؛ versions: {scope: نسخه جدید}
+# bulk=True یعنی تغییر بدون سیگنال‌های مدل (bulk_update / update) انجام شده است
+versionsBumped = Signal()
+
+
+def followVersion(current, version, bulk=False):
+    """
+    نسخه جدید یک ساختار درون‌فرایندی بعد از versionsBumped. افزایشی که از تغییر همین worker آمده (و قبلاً
+    اعمال شده) یک واحد است؛ هر فاصله دیگری یعنی تغییری از جای دیگر، و تغییرات گروهی هم به سیگنال‌های مدل
+    نرسیده‌اند. در این حالت‌ها None برمی‌گردد تا ساختار دوباره بارگذاری شود.
+    """
+    if not bulk and current is not None and current == version - 1:
+        return version
+    return None
+
+
+def getCatalogCache():
+    return caches["catalog"]
+
+
+def areaScope(areaId):
+    return f"area:{areaId}"
+
+
+def _versionKey(scope):
+    return f"version:{scope}"
+
+
+def getVersions(scopes):
+    """
+    نسخه فعلی هر scope. کلیدهای نسخه منقضی نمی‌شوند (timeout=None)؛ فقط timeout پاسخ‌های کش‌شده محدود است.
+    مقدار اولیه از زمان فعلی (میلی‌ثانیه) گرفته می‌شود تا اگر کلید نسخه از کش حذف شد (مثلا با پر شدن کش)،
+    نسخه جدید با نسخه‌های قبلی برابر نشود و پاسخ کهنه دوباره استفاده نشود.
+    """
+    cache = getCatalogCache()
+    keys = [_versionKey(scope) for scope in scopes]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, int(time.time() * 1000), timeout=None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def _bumpNow(scopes, bulk):
+    cache = getCatalogCache()
+    versions = {}
+    for scope in scopes:
+        key = _versionKey(scope)
+        try:
+            versions[scope] = cache.incr(key)
+        except ValueError:
+            versions[scope] = int(time.time() * 1000)
+            if not cache.add(key, versions[scope], timeout=None):
+                versions[scope] = cache.get(key)
+    versionsBumped.send(sender=None, versions=versions, bulk=bulk)
+
+
+def bumpScopes(scopes, bulk=False):
+    """
+    نسخه scope ها را بعد از commit تراکنش فعلی افزایش می‌دهد.
+    تغییرات گروهی که سیگنال مدل ندارند باید bulk=True بدهند تا ساختارهای درون حافظه خودشان را دوباره بسازند.
+    """
+    scopes = list(scopes)
+    if scopes:
+        transaction.on_commit(lambda: _bumpNow(scopes, bulk))
+
+
+def bumpAreas(areaIds, bulk=False):
+    bumpScopes([ALL_AREAS_SCOPE] + [areaScope(areaId) for areaId in set(areaIds)], bulk)
+
+
+def bumpRestaurantAreas(restaurantIds, bulk=False):
+    """restaurantIds: آیدی یک رستوران یا لیست آیدی‌ها"""
+    from restaurant.models import Restaurant
+
+    if not isinstance(restaurantIds, (list, tuple, set, frozenset)):
+        restaurantIds = [restaurantIds] if restaurantIds else []
+    areaIds = []
+    if restaurantIds:
+        areaIds = Restaurant.areas.through.objects.filter(
+            restaurant_id__in=restaurantIds
+        ).values_list("area_id", flat=True)
+    bumpAreas(areaIds, bulk)
+
+
+def bumpAreaList():
+    """بعد از ایجاد یا حذف منطقه: لیست آیدی مناطق دوباره ساخته و کل کاتالوگ باطل می‌شود"""
+    transaction.on_commit(lambda: getCatalogCache().delete(AREA_IDS_KEY))
+    bumpScopes([CATALOG_SCOPE])
+
+
+def getKnownAreaIds():
+    cache = getCatalogCache()
+    areaIds = cache.get(AREA_IDS_KEY)
+    if areaIds is None:
+        from Area.models import Area
+
+        areaIds = set(Area.objects.values_list("id", flat=True))
+        cache.set(AREA_IDS_KEY, areaIds)
+    return areaIds
+
+
+def catalogScopes(request):
+    """
+    scope پاسخ‌های کاتالوگ غذا و رستوران.
+    اگر areaId معتبر باشد پاسخ فقط به همان منطقه وابسته است؛ در غیر این صورت (بدون منطقه یا منطقه ناموجود
+    که ویوها روی همه داده‌ها fallback می‌کنند) به scope سراسری «all» وابسته است.
+    """
+    areaId = request.data.get("areaId")
+    try:
+        areaId = int(areaId) if areaId else None
+    except (TypeError, ValueError):
+        areaId = None
+    if areaId is not None and areaId in getKnownAreaIds():
+        return [CATALOG_SCOPE, areaScope(areaId)]
+    return [CATALOG_SCOPE, ALL_AREAS_SCOPE]
+
+
+def normalizedParams(request):
+    params = {}
+    for source in (request.query_params, request.data):
+        if hasattr(source, "lists"):
+            items = source.lists()
+        else:
+            items = ((key, value if isinstance(value, list) else [value]) for key, value in source.items())
+        for key, values in items:
+            values = [str(value) for value in values if value not in (None, "")]
+            if values:
+                params[key] = values
+    # openNow به ساعت فعلی وابسته است؛ ساعت حل‌شده در کلید قرار می‌گیرد تا پاسخ ساعت قبل استفاده نشود
+    if "openNow" in params:
+        try:
+            params["openNow"] = [str(getRequestedHour(request.data))]
+        except InvalidHour:
+            pass
+    return json.dumps(params, sort_keys=True, ensure_ascii=False)
+
+
+def cacheResponse(endpoint, scopes=catalogScopes, timeout=DEFAULT_TIMEOUT):
+    """
+    کش پاسخ ویوهای خواندنی کاتالوگ.
+    کلید از نام endpoint، پارامترهای نرمال‌شده و نسخه scope هایی که پاسخ به آن‌ها وابسته است ساخته می‌شود.
+    با هر تغییر داده، سیگنال‌ها نسخه scope های مربوط را بالا می‌برند و کلیدهای قبلی دیگر خوانده نمی‌شوند؛
+    بنابراین باطل‌سازی دقیق است و timeout فقط برای آزاد شدن حافظه است.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(self, request, *args, **kwargs):
+            cache = getCatalogCache()
+            scopeNames = scopes(request)
+            versions = getVersions(scopeNames)
+            digest = hashlib.sha1(normalizedParams(request).encode()).hexdigest()
+            key = f"response:{endpoint}:{'.'.join(map(str, versions))}:{digest}"
+
+            cached = cache.get(key)
+            if cached is not None:
+                return Response(cached)
+
+            response = view_func(self, request, *args, **kwargs)
+            if response.status_code == 200 and getattr(response, "data", None) is not None:
+                cache.set(key, response.data, timeout=timeout)
+            return response
+        return wrapper
+    return decorator
+
+
+def _matchesETag(request, etag):
+    header = request.headers.get("If-None-Match")
+    if not header:
+        return False
+    tags = [tag.strip() for tag in header.split(",")]
+    return "*" in tags or any(tag.removeprefix("W/") == etag for tag in tags)
+
+
+def conditionalResponse(endpoint, getStamp):
+    """
+    پشتیبانی ETag / If-None-Match برای ویوهای خواندنی (از جمله ویوهای POST).
+    getStamp(request) مهر نسخه داده‌های پاسخ را (حداکثر updatedAt ردیف‌ها و ردیف‌های مرتبط و تعداد ردیف‌ها) با یک
+    کوئری aggregate برمی‌گرداند و اگر None باشد (مثلاً رکورد وجود ندارد) ویو بدون ETag اجرا می‌شود.
+    ETag فقط از نام endpoint، پارامترها و همین مهر ساخته می‌شود تا در همه worker ها و در طول زمان برای داده یکسان
+    ثابت بماند؛ اگر با If-None-Match کلاینت برابر باشد قبل از ساخت بدنه پاسخ 304 برمی‌گردد.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(self, request, *args, **kwargs):
+            stamp = getStamp(request)
+            if stamp is None:
+                return view_func(self, request, *args, **kwargs)
+
+            raw = json.dumps([endpoint, normalizedParams(request), stamp], default=str)
+            etag = f'"{hashlib.sha1(raw.encode()).hexdigest()}"'
+            if _matchesETag(request, etag):
+                response = Response(status=status.HTTP_304_NOT_MODIFIED)
+            else:
+                response = view_func(self, request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+            response["ETag"] = etag
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,60 @@
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+HOURS_IN_DAY = 24
+ALL_DAY_MASK = (1 << HOURS_IN_DAY) - 1
+
+
+class InvalidHour(ValueError):
+    pass
+
+
+def computeOpenHoursMask(startHour, endHour):
+    """
+    بیت h یعنی رستوران در ساعت h (از h:00 تا h:59) باز است.
+    اگر ساعت پایان از شروع کمتر باشد بازه از نیمه‌شب عبور می‌کند (مثلاً ۱۸ تا ۲)؛ شروع و پایان برابر یعنی شبانه‌روزی.
+    """
+    startHour = (startHour or 0) % HOURS_IN_DAY
+    endHour = (endHour or 0) % HOURS_IN_DAY
+    if startHour == endHour:
+        return ALL_DAY_MASK
+    if startHour < endHour:
+        return ((1 << endHour) - 1) & ~((1 << startHour) - 1)
+    return ALL_DAY_MASK & ~(((1 << startHour) - 1) & ~((1 << endHour) - 1))
+
+
+def getCurrentHour():
+    return timezone.now().astimezone(ZoneInfo(settings.RESTAURANT_TIME_ZONE)).hour
+
+
+def _isTrue(value):
+    return str(value).lower() in ("1", "true")
+
+
+def getRequestedHour(data):
+    """
+    ساعت درخواستی از پارامتر openAt (عدد ۰ تا ۲۳ یا «HH:MM») یا openNow (ساعت فعلی)؛ بدون فیلتر None.
+    openAt نامعتبر InvalidHour می‌دهد.
+    """
+    openAt = data.get("openAt")
+    if openAt not in (None, ""):
+        try:
+            hour = int(str(openAt).split(":")[0])
+        except ValueError:
+            raise InvalidHour(openAt)
+        if not 0 <= hour < HOURS_IN_DAY:
+            raise InvalidHour(openAt)
+        return hour
+    if _isTrue(data.get("openNow", "")):
+        return getCurrentHour()
+    return None
+
+
+def filterOpenAt(queryset, hour, maskField="openHoursMask"):
+    """فقط ردیف‌هایی که بیت ساعت hour در بیت‌مپ ساعات کاری‌شان روشن است (یک عمل bitwise در خود کوئری)"""
+    if hour is None:
+        return queryset
+    return queryset.alias(openBit=F(maskField).bitand(1 << hour)).filter(openBit__gt=0)
@@ -28,7 +28,7 @@ def get_similar_foods(customer):
     # 4. پیدا کردن غذاهای مشابه
     similar_foods = Food.objects.filter(
         models.Q(category__in=categories) | models.Q(restaurant__in=restaurants)
-    ).exclude(id__in=purchased_food_ids).distinct().order_by('-ratingScore')[:3]
+    ).exclude(id__in=purchased_food_ids).distinct().order_by('-rankingScore')[:3]
 
     # 5. آماده‌سازی خروجی
     result = [{